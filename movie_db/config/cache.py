@@ -0,0 +1,294 @@
+"""
+A cache backend shared by every worker process on the host.
+
+Entries live in a SQLite file in WAL mode, so any number of processes can
+read while one writes, and the data survives restarts. Compared to the
+per-process locmem cache, every worker sees the same fragments, generation
+counters and sessions, at the cost of a syscall or two per operation::
+
+    CACHES = {
+        "default": {
+            "BACKEND": "config.cache.SQLiteCache",
+            "LOCATION": BASE_DIR / "cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 50_000, "MAX_SIZE": 64 * 1024 * 1024},
+        }
+    }
+
+- Size cap: a write that takes the cache past ``MAX_ENTRIES`` entries or
+  ``MAX_SIZE`` bytes evicts expired entries, then least recently used ones,
+  until both are under ``1 - 1 / CULL_FREQUENCY`` of their cap. Triggers
+  keep the totals, so checking them is one row read.
+- LRU: reads refresh an entry's access time at most every ``TOUCH_INTERVAL``
+  seconds, so hot keys don't turn every read into a write.
+- Atomic incr: integers are stored as SQLite integers rather than pickled,
+  and ``incr()`` is a single UPDATE ... RETURNING. ``incr_many()`` counts
+  several counters, creating missing ones, in one transaction.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+TOUCH_INTERVAL = 60
+# schema version, in PRAGMA user_version
+SCHEMA_VERSION = 1
+
+SCHEMA = f"""
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires) WHERE expires IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS cache_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_totals VALUES (0, 0, 0);
+
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_totals SET entries = entries + 1, size = size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache BEGIN
+    UPDATE cache_totals SET size = size - old.size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_totals SET entries = entries - 1, size = size - old.size;
+END;
+PRAGMA user_version = {SCHEMA_VERSION};
+COMMIT;
+"""
+
+# rows are evicted oldest first until both the entries and the bytes
+# freed cover what's over the target, sparing the entry just written
+EVICT = """
+DELETE FROM cache WHERE key IN (
+    SELECT key FROM (
+        SELECT key, size,
+            ROW_NUMBER() OVER oldest AS evicted,
+            SUM(size) OVER oldest AS freed
+        FROM cache WHERE key != ? WINDOW oldest AS (ORDER BY accessed, key)
+    )
+    WHERE evicted <= ? OR freed - size < ?
+)
+"""
+
+UPSERT = """
+INSERT INTO cache (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value, size = excluded.size, expires = excluded.expires, accessed = excluded.accessed
+"""
+
+INCR_EXISTING = """
+UPDATE cache SET value = value + ?, accessed = ?
+WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?)
+RETURNING value
+"""
+
+# incr_many(): counters that are missing, expired or not integers start over
+INCR_OR_CREATE = """
+INSERT INTO cache (key, value, size, expires, accessed) VALUES (?, ?, 8, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = IIF(typeof(value) = 'integer' AND (expires IS NULL OR expires > ?), value + excluded.value, excluded.value),
+    expires = IIF(typeof(value) = 'integer' AND (expires IS NULL OR expires > ?), expires, excluded.expires),
+    size = 8, accessed = excluded.accessed
+RETURNING value
+"""
+
+
+def _encode(value):
+    # integers stay integers so incr() can add to them in SQL; bool is an
+    # int subclass but must come back as a bool
+    if type(value) is int and -(2**63) <= value < 2**63:
+        return value, 8
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return data, len(data)
+
+
+def _decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        options = params.get("OPTIONS", {})
+        self._max_size = int(options.get("MAX_SIZE", 64 * 1024 * 1024))
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        # a connection inherited across fork() must not be used by the child
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self._path, isolation_level=None)
+            connection.execute("PRAGMA busy_timeout = 5000")
+            connection.execute("PRAGMA journal_mode = WAL")
+            # the cache can be rebuilt, durability isn't worth an fsync per write
+            connection.execute("PRAGMA synchronous = OFF")
+            if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                connection.executescript(SCHEMA)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _write(self):
+        return _Transaction(self._connection())
+
+    def _cull(self, connection, key, now):
+        entries, size = connection.execute("SELECT entries, size FROM cache_totals").fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        connection.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+        entries, size = connection.execute("SELECT entries, size FROM cache_totals").fetchone()
+        keep = 1 - 1 / self._cull_frequency if self._cull_frequency else 0
+        excess_entries = max(entries - int(self._max_entries * keep), 0)
+        excess_size = max(size - int(self._max_size * keep), 0)
+        if excess_entries or excess_size:
+            connection.execute(EVICT, (key, excess_entries, excess_size))
+
+    def _set(self, connection, key, value, timeout, now):
+        data, size = _encode(value)
+        connection.execute(UPSERT, (key, data, size, self.get_backend_timeout(timeout), now))
+        self._cull(connection, key, now)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                "SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, now)
+            ).fetchone()
+            if row:
+                return False
+            self._set(connection, key, value, timeout, now)
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        return {keys[key]: value for key, value in self._get_many(list(keys)).items()}
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        connection = self._connection()
+        placeholders = ", ".join("?" * len(keys))
+        rows = connection.execute(
+            f"SELECT key, value, accessed FROM cache WHERE key IN ({placeholders}) "
+            "AND (expires IS NULL OR expires > ?)",
+            (*keys, now),
+        ).fetchall()
+        stale = [key for key, _, accessed in rows if accessed < now - TOUCH_INTERVAL]
+        if stale:
+            placeholders = ", ".join("?" * len(stale))
+            connection.execute(f"UPDATE cache SET accessed = ? WHERE key IN ({placeholders})", (now, *stale))
+        return {key: _decode(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as connection:
+            self._set(connection, key, value, timeout, time.time())
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self._write() as connection:
+            for key, value in data.items():
+                self._set(connection, self.make_and_validate_key(key, version=version), value, timeout, now)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return bool(cursor.rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self._connection().execute(INCR_EXISTING, (delta, now, key, now)).fetchone()
+        if row is None:
+            raise ValueError(f"Key '{key}' not found.")
+        return row[0]
+
+    def incr_many(self, keys, delta=1, read=(), version=None) -> dict:
+        """
+        Add ``delta`` to each counter of ``keys``, a ``{key: timeout}`` dict,
+        starting missing ones from 0 with that timeout, and return their new
+        values along with the values of the ``read`` keys found, all in one
+        transaction. A negative ``delta`` only updates the counters that are
+        still there, so undoing a count never creates one below zero.
+        """
+        keys = {self.make_and_validate_key(key, version=version): (key, timeout) for key, timeout in keys.items()}
+        read = {self.make_and_validate_key(key, version=version): key for key in read}
+        now = time.time()
+        values = {}
+        with self._write() as connection:
+            for key, (original, timeout) in keys.items():
+                if delta < 0:
+                    row = connection.execute(INCR_EXISTING, (delta, now, key, now)).fetchone()
+                else:
+                    expires = self.get_backend_timeout(timeout)
+                    row = connection.execute(INCR_OR_CREATE, (key, delta, expires, now, now, now)).fetchone()
+                if row is not None:
+                    values[original] = row[0]
+            if read:
+                values.update({read[key]: value for key, value in self._get_many(list(read)).items()})
+            if keys:
+                self._cull(connection, next(iter(keys)), now)
+        return values
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            "SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+        return bool(cursor.rowcount)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            placeholders = ", ".join("?" * len(keys))
+            self._connection().execute(f"DELETE FROM cache WHERE key IN ({placeholders})", keys)
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def close(self, **kwargs):
+        # Django closes caches after every request; the connection is kept
+        # per thread instead, like the database's persistent connections
+        pass
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, so a read-then-write holds the write lock."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
@@ -0,0 +1,266 @@
+"""
+Per-request timing: SQL, template rendering and the view.
+
+For a sampled share of requests (``INSTRUMENTATION["SAMPLE_RATE"]``)
+``InstrumentationMiddleware`` records every query and times template
+rendering, then:
+
+- adds a ``Server-Timing`` header, so the browser's network panel shows
+  where the time went, for staff or under DEBUG only;
+- logs requests slower than ``SLOW_REQUEST_MS`` with their slowest queries;
+- logs statements repeated ``N_PLUS_ONE_THRESHOLD`` times or more as N+1
+  suspects, with the line of app code that issued them.
+
+Queries are seen through an execute wrapper added to each connection as it
+connects. ``connection.execute_wrapper()`` would only cover the calling
+thread's connection, while async views query from an executor thread; the
+wrapper finds the request's profile in a context variable instead, which
+follows the request into that thread. Requests that aren't sampled have no
+profile and pass straight through.
+"""
+import heapq
+import logging
+import random
+import re
+import sys
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "SAMPLE_RATE": 1.0,
+    "SLOW_REQUEST_MS": 500,
+    "N_PLUS_ONE_THRESHOLD": 5,
+}
+SLOWEST_QUERIES = 3
+
+# literals and IN lists vary between otherwise identical statements
+_IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+# queries are attributed to the innermost frame of app code: not Django, not
+# this project's infrastructure under config/
+_APP_DIR = str(Path(settings.BASE_DIR).resolve())
+_CONFIG_DIR = str(Path(__file__).resolve().parent)
+
+_profile = ContextVar("request_profile", default=None)
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, "INSTRUMENTATION", {})}
+
+
+def normalize(sql: str) -> str:
+    return _LITERAL.sub("?", _IN_LIST.sub("(...)", sql))
+
+
+def _origin() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and not filename.startswith(_CONFIG_DIR) and "site-packages" not in filename:
+            return f"{Path(filename).relative_to(_APP_DIR)}:{frame.f_lineno} in {frame.f_code.co_qualname}"
+        frame = frame.f_back
+    return "unknown"
+
+
+@dataclass
+class Statement:
+    count: int = 0
+    duration: float = 0.0
+    origin: str | None = None
+
+
+@dataclass
+class Profile:
+    n_plus_one_threshold: int
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    sql: float = 0.0
+    template: float = 0.0
+    view_started: float | None = None
+    rendering: bool = False
+    statements: dict = field(default_factory=dict)
+    slowest: list = field(default_factory=list)
+
+    def record(self, sql, duration):
+        self.queries += 1
+        self.sql += duration
+
+        statement = self.statements.setdefault(normalize(sql), Statement())
+        statement.count += 1
+        statement.duration += duration
+        if statement.count == self.n_plus_one_threshold:
+            # only walking the stack once a statement looks repeated keeps
+            # the common case cheap
+            statement.origin = _origin()
+
+        if len(self.slowest) < SLOWEST_QUERIES:
+            heapq.heappush(self.slowest, (duration, sql))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, sql))
+
+    def suspects(self):
+        return {sql: statement for sql, statement in self.statements.items() if statement.origin}
+
+
+def _execute(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record(sql, time.perf_counter() - started)
+
+
+def _instrument(connection, **kwargs):
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+connection_created.connect(_instrument)
+
+_render = None
+
+
+def _timed_render(self, context=None, request=None):
+    profile = _profile.get()
+    # templates rendered while rendering another count in its time
+    if profile is None or profile.rendering:
+        return _render(self, context, request)
+    profile.rendering = True
+    started = time.perf_counter()
+    try:
+        return _render(self, context, request)
+    finally:
+        profile.template += time.perf_counter() - started
+        profile.rendering = False
+
+
+def install():
+    """
+    Time template rendering; called once, from ``AppConfig.ready()``. Wraps
+    the template backend's ``render()``, which every ``render()``,
+    ``render_to_string()`` and ``TemplateResponse`` goes through, rather
+    than ``django.template.base.Template._render``, which the test runner
+    replaces with its own.
+    """
+    global _render
+    if Template.render is not _timed_render:
+        _render = Template.render
+        Template.render = _timed_render
+
+
+def _is_staff(user) -> bool:
+    return user is not None and user.is_staff
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = self._sample()
+        if profile is None:
+            return self.get_response(request)
+        token = _profile.set(profile)
+        try:
+            self._instrument_open_connections()
+            response = self.get_response(request)
+        finally:
+            _profile.reset(token)
+        # set by AuthenticationMiddleware, unless a response came before it
+        server_timing = settings.DEBUG or _is_staff(getattr(request, "user", None))
+        return self._report(request, response, profile, server_timing)
+
+    async def __acall__(self, request):
+        profile = self._sample()
+        if profile is None:
+            return await self.get_response(request)
+        # async views run their queries and templates in sync_to_async
+        # threads, which get a copy of this context and so the same profile
+        token = _profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _profile.reset(token)
+        # request.user would query the database from the event loop
+        server_timing = settings.DEBUG or (hasattr(request, "auser") and _is_staff(await request.auser()))
+        return self._report(request, response, profile, server_timing)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if profile := _profile.get():
+            profile.view_started = time.perf_counter()
+
+    def _sample(self):
+        options = _options()
+        if random.random() >= options["SAMPLE_RATE"]:
+            return None
+        return Profile(n_plus_one_threshold=options["N_PLUS_ONE_THRESHOLD"])
+
+    def _instrument_open_connections(self):
+        # persistent connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            _instrument(connection)
+
+    def _report(self, request, response, profile, server_timing):
+        now = time.perf_counter()
+        total = (now - profile.started) * 1000
+        # from URL resolution to the response, the middleware after this one
+        # included; for streaming responses only until the stream starts
+        view = (now - profile.view_started) * 1000 if profile.view_started else 0.0
+
+        if server_timing:
+            response["Server-Timing"] = ", ".join(
+                [
+                    f'sql;dur={profile.sql * 1000:.1f};desc="{profile.queries} queries"',
+                    f"tpl;dur={profile.template * 1000:.1f}",
+                    f"view;dur={view:.1f}",
+                    f"total;dur={total:.1f}",
+                ]
+            )
+
+        if total >= _options()["SLOW_REQUEST_MS"]:
+            slowest = "".join(
+                f"\n  {duration * 1000:.1f} ms: {sql}" for duration, sql in sorted(profile.slowest, reverse=True)
+            )
+            logger.warning(
+                "Slow request %s %s: %.0f ms, %d queries in %.0f ms, templates %.0f ms. Slowest queries:%s",
+                request.method,
+                request.path,
+                total,
+                profile.queries,
+                profile.sql * 1000,
+                profile.template * 1000,
+                slowest,
+            )
+
+        for sql, statement in profile.suspects().items():
+            logger.warning(
+                "Possible N+1 in %s %s: %d x %s (%.1f ms, first repeated from %s)",
+                request.method,
+                request.path,
+                statement.count,
+                sql,
+                statement.duration * 1000,
+                statement.origin,
+            )
+        return response
@@ -0,0 +1,82 @@
+"""
+Primary/replica database routing.
+
+Writes always go to the primary (``default``). Reads go to the ``replica``
+alias only while serving a read-only request, see ``ReplicaMiddleware``.
+Everything else reads from the primary: requests that write, management
+commands and the job worker, so they never miss rows they just wrote.
+
+After a request that writes, the browser is pinned to the primary for
+``PIN_SECONDS``, so the page it's redirected to shows its own changes even if
+the replica lags behind.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PRIMARY = "default"
+REPLICA = "replica"
+
+PIN_COOKIE = "pin_primary"
+PIN_SECONDS = 10
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get() and REPLICA in settings.DATABASES:
+            return REPLICA
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica gets its schema from the primary
+        return db != REPLICA
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _read_from_replica.set(self._may_use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+        return self._pin(request, response)
+
+    async def __acall__(self, request):
+        # the flag follows the request into sync_to_async threads, which run
+        # with a copy of the caller's context
+        token = _read_from_replica.set(self._may_use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+        return self._pin(request, response)
+
+    def _may_use_replica(self, request):
+        return request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+
+    def _pin(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, "1", max_age=PIN_SECONDS, httponly=True, samesite="Lax")
+        return response
@@ -0,0 +1,226 @@
+"""
+Static and media files served by Django itself, with the headers a front
+web server would add.
+
+``serve_static`` serves collected files from ``STATIC_ROOT``. Names hashed by
+collectstatic (see config/storage.py) never change content, so they're
+cached as immutable for a year; the precompressed variant the client
+accepts is sent instead of the file, so nothing is compressed per request.
+
+``serve_media`` serves uploads (posters and their renditions) with an ETag
+and Last-Modified, so revalidating an unchanged poster is a 304, and with
+single HTTP ranges. With ``MEDIA_OFFLOAD`` set the response only carries an
+``X-Accel-Redirect`` (nginx) or ``X-Sendfile`` (Apache, lighttpd) header and
+the front server sends the file, ranges included::
+
+    MEDIA_OFFLOAD = {"HEADER": "X-Accel-Redirect", "PREFIX": "/internal-media/"}
+    MEDIA_OFFLOAD = {"HEADER": "X-Sendfile"}  # the file's absolute path
+
+Both answer GET and HEAD only, and stream bodies from the file rather than
+reading it into memory; full responses go through ``wsgi.file_wrapper``, so
+WSGI servers can use sendfile().
+"""
+import mimetypes
+import os
+import re
+from functools import cache
+from stat import S_ISREG
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .storage import ENCODINGS
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# unhashed static names may change in place with the next deploy
+STATIC_MAX_AGE = "public, max-age=300"
+MEDIA_MAX_AGE = "public, max-age=86400"
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    The (first, last) byte of a single ``bytes=`` range, or None to send the
+    whole file: multiple ranges are allowed to be answered that way.
+    """
+    match = RANGE_RE.fullmatch(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if not start:
+        # "bytes=-500": the last 500 bytes
+        if int(end) == 0:
+            raise RangeNotSatisfiable
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = min(int(end), size - 1) if end else size - 1
+    if end < start:
+        return None
+    return start, end
+
+
+def accepted_encodings(request) -> set[str]:
+    accepted = set()
+    # META rather than request.headers, which copies every header to build
+    for coding in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+@cache
+def _hashed_names() -> frozenset:
+    # the manifest is read once, when the storage is created
+    return frozenset(getattr(staticfiles_storage, "hashed_files", {}).values())
+
+
+def _stat(path: str) -> os.stat_result | None:
+    try:
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    return stat if S_ISREG(stat.st_mode) else None
+
+
+def _resolve(root, path: str) -> tuple[str, os.stat_result]:
+    try:
+        resolved = safe_join(root, path)
+    except (SuspiciousFileOperation, ValueError):
+        raise Http404("Not found.")
+    if not (stat := _stat(resolved)):
+        raise Http404("Not found.")
+    return resolved, stat
+
+
+def _file_response(request, path: str, stat, content_type: str, cache_control: str, encoding: str | None = None):
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+    headers = {
+        "Cache-Control": cache_control,
+        "ETag": etag,
+        "Last-Modified": http_date(stat.st_mtime),
+        "Accept-Ranges": "bytes",
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime), response=None)
+    if response is not None:
+        # 304 Not Modified or 412 Precondition Failed
+        for header in ("Cache-Control", "ETag", "Last-Modified"):
+            response[header] = headers[header]
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    range_header = request.META.get("HTTP_RANGE")
+    if_range = request.META.get("HTTP_IF_RANGE")
+    # If-Range: only honour the range if the client's copy is this version
+    if range_header and (if_range is None or if_range in (etag, headers["Last-Modified"])):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["Content-Length"] = str(size)
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, "rb"), content_type=content_type, headers=headers)
+        # FileResponse would name the file, which for a variant is app.css.gz
+        del response["Content-Disposition"]
+        return response
+
+    start, end = byte_range
+    response = StreamingHttpResponse(
+        _read(path, start, end - start + 1), status=206, content_type=content_type, headers=headers
+    )
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(end - start + 1)
+    return response
+
+
+def _read(path: str, offset: int, length: int):
+    with open(path, "rb") as file:
+        file.seek(offset)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _content_type(path: str) -> str:
+    content_type, _ = mimetypes.guess_type(path)
+    content_type = content_type or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "image/svg+xml"):
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+@require_safe
+def serve_static(request, path: str):
+    try:
+        file, stat = _resolve(settings.STATIC_ROOT, path) if settings.STATIC_ROOT else (None, None)
+    except Http404:
+        file = None
+    if file is None:
+        # before collectstatic, in development, straight from the apps
+        found = finders.find(path) if settings.DEBUG else None
+        if not found:
+            raise Http404("Not found.")
+        return _file_response(request, found, os.stat(found), _content_type(path), "no-cache")
+
+    cache_control = IMMUTABLE if path in _hashed_names() else STATIC_MAX_AGE
+    content_type = _content_type(path)
+    accepted = accepted_encodings(request)
+    response = None
+    compressed = False
+    for encoding, suffix in ENCODINGS:
+        if variant_stat := _stat(file + suffix):
+            compressed = True
+            if encoding in accepted:
+                response = _file_response(request, file + suffix, variant_stat, content_type, cache_control, encoding)
+                break
+    if response is None:
+        response = _file_response(request, file, stat, content_type, cache_control)
+    if compressed:
+        response["Vary"] = "Accept-Encoding"
+    return response
+
+
+@require_safe
+def serve_media(request, path: str):
+    file, stat = _resolve(settings.MEDIA_ROOT, path)
+    offload = getattr(settings, "MEDIA_OFFLOAD", None)
+    if not offload:
+        return _file_response(request, file, stat, _content_type(path), MEDIA_MAX_AGE)
+
+    response = HttpResponse(content_type=_content_type(path))
+    response["Cache-Control"] = MEDIA_MAX_AGE
+    if offload["HEADER"] == "X-Sendfile":
+        response["X-Sendfile"] = file
+    else:
+        # an internal location of the front server mapped onto MEDIA_ROOT
+        response[offload["HEADER"]] = offload["PREFIX"].rstrip("/") + "/" + path
+    return response
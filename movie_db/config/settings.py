@@ -32,6 +32,7 @@ ALLOWED_HOSTS = []
 
 LOCAL_APPS = [
     'movie_db',
+    'jobs',
 ]
 
 EXTERNAL_APPS = [
@@ -49,7 +50,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its total covers the other middleware too
+    'config.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # before anything touching the database, sessions included
+    'config.replica.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -58,6 +63,19 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Server-Timing headers and slow request / N+1 logging, see
+# config/instrumentation.py
+INSTRUMENTATION = {
+    # share of requests profiled, the rest aren't touched; 1.0 profiles
+    # every request while developing. Off under tests, see config/test_runner.py
+    'SAMPLE_RATE': 0.05,
+    'SLOW_REQUEST_MS': 500,
+    # the same statement this many times in one request
+    'N_PLUS_ONE_THRESHOLD': 5,
+}
+
+TEST_RUNNER = 'config.test_runner.TestRunner'
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -83,11 +101,86 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # django.db.backends.sqlite3 plus connection PRAGMAs, see config/sqlite
+        'ENGINE': 'config.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # keep connections open across requests instead of reconnecting (and
+        # re-running the PRAGMAs) every time
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # take the write lock when a transaction starts, so concurrent
+            # writers queue on busy_timeout rather than failing to upgrade a
+            # read lock with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                # readers and the writer don't block each other
+                'journal_mode': 'WAL',
+                # safe with WAL: a power loss may drop the last commits but
+                # can't corrupt the database
+                'synchronous': 'NORMAL',
+                'busy_timeout': 5000,
+                'mmap_size': 256 * 1024 * 1024,
+                # negative values are KiB
+                'cache_size': -64 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        },
+    },
+    # read-only views read from here, see config/replica.py. On SQLite this
+    # is a read-only connection to the same file, which WAL lets run
+    # alongside the writer; point it at a real replica where there is one
+    'replica': {
+        'ENGINE': 'config.sqlite',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pragmas': {
+                'busy_timeout': 5000,
+                'mmap_size': 256 * 1024 * 1024,
+                'cache_size': -64 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['config.replica.PrimaryReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        # one SQLite file in WAL mode shared by every worker process, so
+        # fragments, generations and sessions aren't per process, see
+        # config/cache.py
+        'BACKEND': 'config.cache.SQLiteCache',
+        'LOCATION': BASE_DIR / 'cache.sqlite3',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            # least recently used entries are evicted past either cap
+            'MAX_ENTRIES': 50_000,
+            'MAX_SIZE': 64 * 1024 * 1024,
+        },
+    },
 }
 
+# sessions are read from the cache and only written through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# login, signup and review POSTs, see movie_db/ratelimit.py; the counters are
+# kept in the default cache
+RATELIMIT_ENABLED = True
+# per scope overrides of the rates set on the views, e.g.
+# {'login': {'all': '1/s'}}
+RATELIMITS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,9 +222,27 @@ STATICFILES_DIRS = [
     BASE_DIR / "static"
 ]
 
+# collectstatic writes hashed names and their .gz (and .br) variants here,
+# served by config/serving.py
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'config.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# hand media responses to the front server instead of sending the file, e.g.
+# {'HEADER': 'X-Accel-Redirect', 'PREFIX': '/internal-media/'} for nginx or
+# {'HEADER': 'X-Sendfile'} for Apache and lighttpd
+MEDIA_OFFLOAD = None
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,34 @@
+"""
+SQLite backend with per-connection tuning.
+
+Behaves like ``django.db.backends.sqlite3`` but runs the PRAGMAs listed in
+``OPTIONS["pragmas"]`` on every new connection, e.g. to switch to WAL and set
+a busy timeout. The settings module has the production profile.
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMA_NAME_RE = re.compile(r"^[a-z_]+$")
+PRAGMA_VALUE_RE = re.compile(r"^-?\w+$")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        pragmas = params.pop("pragmas", {})
+        # pragmas can't be bound as query parameters, so they're validated
+        for name, value in pragmas.items():
+            if not PRAGMA_NAME_RE.match(name) or not PRAGMA_VALUE_RE.match(str(value)):
+                raise ImproperlyConfigured(
+                    f"settings.DATABASES[{self.alias!r}]['OPTIONS']['pragmas'] has an invalid entry {name!r}: {value!r}."
+                )
+        self.pragmas = pragmas
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
@@ -0,0 +1,63 @@
+"""
+Static files storage that hashes names and precompresses at collectstatic.
+
+On top of ``ManifestStaticFilesStorage`` (``app.css`` is collected as
+``app.3f2a9c1e.css`` and ``{% static %}`` links to that name), every text
+asset is also written gzipped next to itself, and brotli-compressed when the
+optional ``brotli`` package is installed. ``config.serving`` picks the
+smallest variant the client accepts, so nothing is compressed per request.
+
+Until collectstatic has written a manifest (in development and tests),
+names are left unhashed rather than failing.
+"""
+import gzip
+from pathlib import Path
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".map", ".json", ".svg", ".txt", ".html", ".xml", ".ico"}
+# variants have to save at least this share of the bytes to be worth keeping
+MIN_SAVING = 0.05
+
+# content encoding and file suffix of each variant, preferred first
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")] if brotli else [("gzip", ".gz")]
+
+
+def _compressors():
+    # mtime=0 keeps the .gz files identical between runs
+    yield ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli:
+        yield ".br", lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def url(self, name, force=False):
+        if not self.hashed_files and not force:
+            return FileSystemStorage.url(self, name)
+        return super().url(name, force)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        # both names: templates link the hashed ones, but the originals are
+        # collected too and may be referenced directly
+        for name in sorted({*paths, *self.hashed_files.values()}):
+            if Path(name).suffix.lower() in COMPRESSIBLE_EXTENSIONS:
+                for variant in self._compress(name):
+                    yield variant, variant, True
+
+    def _compress(self, name):
+        path = Path(self.path(name))
+        data = path.read_bytes()
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                path.with_name(path.name + suffix).write_bytes(compressed)
+                yield name + suffix
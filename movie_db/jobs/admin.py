@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from . import queue
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'run_after', 'locked_by', 'updated_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['created_at', 'updated_at']
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected jobs')
+    def requeue(self, request, queryset):
+        queue.requeue(queryset)
@@ -0,0 +1,87 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs import queue
+
+
+def _setup_worker():
+    django.setup()
+
+
+def _run(job_id: int) -> bool:
+    try:
+        return queue.execute(job_id)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Process queued background jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Number of jobs run in parallel.")
+        parser.add_argument(
+            "--mode",
+            choices=["thread", "process"],
+            default="thread",
+            help="Run jobs in a thread pool (I/O-bound work) or a process pool (CPU-bound work).",
+        )
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is drained.")
+
+    def handle(self, *args, concurrency=4, mode="thread", poll_interval=1.0, once=False, **options):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+
+        if mode == "process":
+            # forked workers must not share the parent's database connection
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=concurrency, initializer=_setup_worker)
+        else:
+            pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="jobs")
+
+        self.stdout.write(f"Worker {worker_id} processing jobs with {concurrency} {mode} worker(s)")
+        running = set()
+        processed = failed = 0
+        last_heartbeat = time.monotonic()
+        try:
+            while not self.stopping:
+                if queue.release_stale():
+                    self.stdout.write("Requeued stale jobs.")
+                if running and time.monotonic() - last_heartbeat >= queue.HEARTBEAT_INTERVAL.total_seconds():
+                    queue.heartbeat(worker_id)
+                    last_heartbeat = time.monotonic()
+
+                free = concurrency - len(running)
+                claimed = queue.claim(worker_id, free) if free else []
+                running.update(pool.submit(_run, job_id) for job_id in claimed)
+
+                if not running:
+                    if once:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    processed += 1
+                    if not future.result():
+                        failed += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stdout.write("Waiting for running jobs to finish...")
+            pool.shutdown(wait=True)
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s), {failed} failed."))
+
+    def _stop(self, signum, frame):
+        self.stopping = True
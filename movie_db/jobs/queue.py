@@ -0,0 +1,142 @@
+"""
+A small job queue stored in the project database.
+
+Handlers are plain functions registered with ``@task`` (conventionally in an
+app's ``tasks.py``) and enqueued by name with a JSON payload::
+
+    @task("render_posters")
+    def render_posters(movie_id): ...
+
+    enqueue("render_posters", movie_id=movie.id)
+
+Workers (``manage.py runworker``) claim jobs with SELECT ... FOR UPDATE SKIP
+LOCKED where the backend supports it. On SQLite, which serializes writers
+anyway, a job is claimed with a conditional UPDATE that only one worker can
+win. Failed jobs are retried with exponential backoff.
+
+While jobs run, their worker refreshes ``locked_at`` every
+``HEARTBEAT_INTERVAL``, so only jobs whose worker stopped doing that are
+taken for dead and requeued, however long they legitimately take.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = timedelta(seconds=10)
+RETRY_MAX_DELAY = timedelta(hours=1)
+
+# a RUNNING job whose worker hasn't refreshed its lock by then is assumed dead
+STALE_LOCK_TIMEOUT = timedelta(minutes=10)
+HEARTBEAT_INTERVAL = STALE_LOCK_TIMEOUT / 5
+
+_registry = {}
+
+
+def task(name: str):
+    def register(func):
+        if name in _registry and _registry[name] is not func:
+            raise ValueError(f"A job handler named {name!r} is already registered.")
+        _registry[name] = func
+        return func
+
+    return register
+
+
+def enqueue(name: str, *, delay: timedelta | None = None, max_attempts: int = 5, **payload) -> Job:
+    if name not in _registry:
+        raise KeyError(f"No job handler named {name!r}.")
+    run_after = timezone.now() + delay if delay else timezone.now()
+    return Job.objects.create(name=name, payload=payload, run_after=run_after, max_attempts=max_attempts)
+
+
+def enqueue_many(name: str, payloads, *, max_attempts: int = 5, batch_size: int = 500) -> int:
+    """Enqueue one job per payload dict with batched inserts, returns how many."""
+    if name not in _registry:
+        raise KeyError(f"No job handler named {name!r}.")
+    now = timezone.now()
+    jobs = [Job(name=name, payload=payload, run_after=now, max_attempts=max_attempts) for payload in payloads]
+    Job.objects.bulk_create(jobs, batch_size=batch_size)
+    return len(jobs)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    # exponential backoff with jitter, so failed jobs don't retry in lockstep
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim(worker_id: str, limit: int) -> list[int]:
+    """Mark up to ``limit`` runnable jobs as RUNNING for this worker and return their ids."""
+    now = timezone.now()
+    runnable = Job.objects.filter(status=Job.QUEUED, run_after__lte=now).order_by("run_after", "id")
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(runnable.select_for_update(skip_locked=True).values_list("id", flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(status=Job.RUNNING, locked_by=worker_id, locked_at=now)
+        return ids
+
+    claimed = []
+    for job_id in list(runnable.values_list("id", flat=True)[:limit]):
+        won = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker_id, locked_at=now
+        )
+        if won:
+            claimed.append(job_id)
+    return claimed
+
+
+def execute(job_id: int) -> bool:
+    """Run one claimed job and record the outcome. Returns whether it succeeded."""
+    job = Job.objects.get(id=job_id)
+    job.attempts += 1
+    try:
+        # handlers manage their own transactions: wrapping a long-running job
+        # in one would hold database locks for its whole duration
+        _registry[job.name](**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            logger.error("Job %s failed permanently after %d attempt(s)", job, job.attempts)
+        else:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+            logger.warning("Job %s failed, retrying at %s", job, job.run_after)
+        succeeded = False
+    else:
+        job.status = Job.DONE
+        job.last_error = ""
+        succeeded = True
+
+    job.locked_by = ""
+    job.locked_at = None
+    job.save(update_fields=["attempts", "status", "run_after", "last_error", "locked_by", "locked_at", "updated_at"])
+    return succeeded
+
+
+def heartbeat(worker_id: str) -> int:
+    """Refresh the locks of the jobs this worker is running, so they aren't taken for stale."""
+    return Job.objects.filter(status=Job.RUNNING, locked_by=worker_id).update(locked_at=timezone.now())
+
+
+def release_stale() -> int:
+    """Put RUNNING jobs whose worker died back in the queue."""
+    cutoff = timezone.now() - STALE_LOCK_TIMEOUT
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.QUEUED, locked_by="", locked_at=None
+    )
+
+
+def requeue(queryset) -> int:
+    return queryset.exclude(status=Job.RUNNING).update(
+        status=Job.QUEUED, run_after=timezone.now(), attempts=0, locked_by="", locked_at=None
+    )
@@ -1,13 +1,145 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db.models import Exists, Max, OuterRef, Prefetch
+from django.utils.functional import cached_property
 
-from .models import Movie, MovieInfo, Review
+from jobs.queue import enqueue
+
+from . import search
+from .models import Credit, Movie, MovieInfo, Person, Review
+
+# below this many rows an exact COUNT(*) is cheap enough
+ESTIMATE_THRESHOLD = 10_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Estimate the size of unfiltered changelists from the highest primary key,
+    a single b-tree lookup, instead of counting every row. Deleted rows make
+    it an overestimate, so the last pages may come up short.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+        model = queryset.model
+        estimate = model._default_manager.using(queryset.db).aggregate(last=Max('pk'))['last'] or 0
+        return estimate if estimate >= ESTIMATE_THRESHOLD else super().count
+
+
+class LargeTableMixin:
+    # the full count would be a second COUNT(*) over the unfiltered table
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    # facet counts are a COUNT per filter choice
+    show_facets = admin.ShowFacets.NEVER
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filter on a foreign key with the admin's autocomplete widget, which only
+    loads the selected object, instead of listing every related row in the
+    sidebar. The related model's admin needs ``search_fields``.
+    """
+
+    template = 'admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.attname}__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.value = self.used_parameters.get(self.lookup_kwarg)
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.related_model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        return {}
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': 'All',
+        }
+
+    @property
+    def widget(self):
+        return self.form_field.widget.render(self.lookup_kwarg, self.value, attrs={'id': f'filter_{self.lookup_kwarg}'})
+
+    @property
+    def media(self):
+        return self.form_field.widget.media
+
+
+class YearFilter(admin.SimpleListFilter):
+    """
+    Filter movies on their MovieInfo year. As ``list_filter = ['movie_info__year']``
+    the admin can't tell the relation holds one row per movie and makes the
+    changelist query DISTINCT; the choices here come straight off the
+    (year, movie) index.
+    """
+
+    title = 'year'
+    parameter_name = 'year'
+
+    def lookups(self, request, model_admin):
+        years = MovieInfo.objects.order_by('-year').values_list('year', flat=True).distinct()
+        return [(str(year), str(year)) for year in years]
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(movie_info__year=int(self.value()))
+        return queryset
+
+
+class FullTextSearchMixin:
+    """
+    Answer the changelist search box from the FTS index instead of the
+    LIKE '%term%' scans generated from ``search_fields``.
+    """
+
+    # field on the admin's model holding the movie id
+    fts_movie_field = 'id'
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip() or not search.is_available():
+            return super().get_search_results(request, queryset, search_term)
+        if not search.match_expression(search_term):
+            # only punctuation, nothing FTS5 could match
+            return queryset.none(), False
+        ids = search.matching_ids(search_term)
+        return queryset.filter(**{f'{self.fts_movie_field}__in': ids}), False
+
+
+class CreditInline(admin.TabularInline):
+    model = Credit
+    fields = ['role', 'person', 'order']
+    autocomplete_fields = ['person']
+    extra = 0
 
 
 @admin.register(Movie)
-class MovieAdmin(admin.ModelAdmin):
+class MovieAdmin(LargeTableMixin, FullTextSearchMixin, admin.ModelAdmin):
     list_display = ['title', 'description_preview', 'has_poster', 'has_movie_info']
-    list_filter = ['movie_info__year']
+    list_filter = [YearFilter]
     search_fields = ['title', 'description']
+    # indexed, and gives the autocomplete results a stable order
+    ordering = ['title']
+    inlines = [CreditInline]
+
+    def get_queryset(self, request):
+        # a subquery per row of the page rather than a query per row
+        details = MovieInfo.objects.filter(movie=OuterRef('pk'))
+        return super().get_queryset(request).annotate(has_details=Exists(details))
     
     @admin.display(description="Description")
     def description_preview(self, obj):
@@ -17,26 +149,77 @@ class MovieAdmin(admin.ModelAdmin):
     def has_poster(self, obj):
         return bool(obj.poster)
     
-    @admin.display(boolean=True, description='Has Details')
+    @admin.display(boolean=True, description='Has Details', ordering='has_details')
     def has_movie_info(self, obj):
-        return hasattr(obj, 'movie_info') and obj.movie_info.exists()
+        return obj.has_details
 
 
 @admin.register(MovieInfo)
-class MovieInfoAdmin(admin.ModelAdmin):
-    list_display = ['movie', 'director', 'year', 'main_actors_preview']
-    list_filter = ['year', 'director']
-    search_fields = ['movie__title', 'director', 'actor1', 'actor2', 'actor3', 'actor4']
-    
+class MovieInfoAdmin(LargeTableMixin, FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ['movie', 'directors', 'year', 'main_actors_preview']
+    list_filter = ['year']
+    search_fields = ['movie__title']
+    fts_movie_field = 'movie_id'
+
+    def get_queryset(self, request):
+        # one query for every listed movie's credits instead of two per row
+        credits = Credit.objects.select_related('person')
+        return super().get_queryset(request).select_related('movie').prefetch_related(
+            Prefetch('movie__credits', queryset=credits)
+        )
+
+    def _names(self, obj, role):
+        return [credit.person.name for credit in obj.movie.credits.all() if credit.role == role]
+
+    @admin.display(description='Director')
+    def directors(self, obj):
+        return ', '.join(self._names(obj, Credit.DIRECTOR))
+
     @admin.display(description='Main Actors')
     def main_actors_preview(self, obj):
-        actors = [actor for actor in [obj.actor1, obj.actor2, obj.actor3, obj.actor4] if actor]
+        actors = self._names(obj, Credit.ACTOR)
         return ', '.join(actors[:2]) + ('...' if len(actors) > 2 else '')
 
 
+@admin.register(Person)
+class PersonAdmin(LargeTableMixin, admin.ModelAdmin):
+    list_display = ['name']
+    search_fields = ['name']
+
+
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableMixin, admin.ModelAdmin):
     list_display = ['movie', 'user', 'rating', 'created_at']
-    list_filter = ['rating', 'created_at', 'movie']
+    list_filter = ['rating', ('movie', AutocompleteFilter), ('user', AutocompleteFilter)]
+    # served by review_recent_idx, like the default ordering
+    date_hierarchy = 'created_at'
     search_fields = ['movie__title', 'user__username']
-    readonly_fields = ['created_at', 'updated_at']
\ No newline at end of file
+    readonly_fields = ['created_at', 'updated_at']
+    autocomplete_fields = ['movie', 'user']
+
+    def get_queryset(self, request):
+        # the list shows both and __str__ reads both, so the change and
+        # delete views need them too
+        return super().get_queryset(request).select_related('movie', 'user').defer('movie__description')
+
+    # admin edits bypass the review views, which keep the movie aggregates up
+    # to date, so reconcile the affected movies in the background instead
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        movie_ids = {obj.movie_id}
+        if change and form.initial.get('movie'):
+            # the review may have been moved off another movie
+            movie_ids.add(form.initial['movie'])
+        self._refresh_movie_stats(movie_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._refresh_movie_stats({obj.movie_id})
+
+    def delete_queryset(self, request, queryset):
+        movie_ids = set(queryset.values_list('movie_id', flat=True))
+        super().delete_queryset(request, queryset)
+        self._refresh_movie_stats(movie_ids)
+
+    def _refresh_movie_stats(self, movie_ids):
+        enqueue('movie_db.refresh_movie_stats', movie_ids=sorted(movie_ids))
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Dict serializers for the JSON API, built straight from ``.values()`` rows.
+
+Each public field declares the columns it needs and how to compute its value
+from a row, so a request with ``?fields=`` only selects (and only joins) what
+it asks for, and no model instances are created along the way.
+"""
+from django.core.files.storage import default_storage
+from django.db.models import QuerySet
+
+from ..models import Credit, MovieInfo
+
+
+class FieldError(ValueError):
+    pass
+
+
+def _media_url(name):
+    return default_storage.url(name) if name else None
+
+
+def _average(row):
+    if not row["review_count"]:
+        return None
+    return round(row["rating_sum"] / row["review_count"], 1)
+
+
+HISTOGRAM_COLUMNS = [f"rating_{stars}_count" for stars in range(1, 6)]
+
+# public field -> (columns it reads, value from row)
+MOVIE_FIELDS = {
+    "id": (["id"], lambda row: row["id"]),
+    "title": (["title"], lambda row: row["title"]),
+    "description": (["description"], lambda row: row["description"]),
+    "poster": (["poster"], lambda row: _media_url(row["poster"])),
+    "review_count": (["review_count"], lambda row: row["review_count"]),
+    "average_rating": (["review_count", "rating_sum"], _average),
+    "rating_histogram": (
+        HISTOGRAM_COLUMNS,
+        lambda row: {str(stars): row[f"rating_{stars}_count"] for stars in range(1, 6)},
+    ),
+}
+
+# fields served from MovieInfo, fetched with one extra query only when requested
+MOVIE_INFO_FIELDS = {
+    "year": (["year"], lambda row: row["year"]),
+}
+
+# people fields -> credit role, fetched with one more query only when requested
+CREDIT_FIELDS = {
+    "director": Credit.DIRECTOR,
+    "cast": Credit.ACTOR,
+}
+
+REVIEW_FIELDS = {
+    "id": (["id"], lambda row: row["id"]),
+    "movie": (["movie_id"], lambda row: row["movie_id"]),
+    "user": (["user__username"], lambda row: row["user__username"]),
+    "rating": (["rating"], lambda row: row["rating"]),
+    "review_text": (["review_text"], lambda row: row["review_text"]),
+    "created_at": (["created_at"], lambda row: row["created_at"].isoformat()),
+    "updated_at": (["updated_at"], lambda row: row["updated_at"].isoformat()),
+}
+
+DEFAULT_MOVIE_FIELDS = ["id", "title", "poster", "review_count", "average_rating"]
+ALL_MOVIE_FIELDS = [*MOVIE_FIELDS, *MOVIE_INFO_FIELDS, *CREDIT_FIELDS]
+DEFAULT_REVIEW_FIELDS = ["id", "user", "rating", "review_text", "created_at"]
+
+
+def parse_fields(value: str | None, available, default: list[str]) -> list[str]:
+    if not value:
+        return default
+    fields = list(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise FieldError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(available)}.")
+    return fields
+
+
+def _columns(spec: dict, fields: list[str]) -> list[str]:
+    return list(dict.fromkeys(column for field in fields for column in spec[field][0]))
+
+
+def serialize_rows(rows, spec: dict, fields: list[str]) -> list[dict]:
+    getters = [(field, spec[field][1]) for field in fields]
+    return [{field: getter(row) for field, getter in getters} for row in rows]
+
+
+def movie_values(queryset: QuerySet, fields: list[str]) -> QuerySet:
+    # the id is always selected: keyset cursors and the MovieInfo lookup use it
+    columns = _columns(MOVIE_FIELDS, [field for field in fields if field in MOVIE_FIELDS])
+    return queryset.values(*dict.fromkeys(["id", *columns]))
+
+
+def serialize_movies(rows: list[dict], fields: list[str]) -> list[dict]:
+    movie_fields = [field for field in fields if field in MOVIE_FIELDS]
+    info_fields = [field for field in fields if field in MOVIE_INFO_FIELDS]
+    credit_fields = [field for field in fields if field in CREDIT_FIELDS]
+    results = serialize_rows(rows, MOVIE_FIELDS, movie_fields)
+
+    if info_fields:
+        info_rows = MovieInfo.objects.filter(movie_id__in=[row["id"] for row in rows]).values(
+            "movie_id", *_columns(MOVIE_INFO_FIELDS, info_fields)
+        )
+        infos = {info["movie_id"]: info for info in info_rows}
+        for row, result in zip(rows, results):
+            info = infos.get(row["id"])
+            for field in info_fields:
+                result[field] = MOVIE_INFO_FIELDS[field][1](info) if info else None
+
+    if credit_fields:
+        for result in results:
+            for field in credit_fields:
+                result[field] = []
+        by_id = {row["id"]: result for row, result in zip(rows, results)}
+        roles = {CREDIT_FIELDS[field]: field for field in credit_fields}
+        credits = Credit.objects.filter(movie_id__in=by_id, role__in=roles).order_by("order")
+        for movie_id, role, name in credits.values_list("movie_id", "role", "person__name"):
+            by_id[movie_id][roles[role]].append(name)
+
+    # put fields back in the requested order
+    return [{field: result[field] for field in fields} for result in results]
+
+
+def review_values(queryset: QuerySet, fields: list[str]) -> QuerySet:
+    # auth_user is only joined when "user" is requested; the cursor columns
+    # are always selected
+    return queryset.values(*dict.fromkeys(["id", "created_at", *_columns(REVIEW_FIELDS, fields)]))
+
+
+def serialize_reviews(rows: list[dict], fields: list[str]) -> list[dict]:
+    return serialize_rows(rows, REVIEW_FIELDS, fields)
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+app_name = "api"
+
+urlpatterns = [
+    path("movies/", views.movie_list, name="movie_list"),
+    path("movies/<int:movie_id>/", views.movie_detail, name="movie_detail"),
+    path("movies/<int:movie_id>/reviews/", views.movie_reviews, name="movie_reviews"),
+    path("search/", views.search, name="search"),
+]
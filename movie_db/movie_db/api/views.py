@@ -0,0 +1,117 @@
+from django.http import HttpRequest, JsonResponse
+from django.views.decorators.http import condition, require_http_methods
+
+from .. import search as movie_search
+from ..conditional import generation_etag
+from ..models import Movie
+from ..pagination import paginate_by_created, paginate_by_id, parse_created_cursor, parse_id_cursor
+from . import serializers
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+SEARCH_MAX_RESULTS = 500
+
+
+def _error(message: str, status: int = 400) -> JsonResponse:
+    return JsonResponse({"error": message}, status=status)
+
+
+def _limit(request: HttpRequest) -> int:
+    try:
+        return min(max(int(request.GET.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return DEFAULT_LIMIT
+
+
+def _next_url(request: HttpRequest, cursor) -> str | None:
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query["after"] = cursor
+    return request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+
+def _api_view(generation_names):
+    # every endpoint is a cacheable GET, validated against the generations its
+    # output depends on
+    def decorator(view):
+        return require_http_methods(["GET"])(condition(etag_func=generation_etag(generation_names))(view))
+
+    return decorator
+
+
+@_api_view(lambda request: ["catalog"])
+def movie_list(request: HttpRequest) -> JsonResponse:
+    try:
+        fields = serializers.parse_fields(
+            request.GET.get("fields"), serializers.ALL_MOVIE_FIELDS, serializers.DEFAULT_MOVIE_FIELDS
+        )
+    except serializers.FieldError as error:
+        return _error(str(error))
+
+    rows = serializers.movie_values(Movie.objects.all(), fields)
+    page = paginate_by_id(rows, parse_id_cursor(request.GET.get("after")), _limit(request))
+    return JsonResponse({"results": serializers.serialize_movies(page.items, fields), "next": _next_url(request, page.next_cursor)})
+
+
+@_api_view(lambda request, movie_id: [f"movie:{movie_id}"])
+def movie_detail(request: HttpRequest, movie_id: int) -> JsonResponse:
+    try:
+        fields = serializers.parse_fields(
+            request.GET.get("fields"), serializers.ALL_MOVIE_FIELDS, serializers.ALL_MOVIE_FIELDS
+        )
+    except serializers.FieldError as error:
+        return _error(str(error))
+
+    row = serializers.movie_values(Movie.objects.filter(id=movie_id), fields).first()
+    if row is None:
+        return _error("Movie not found.", status=404)
+    return JsonResponse(serializers.serialize_movies([row], fields)[0])
+
+
+@_api_view(lambda request, movie_id: [f"movie:{movie_id}"])
+def movie_reviews(request: HttpRequest, movie_id: int) -> JsonResponse:
+    try:
+        fields = serializers.parse_fields(
+            request.GET.get("fields"), serializers.REVIEW_FIELDS, serializers.DEFAULT_REVIEW_FIELDS
+        )
+    except serializers.FieldError as error:
+        return _error(str(error))
+
+    if not Movie.objects.filter(id=movie_id).exists():
+        return _error("Movie not found.", status=404)
+
+    movie = Movie(id=movie_id)
+    rows = serializers.review_values(movie.reviews.all(), fields)
+    page = paginate_by_created(rows, parse_created_cursor(request.GET.get("after")), _limit(request))
+    return JsonResponse({"results": serializers.serialize_reviews(page.items, fields), "next": _next_url(request, page.next_cursor)})
+
+
+@_api_view(lambda request: ["catalog"])
+def search(request: HttpRequest) -> JsonResponse:
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return _error("The q parameter is required.")
+    try:
+        fields = serializers.parse_fields(
+            request.GET.get("fields"), serializers.ALL_MOVIE_FIELDS, serializers.DEFAULT_MOVIE_FIELDS
+        )
+    except serializers.FieldError as error:
+        return _error(str(error))
+
+    # relevance-ordered, so the cursor is an offset into the ranking
+    limit = _limit(request)
+    try:
+        offset = max(int(request.GET.get("after", 0)), 0)
+    except ValueError:
+        offset = 0
+    if offset >= SEARCH_MAX_RESULTS:
+        return JsonResponse({"results": [], "next": None})
+
+    ids = movie_search.search_movie_ids(query, limit=limit + 1, offset=offset)
+    has_next = len(ids) > limit and offset + limit < SEARCH_MAX_RESULTS
+    ids = ids[:limit]
+
+    rows = {row["id"]: row for row in serializers.movie_values(Movie.objects.filter(id__in=ids), fields)}
+    results = serializers.serialize_movies([rows[movie_id] for movie_id in ids if movie_id in rows], fields)
+    return JsonResponse({"results": results, "next": _next_url(request, offset + limit if has_next else None)})
@@ -4,3 +4,10 @@ app_name = 'movie_db'
 class MovieDbConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'movie_db'
+
+    def ready(self):
+        from config import instrumentation
+
+        from . import signals  # noqa: F401
+
+        instrumentation.install()
@@ -0,0 +1,9 @@
+"""
+Reproducible benchmarks for the site's URLs.
+
+``seed`` fills a database with synthetic movies, users and reviews whose
+popularity is skewed the way real catalogs are, ``scenarios`` lists a
+request for every URL in ``movie_db.urls`` and ``runner`` measures them and
+compares the results against a previous run. ``manage.py seed_benchmark_data``
+and ``manage.py run_benchmarks`` are the entry points.
+"""
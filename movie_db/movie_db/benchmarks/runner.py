@@ -0,0 +1,119 @@
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+import django
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .scenarios import STAFF, USER, Fixtures, Scenario
+
+# p99 is recorded but not gated on: a few dozen requests can't pin it down
+GATED_LATENCIES = ["p50_ms", "p95_ms"]
+
+
+class ScenarioError(Exception):
+    pass
+
+
+def _client(scenario: Scenario, fixtures: Fixtures) -> Client:
+    client = Client(HTTP_HOST="localhost")
+    if scenario.client == USER:
+        client.force_login(fixtures.user)
+    elif scenario.client == STAFF:
+        client.force_login(fixtures.staff)
+    return client
+
+
+def _request(client: Client, scenario: Scenario, fixtures: Fixtures):
+    if scenario.prepare:
+        scenario.prepare(client, fixtures)
+    url = scenario.url(fixtures)
+    data = scenario.data(fixtures) if scenario.data else None
+
+    started = time.perf_counter()
+    response = getattr(client, scenario.method.lower())(url, data, headers=scenario.headers)
+    # streamed bodies are produced while being read
+    response.getvalue()
+    elapsed = (time.perf_counter() - started) * 1000
+
+    # the page the redirect leads to would show these; left in the cookie
+    # they pile up and make every later page uncacheable
+    client.cookies.pop("messages", None)
+    if response.status_code != scenario.status:
+        raise ScenarioError(f"{scenario.method} {url} returned {response.status_code}, expected {scenario.status}.")
+    return elapsed
+
+
+def measure(scenario: Scenario, fixtures: Fixtures, requests: int) -> dict:
+    """Time ``requests`` requests, then count queries and memory for one more."""
+    client = _client(scenario, fixtures)
+    requests = min(requests, scenario.max_requests or requests)
+
+    # steady state: caches and connections warmed by the first request
+    _request(client, scenario, fixtures)
+    timings = [_request(client, scenario, fixtures) for _ in range(requests)]
+
+    with ExitStack() as stack:
+        captured = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+        tracemalloc.start()
+        try:
+            _request(client, scenario, fixtures)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive") if len(timings) > 1 else timings * 99
+    return {
+        "method": scenario.method,
+        "url": scenario.url(fixtures),
+        "requests": len(timings),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "p50_ms": round(percentiles[49], 3),
+        "p95_ms": round(percentiles[94], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "queries": sum(len(context) for context in captured),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def run(scenarios: list[Scenario], fixtures: Fixtures, requests: int, dataset: dict) -> dict:
+    return {
+        "dataset": dataset,
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connections["default"].vendor,
+        },
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "scenarios": {scenario.name: measure(scenario, fixtures, requests) for scenario in scenarios},
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, noise_ms: float) -> list[str]:
+    """
+    Regressions of ``results`` against ``baseline``: any extra query, or
+    latency or peak memory grown by more than ``tolerance`` (a fraction).
+    Latencies also get ``noise_ms`` of slack, for the sub-millisecond pages.
+    """
+    if results["dataset"] != baseline["dataset"]:
+        raise ValueError(f"The baseline was measured on a different dataset: {baseline['dataset']}.")
+
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        if current["queries"] > previous["queries"]:
+            regressions.append(f"{name}: {previous['queries']} -> {current['queries']} queries")
+        for metric in GATED_LATENCIES:
+            if current[metric] > previous[metric] * (1 + tolerance) + noise_ms:
+                regressions.append(f"{name}: {metric} {previous[metric]:.2f} -> {current[metric]:.2f}")
+        if current["peak_memory_kib"] > previous["peak_memory_kib"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak memory {previous['peak_memory_kib']:.0f} -> {current['peak_memory_kib']:.0f} KiB"
+            )
+    return regressions
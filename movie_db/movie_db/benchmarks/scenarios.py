@@ -0,0 +1,183 @@
+from dataclasses import dataclass
+from itertools import count
+from typing import Callable
+
+from django.contrib.auth.models import User
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from .. import stats
+from ..models import Movie, Person, Review
+from .seed import PASSWORD, USERNAME_PREFIX
+
+ANONYMOUS = "anonymous"
+USER = "user"
+STAFF = "staff"
+
+
+@dataclass(frozen=True)
+class Fixtures:
+    """The rows scenarios point at, picked from the seeded data."""
+
+    popular_movie: int
+    quiet_movie: int
+    person: int
+    query: str
+    user: User
+    staff: User
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    url: Callable[[Fixtures], str]
+    method: str = "GET"
+    client: str = ANONYMOUS
+    data: Callable[[Fixtures], dict] | None = None
+    headers: dict | None = None
+    # runs before every request, outside the timing, to put the client and
+    # data back in the state the request expects (e.g. no review to add to)
+    prepare: Callable[[Client, Fixtures], None] | None = None
+    status: int = 200
+    # for scenarios dominated by password hashing
+    max_requests: int | None = None
+
+
+def fixtures() -> Fixtures:
+    popular = Movie.objects.order_by("-review_count", "id").first()
+    if popular is None:
+        raise ValueError("The database has no movies, seed it first.")
+    quiet = Movie.objects.order_by("review_count", "id").first()
+    person = Person.objects.annotate(movies=Count("credits")).order_by("-movies", "id").first()
+    # a reviewer who hasn't reviewed the quiet movie, so the write scenarios
+    # can add and remove their review there
+    user = User.objects.filter(username__startswith=USERNAME_PREFIX).exclude(reviews__movie=quiet).order_by("id").first()
+    staff, _ = User.objects.get_or_create(username="bench-staff", defaults={"is_staff": True})
+    return Fixtures(
+        popular_movie=popular.id,
+        quiet_movie=quiet.id,
+        person=person.id,
+        query=popular.title.split()[0],
+        user=user,
+        staff=staff,
+    )
+
+
+def _sign_out(client: Client, f: Fixtures) -> None:
+    client.logout()
+
+
+def _sign_in(client: Client, f: Fixtures) -> None:
+    client.force_login(f.user)
+
+
+def _clear_review(client: Client, f: Fixtures) -> None:
+    # keeps the aggregates in step, as the review views would
+    review = Review.objects.filter(user=f.user, movie_id=f.quiet_movie).first()
+    if review:
+        review.delete()
+        stats.review_removed(f.quiet_movie, review.rating)
+
+
+def _ensure_review(client: Client, f: Fixtures) -> None:
+    review, created = Review.objects.get_or_create(user=f.user, movie_id=f.quiet_movie, defaults={"rating": 3})
+    if created:
+        stats.review_added(f.quiet_movie, review.rating)
+
+
+_signups = count()
+
+# one scenario per route in movie_db.urls (and the API it includes); write
+# scenarios reset their state in prepare() so every request does the same work
+SCENARIOS = [
+    Scenario("login page", lambda f: reverse("login")),
+    Scenario(
+        "login",
+        lambda f: reverse("login"),
+        method="POST",
+        data=lambda f: {"username": f.user.username, "password": PASSWORD},
+        prepare=_sign_out,
+        status=302,
+        max_requests=20,
+    ),
+    Scenario("signup page", lambda f: reverse("signup")),
+    Scenario(
+        "signup",
+        lambda f: reverse("signup"),
+        method="POST",
+        data=lambda f: {
+            "username": f"bench-signup-{next(_signups)}",
+            "password1": "a-Long-benchmark-pw-1",
+            "password2": "a-Long-benchmark-pw-1",
+        },
+        prepare=_sign_out,
+        status=302,
+        max_requests=20,
+    ),
+    Scenario("logout", lambda f: reverse("logout"), method="POST", prepare=_sign_in, status=302),
+    Scenario("home", lambda f: reverse("home")),
+    Scenario("home (signed in)", lambda f: reverse("home"), client=USER),
+    Scenario("home more", lambda f: reverse("home_more")),
+    Scenario("home filtered", lambda f: f"{reverse('home')}?decade=1990&rating=3"),
+    Scenario("home filtered more", lambda f: f"{reverse('home_more')}?decade=1990&rating=3"),
+    Scenario("movie popular", lambda f: reverse("movie_info", args=[f.popular_movie])),
+    Scenario("movie popular (signed in)", lambda f: reverse("movie_info", args=[f.popular_movie]), client=USER),
+    Scenario("movie quiet", lambda f: reverse("movie_info", args=[f.quiet_movie])),
+    Scenario("movie reviews", lambda f: reverse("movie_reviews", args=[f.popular_movie])),
+    Scenario("person", lambda f: reverse("person_detail", args=[f.person])),
+    Scenario("top rated", lambda f: reverse("top_rated")),
+    Scenario("top rated deep page", lambda f: f"{reverse('top_rated')}?page=30"),
+    Scenario("trending", lambda f: reverse("trending")),
+    Scenario("search", lambda f: f"{reverse('search')}?q={f.query}"),
+    Scenario("search autocomplete", lambda f: f"{reverse('search_autocomplete')}?q={f.query[:3]}"),
+    Scenario(
+        "add review",
+        lambda f: reverse("save_review", args=[f.quiet_movie]),
+        method="POST",
+        client=USER,
+        data=lambda f: {"rating": 4, "review_text": "Benchmark review"},
+        prepare=_clear_review,
+        status=302,
+    ),
+    Scenario(
+        "edit review",
+        lambda f: reverse("save_review", args=[f.quiet_movie]),
+        method="POST",
+        client=USER,
+        data=lambda f: {"rating": 5, "review_text": "Edited benchmark review"},
+        prepare=_ensure_review,
+        status=302,
+    ),
+    Scenario(
+        "edit review (fetch)",
+        lambda f: reverse("save_review", args=[f.quiet_movie]),
+        method="POST",
+        client=USER,
+        data=lambda f: {"rating": 5, "review_text": "Edited benchmark review"},
+        headers={"X-Requested-With": "XMLHttpRequest"},
+        prepare=_ensure_review,
+    ),
+    Scenario(
+        "edit review (json)",
+        lambda f: reverse("save_review", args=[f.quiet_movie]),
+        method="POST",
+        client=USER,
+        data=lambda f: {"rating": 5, "review_text": "Edited benchmark review"},
+        headers={"X-Requested-With": "XMLHttpRequest", "Accept": "application/json"},
+        prepare=_ensure_review,
+    ),
+    Scenario(
+        "delete review",
+        lambda f: reverse("delete_review", args=[f.quiet_movie]),
+        method="POST",
+        client=USER,
+        prepare=_ensure_review,
+        status=302,
+    ),
+    Scenario("export reviews", lambda f: f"{reverse('export_data', args=['reviews'])}?format=jsonl", client=STAFF),
+    Scenario("api movie list", lambda f: reverse("api:movie_list")),
+    Scenario("api movie detail", lambda f: reverse("api:movie_detail", args=[f.popular_movie])),
+    Scenario("api movie reviews", lambda f: reverse("api:movie_reviews", args=[f.popular_movie])),
+    Scenario("api search", lambda f: f"{reverse('api:search')}?q={f.query}"),
+]
@@ -0,0 +1,156 @@
+import random
+from dataclasses import dataclass
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+
+from ..models import Credit, Movie, MovieInfo, Person, Review
+from ..stats import STAT_FIELDS, computed_stats
+
+BATCH_SIZE = 1000
+USERNAME_PREFIX = "bench-user-"
+PASSWORD = "benchmark-password"
+ACTORS_PER_MOVIE = 4
+
+WORDS = (
+    "night city river shadow dream storm garden silent golden last broken winter summer "
+    "secret island empire stranger journey fire glass ocean mountain lost wild return "
+    "iron moon heart road echo kingdom letter machine mirror paper hunter velvet"
+).split()
+FIRST_NAMES = "Ada Ben Clara Dev Elena Felix Grace Hugo Iris Jonah Kai Lena Milo Nora Omar Pia".split()
+LAST_NAMES = "Adler Brooks Castro Dunn Eriksen Flores Grant Hale Ibsen Jensen Kato Lowe Moreau Novak".split()
+
+
+@dataclass(frozen=True)
+class SeedSummary:
+    movies: int
+    users: int
+    reviews: int
+    people: int
+
+
+def _zipf_weights(count: int, exponent: float) -> list[float]:
+    # rank 1 is the most popular; a handful of items get most of the traffic
+    return list(accumulate(1 / rank**exponent for rank in range(1, count + 1)))
+
+
+def _person_names(rng: random.Random, count: int) -> list[str]:
+    names = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    rng.shuffle(names)
+    # numbered once the combinations run out, so any count stays unique
+    return [names[index % len(names)] + (f" {index // len(names) + 1}" if index >= len(names) else "") for index in range(count)]
+
+
+def seed(movies: int, users: int, reviews: int, *, random_seed: int = 0, skew: float = 1.1) -> SeedSummary:
+    """
+    Add ``movies`` movies, ``users`` users and up to ``reviews`` reviews.
+
+    Movie popularity and user activity both follow a Zipf distribution with
+    exponent ``skew``, and each movie has its own average rating. The same
+    ``random_seed`` produces the same data.
+    """
+    rng = random.Random(random_seed)
+    # a user reviews a movie at most once; past half of all pairs the
+    # rejection sampling below would crawl
+    reviews = min(reviews, movies * users // 2)
+
+    with transaction.atomic():
+        summary = SeedSummary(
+            movies=movies,
+            users=users,
+            reviews=reviews,
+            people=_seed_catalog(rng, movies),
+        )
+        _seed_reviews(rng, _seed_users(users), reviews, skew)
+
+        # bulk_create bypasses the review views, so the aggregates are
+        # computed once at the end
+        stats = computed_stats()
+        seeded = list(Movie.objects.filter(id__in=stats).only("id"))
+        for movie in seeded:
+            for field in STAT_FIELDS:
+                setattr(movie, field, stats[movie.id][field])
+        Movie.objects.bulk_update(seeded, STAT_FIELDS, batch_size=BATCH_SIZE)
+
+    # cached fragments and generations describe the data before seeding
+    for cache in caches.all(initialized_only=True):
+        cache.clear()
+    return summary
+
+
+def _seed_catalog(rng: random.Random, count: int) -> int:
+    start = Movie.objects.count()
+    new_movies = Movie.objects.bulk_create(
+        [
+            Movie(
+                title=f"{' '.join(rng.sample(WORDS, 2)).title()} {start + number}",
+                description=" ".join(rng.choices(WORDS, k=rng.randint(20, 60))).capitalize() + ".",
+                poster=f"posters/benchmark-{number % 10}.jpg",
+            )
+            for number in range(count)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    MovieInfo.objects.bulk_create(
+        [MovieInfo(movie=movie, year=rng.randint(1950, 2025)) for movie in new_movies],
+        batch_size=BATCH_SIZE,
+    )
+
+    # a few prolific people and a long tail, like the movies themselves
+    names = _person_names(rng, max(count // 2, ACTORS_PER_MOVIE + 1))
+    Person.objects.bulk_create([Person(name=name) for name in names], batch_size=BATCH_SIZE, ignore_conflicts=True)
+    people = list(Person.objects.filter(name__in=names).values_list("id", flat=True))
+    weights = _zipf_weights(len(people), 0.8)
+
+    credits = []
+    for movie in new_movies:
+        credits.append(Credit(movie=movie, person_id=rng.choices(people, cum_weights=weights)[0], role=Credit.DIRECTOR))
+        cast = dict.fromkeys(rng.choices(people, cum_weights=weights, k=ACTORS_PER_MOVIE))
+        credits += [Credit(movie=movie, person_id=person, role=Credit.ACTOR, order=order) for order, person in enumerate(cast)]
+    Credit.objects.bulk_create(credits, batch_size=BATCH_SIZE)
+    return len(people)
+
+
+def _seed_users(count: int) -> list[int]:
+    start = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+    # hashing once: every seeded user shares the password
+    password = make_password(PASSWORD)
+    usernames = [f"{USERNAME_PREFIX}{start + number}" for number in range(count)]
+    User.objects.bulk_create([User(username=name, password=password) for name in usernames], batch_size=BATCH_SIZE)
+    return list(User.objects.filter(username__in=usernames).order_by("id").values_list("id", flat=True))
+
+
+def _seed_reviews(rng: random.Random, user_ids: list[int], count: int, skew: float) -> None:
+    # shuffled, so popularity doesn't follow insertion order
+    movies = list(Movie.objects.order_by("id").values_list("id", flat=True))
+    rng.shuffle(movies)
+    movie_weights = _zipf_weights(len(movies), skew)
+    user_weights = _zipf_weights(len(user_ids), skew)
+    # each movie has a reputation its ratings cluster around
+    averages = {movie: rng.uniform(2.0, 4.6) for movie in movies}
+
+    pairs = set()
+    while len(pairs) < count:
+        batch = count - len(pairs)
+        pairs.update(
+            zip(
+                rng.choices(user_ids, cum_weights=user_weights, k=batch),
+                rng.choices(movies, cum_weights=movie_weights, k=batch),
+            )
+        )
+
+    Review.objects.bulk_create(
+        [
+            Review(
+                user_id=user_id,
+                movie_id=movie_id,
+                rating=min(5, max(1, round(rng.gauss(averages[movie_id], 1.0)))),
+                review_text=" ".join(rng.choices(WORDS, k=rng.randint(0, 40))),
+            )
+            for user_id, movie_id in sorted(pairs)
+        ],
+        batch_size=BATCH_SIZE,
+    )
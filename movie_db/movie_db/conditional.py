@@ -0,0 +1,102 @@
+"""
+Conditional GET for the public pages.
+
+Validators come from the fragment cache's generation counters, so checking
+whether a client's copy is current costs one cache round-trip and no queries.
+Only anonymous requests are answered with 304: pages for logged-in users carry
+their username, review forms and CSRF tokens, and any request with pending
+flash messages renders them, so those always get a full response.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import fragments
+
+
+def has_pending_messages(request) -> bool:
+    if CookieStorage.cookie_name in request.COOKIES:
+        return True
+    session = getattr(request, "session", None)
+    return bool(session is not None and session.session_key and session.get(SessionStorage.session_key))
+
+
+async def ahas_pending_messages(request) -> bool:
+    if CookieStorage.cookie_name in request.COOKIES:
+        return True
+    session = getattr(request, "session", None)
+    return bool(session is not None and session.session_key and await session.aget(SessionStorage.session_key))
+
+
+def generation_etag(generation_names):
+    """
+    An ``etag_func`` for django's ``condition()``: a digest of the request's
+    full path and the current values of the generations it depends on.
+    """
+
+    def etag(request, *args, **kwargs):
+        names = generation_names(request, *args, **kwargs)
+        versions = fragments.generations(names)
+        digest = hashlib.blake2b(digest_size=12)
+        digest.update(request.get_full_path().encode())
+        for name, version in zip(names, versions):
+            digest.update(f"|{name}={version}".encode())
+        return digest.hexdigest()
+
+    return etag
+
+
+def conditional_page(generation_names):
+    """
+    Decorate a GET view whose anonymous output only depends on its URL and on
+    the generations returned by ``generation_names(request, *args, **kwargs)``.
+    """
+
+    etag = generation_etag(generation_names)
+
+    def last_modified(request, *args, **kwargs):
+        timestamp = fragments.last_changed(generation_names(request, *args, **kwargs))
+        if timestamp is None:
+            return None
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                user = await request.auser()
+                if user.is_authenticated or await ahas_pending_messages(request):
+                    response = await view(request, *args, **kwargs)
+                    patch_cache_control(response, private=True, no_cache=True)
+                    return response
+
+                response = await conditional_view(request, *args, **kwargs)
+                patch_cache_control(response, public=True, no_cache=True)
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated or has_pending_messages(request):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+
+            response = conditional_view(request, *args, **kwargs)
+            # shared caches may keep the page but must revalidate it each time
+            patch_cache_control(response, public=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
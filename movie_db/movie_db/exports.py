@@ -0,0 +1,161 @@
+"""
+Streaming exports of reviews and the movie catalog as CSV or JSON Lines.
+
+Rows are read with ``values_list().iterator()`` and encoded as they arrive,
+optionally gzipped on the fly, so memory use stays flat however large the
+tables get. Both the staff export view and ``manage.py export_data`` use
+``export()``.
+"""
+import csv
+import json
+import zlib
+from collections import defaultdict
+from datetime import datetime, time
+from itertools import batched
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Credit, Movie, Review
+
+CHUNK_SIZE = 2000
+# encoded rows are joined into chunks of about this many bytes before being
+# sent, rather than one tiny write per row
+BUFFER_SIZE = 64 * 1024
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+# dataset -> [(output column, queryset column)]
+COLUMNS = {
+    "reviews": [
+        ("id", "id"),
+        ("movie_id", "movie_id"),
+        ("movie_title", "movie__title"),
+        ("user", "user__username"),
+        ("rating", "rating"),
+        ("review_text", "review_text"),
+        ("created_at", "created_at"),
+        ("updated_at", "updated_at"),
+    ],
+    "catalog": [
+        ("id", "id"),
+        ("title", "title"),
+        ("description", "description"),
+        ("poster", "poster"),
+        ("year", "movie_info__year"),
+        ("updated_at", "updated_at"),
+        ("details_updated_at", "movie_info__updated_at"),
+    ],
+}
+DATASETS = list(COLUMNS)
+
+# catalog columns read from credits, in the order they're appended to each row
+CREDIT_COLUMNS = [("director", Credit.DIRECTOR), ("cast", Credit.ACTOR)]
+
+
+def parse_since(value: str) -> datetime:
+    """Parse an ISO 8601 date or datetime; naive values are in the current time zone."""
+    try:
+        since = parse_datetime(value)
+        if since is None and (day := parse_date(value)) is not None:
+            since = datetime.combine(day, time.min)
+    except ValueError:
+        since = None
+    if since is None:
+        raise ValueError(f"Invalid date or datetime: {value!r}")
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def _queryset(dataset: str, since: datetime | None):
+    if dataset == "reviews":
+        queryset = Review.objects.all()
+        if since:
+            queryset = queryset.filter(updated_at__gte=since)
+    else:
+        queryset = Movie.objects.all()
+        if since:
+            queryset = queryset.filter(Q(updated_at__gte=since) | Q(movie_info__updated_at__gte=since))
+    columns = [column for _, column in COLUMNS[dataset]]
+    return queryset.order_by("id").values_list(*columns).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _with_credits(rows):
+    # one credits query per chunk of movies, rather than one per movie or a
+    # join multiplying every movie row by its cast
+    for chunk in batched(rows, CHUNK_SIZE):
+        names = defaultdict(lambda: defaultdict(list))
+        credits = Credit.objects.filter(movie_id__in=[row[0] for row in chunk]).order_by("order")
+        for movie_id, role, name in credits.values_list("movie_id", "role", "person__name"):
+            names[movie_id][role].append(name)
+        for row in chunk:
+            yield (*row, *(names[row[0]][role] for _, role in CREDIT_COLUMNS))
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_value(value):
+    # lists (people) are joined into one cell, the way import_catalog reads them
+    return "; ".join(value) if isinstance(value, list) else _plain(value)
+
+
+class _Echo:
+    # csv.writer writes to a file; this one hands each line straight back
+    def write(self, value):
+        return value
+
+
+def _csv_lines(headers, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def _jsonl_lines(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, map(_plain, row))), ensure_ascii=False) + "\n"
+
+
+def _buffered(lines):
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def _gzipped(chunks):
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
+
+
+def export(dataset: str, file_format: str, since: datetime | None = None, compress: bool = False):
+    """Yield the encoded export as bytes chunks."""
+    headers = [header for header, _ in COLUMNS[dataset]]
+    rows = _queryset(dataset, since)
+    if dataset == "catalog":
+        headers += [header for header, _ in CREDIT_COLUMNS]
+        rows = _with_credits(rows)
+    lines = _csv_lines(headers, rows) if file_format == "csv" else _jsonl_lines(headers, rows)
+    chunks = _buffered(lines)
+    return _gzipped(chunks) if compress else chunks
+
+
+def filename(dataset: str, file_format: str, compress: bool = False) -> str:
+    return f"{dataset}.{file_format}" + (".gz" if compress else "")
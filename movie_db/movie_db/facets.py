@@ -0,0 +1,219 @@
+"""
+Faceted browsing of the home feed by decade and year, director and average
+rating band.
+
+``Filters.from_query(request.GET)`` reads the selected values (malformed ones
+are ignored, like a bad cursor) and ``apply()`` narrows a Movie queryset to
+them; the keyset cursor is just another parameter, so filtered feeds page
+like the unfiltered one.
+
+``counts()`` returns how many movies fall under each value of every facet in
+one query: a UNION ALL of one GROUP BY per facet. Each facet is counted with
+the other facets' filters applied but not its own, so the alternatives to a
+selected value keep their counts. The home page only runs it to render its
+"home_facets" fragment, which is cached per filter combination until the
+"catalog" generation changes.
+"""
+from dataclasses import asdict, dataclass, fields, replace
+from urllib.parse import urlencode
+
+from django.db.models import Case, Count, F, IntegerField, Q, QuerySet, Value, When
+
+from .models import Credit, Movie, MovieInfo
+
+# directors are many; only the ones with the most movies are listed
+DIRECTOR_LIMIT = 15
+
+# band -> label; a band holds averages from its number up to the next one
+RATING_BANDS = {
+    4: "4 ★ and up",
+    3: "3 to 4 ★",
+    2: "2 to 3 ★",
+    1: "Under 2 ★",
+}
+
+
+@dataclass(frozen=True)
+class Filters:
+    decade: int | None = None
+    year: int | None = None
+    director: int | None = None
+    rating: int | None = None
+
+    @classmethod
+    def from_query(cls, params) -> "Filters":
+        values = {}
+        for field in fields(cls):
+            try:
+                value = int(params.get(field.name, ""))
+            except ValueError:
+                continue
+            if value > 0:
+                values[field.name] = value
+        if "year" in values:
+            # the decade always follows the year
+            values["decade"] = values["year"] // 10 * 10
+        elif values.get("decade", 0) % 10:
+            del values["decade"]
+        if values.get("rating") not in RATING_BANDS:
+            values.pop("rating", None)
+        return cls(**values)
+
+    def __bool__(self) -> bool:
+        return any(value is not None for value in asdict(self).values())
+
+    def without(self, *names: str) -> "Filters":
+        return replace(self, **dict.fromkeys(names))
+
+    def querystring(self, **changes) -> str:
+        """The URL query of these filters with ``changes``, e.g. ``director=None``."""
+        values = asdict(replace(self, **changes))
+        return urlencode({name: value for name, value in values.items() if value is not None})
+
+
+def _rating_band(band: int) -> Q:
+    # compares sums rather than dividing, so no float rounding at the edges
+    condition = Q(review_count__gt=0, rating_sum__gte=band * F("review_count"))
+    if band < max(RATING_BANDS):
+        condition &= Q(rating_sum__lt=(band + 1) * F("review_count"))
+    return condition
+
+
+def apply(movies: QuerySet, filters: Filters) -> QuerySet:
+    # MovieInfo and a director's credit are unique per movie, so the joins
+    # can't repeat movies and no DISTINCT is needed
+    if filters.year is not None:
+        movies = movies.filter(movie_info__year=filters.year)
+    elif filters.decade is not None:
+        movies = movies.filter(movie_info__year__gte=filters.decade, movie_info__year__lt=filters.decade + 10)
+    if filters.director is not None:
+        movies = movies.filter(credits__role=Credit.DIRECTOR, credits__person_id=filters.director)
+    if filters.rating is not None:
+        movies = movies.filter(_rating_band(filters.rating))
+    return movies
+
+
+def _of_movies(queryset: QuerySet, filters: Filters) -> QuerySet:
+    # rows of other tables restricted to the filtered movies
+    if not filters:
+        return queryset
+    return queryset.filter(movie_id__in=apply(Movie.objects.order_by(), filters).values("id"))
+
+
+def _grouped(queryset: QuerySet, facet: str, value, label=Value("")) -> QuerySet:
+    return (
+        queryset.order_by()
+        .annotate(facet=Value(facet), value=value, label=label)
+        .values("facet", "value", "label")
+        .annotate(count=Count("pk"))
+        .values_list("facet", "value", "label", "count")
+    )
+
+
+def counts(filters: Filters) -> dict[str, list[tuple]]:
+    """
+    ``{facet: [(value, label, count), ...]}`` for every facet, plus
+    ``"total"``: the number of movies matching all the filters.
+    """
+    band = Case(
+        *(When(_rating_band(band), then=Value(band)) for band in RATING_BANDS),
+        output_field=IntegerField(),
+    )
+    # served by the (role, person, movie) index on Credit
+    credits = _of_movies(Credit.objects.filter(role=Credit.DIRECTOR), filters.without("director"))
+    # only the directors with the most movies are listed; SQLite doesn't
+    # allow LIMIT in a part of a UNION, so it's in a subquery
+    top_directors = (
+        credits.order_by()
+        .values("person_id")
+        .annotate(count=Count("pk"))
+        .order_by("-count", "person__name")
+        .values("person_id")[:DIRECTOR_LIMIT]
+    )
+    parts = [
+        _grouped(apply(Movie.objects.all(), filters), "total", Value(0)),
+        # served by the (year, movie) index on MovieInfo
+        _grouped(_of_movies(MovieInfo.objects.all(), filters.without("decade", "year")), "decade", F("year") / 10 * 10),
+        _grouped(credits.filter(person_id__in=top_directors), "director", F("person_id"), F("person__name")),
+        _grouped(apply(Movie.objects.filter(review_count__gt=0), filters.without("rating")), "rating", band),
+    ]
+    if filters.decade is not None:
+        years = MovieInfo.objects.filter(year__gte=filters.decade, year__lt=filters.decade + 10)
+        parts.append(_grouped(_of_movies(years, filters.without("decade", "year")), "year", F("year")))
+    if filters.director is not None:
+        # a selected director stays listed, however few movies they have
+        selected = credits.filter(person_id=filters.director)
+        parts.append(_grouped(selected, "director", F("person_id"), F("person__name")))
+
+    result = {"total": [], "decade": [], "year": [], "director": [], "rating": []}
+    for facet, value, label, count in parts[0].union(*parts[1:], all=True):
+        result[facet].append((value, label, count))
+
+    # the selected director comes twice when among the top ones
+    directors = dict.fromkeys(sorted(result["director"], key=lambda row: (-row[2], row[1])))
+    result["director"] = list(directors)
+    return result
+
+
+@dataclass(frozen=True)
+class Option:
+    label: str
+    count: int
+    query: str
+    active: bool
+
+
+@dataclass(frozen=True)
+class Facet:
+    name: str
+    title: str
+    options: list[Option]
+    # the query without this facet's selection, None when nothing is selected
+    clear_query: str | None
+
+
+@dataclass(frozen=True)
+class Sidebar:
+    # movies matching all the filters
+    total: int
+    facets: list[Facet]
+
+
+def sidebar(filters: Filters) -> Sidebar:
+    result = counts(filters)
+    total = result["total"][0][2] if result["total"] else 0
+
+    def facet(name, title, rows, selected, label, resets=()):
+        # ``resets``: the facets that depend on this one, e.g. the year on the decade
+        cleared = dict.fromkeys([name, *resets])
+        options = [
+            Option(label(value, name_label), count, filters.querystring(**{**cleared, name: value}), value == selected)
+            for value, name_label, count in rows
+            if value is not None
+        ]
+        clear_query = filters.querystring(**cleared) if selected is not None else None
+        return Facet(name, title, options, clear_query)
+
+    facets = [
+        facet(
+            "decade",
+            "Decade",
+            sorted(result["decade"], reverse=True),
+            filters.decade,
+            lambda value, _: f"{value}s",
+            resets=["year"],
+        ),
+    ]
+    if filters.decade is not None:
+        facets.append(facet("year", "Year", sorted(result["year"], reverse=True), filters.year, lambda value, _: str(value)))
+    facets += [
+        facet(
+            "rating",
+            "Average rating",
+            sorted(result["rating"], key=lambda row: row[0] or 0, reverse=True),
+            filters.rating,
+            lambda value, _: RATING_BANDS[value],
+        ),
+        facet("director", "Director", result["director"], filters.director, lambda _, name: name),
+    ]
+    return Sidebar(total, facets)
@@ -101,8 +101,9 @@ class CustomSignupForm(UserCreationForm):
 
 
 class ReviewForm(forms.ModelForm):
-    rating = forms.ChoiceField(
+    rating = forms.TypedChoiceField(
         choices=Review.RATING_CHOICES,
+        coerce=int,
         widget=forms.Select(
             attrs={
                 "class": FORM_CSS_CLASS,
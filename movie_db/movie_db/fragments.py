@@ -0,0 +1,120 @@
+"""
+Versioned fragment caching.
+
+Rendered template fragments are cached under keys that embed generation
+counters. Writes never delete cache entries: the signals below bump the
+relevant generation, so the next read simply misses and re-renders.
+
+Entries carry a soft expiry shorter than their cache timeout. When it passes,
+one request re-renders the fragment under a short lock while concurrent
+requests keep serving the stale copy, so a popular fragment expiring (or being
+invalidated) never triggers a stampede of identical renders.
+"""
+import random
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_PREFIX = "gen:"
+FRAGMENT_PREFIX = "fragment:"
+
+FRAGMENT_TTL = 300
+# entries outlive their soft expiry so a stale copy is there to serve
+STALE_TTL = 3600
+LOCK_TIMEOUT = 10
+# how long a request without any copy waits for another one's render
+LOCK_WAIT = 0.5
+
+# generations each cached fragment depends on, by fragment name
+FRAGMENT_GENERATIONS = {
+    "home_stats": lambda: ["movies", "users"],
+    "home_facets": lambda filter_query: ["catalog"],
+    "movie_card": lambda movie_id: [f"movie:{movie_id}"],
+    "movie_poster": lambda movie_id: [f"movie:{movie_id}"],
+    "movie_header": lambda movie_id: [f"movie:{movie_id}"],
+}
+
+
+def generations(names: list[str]) -> list[int]:
+    keys = [GENERATION_PREFIX + name for name in names]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            # start from the clock rather than 0: a counter that got evicted
+            # must not come back with a value it already had
+            if cache.add(key, time.time_ns(), timeout=None):
+                cache.set(f"{key}:at", time.time(), timeout=None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def bump(*names: str) -> None:
+    now = time.time()
+    for name in names:
+        key = GENERATION_PREFIX + name
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+    # when each generation last changed, for Last-Modified headers
+    cache.set_many({f"{GENERATION_PREFIX}{name}:at": now for name in names}, timeout=None)
+
+
+def last_changed(names: list[str]) -> float | None:
+    """Timestamp of the most recent bump of any of ``names``, if known."""
+    keys = [f"{GENERATION_PREFIX}{name}:at" for name in names]
+    timestamps = cache.get_many(keys)
+    if len(timestamps) < len(keys):
+        # counters that don't exist yet are stamped when they're created
+        generations(names)
+        timestamps = cache.get_many(keys)
+        if len(timestamps) < len(keys):
+            return None
+    return max(timestamps.values())
+
+
+def bump_on_commit(*names: str) -> None:
+    # bumping before commit would let a concurrent request re-render (and
+    # cache) the old data under the new generation
+    transaction.on_commit(lambda: bump(*names))
+
+
+def invalidate_movies(movie_ids) -> None:
+    # "catalog" changes with any movie, for pages listing many of them
+    bump_on_commit("catalog", *(f"movie:{movie_id}" for movie_id in movie_ids))
+
+
+def fragment_key(name: str, args: tuple) -> str:
+    versions = generations(FRAGMENT_GENERATIONS[name](*args))
+    parts = [name, *map(str, args), *map(str, versions)]
+    return FRAGMENT_PREFIX + ":".join(parts)
+
+
+def get_or_render(name: str, args: tuple, render) -> str:
+    key = fragment_key(name, args)
+    entry = cache.get(key)
+    if entry is not None and entry[0] > time.time():
+        return entry[1]
+
+    lock_key = key + ":lock"
+    if not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        # someone else is rendering this fragment
+        if entry is not None:
+            return entry[1]
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[1]
+        return render()
+
+    try:
+        content = render()
+        # jittered, so fragments cached together don't all expire together
+        soft_expiry = time.time() + FRAGMENT_TTL * random.uniform(0.9, 1.1)
+        cache.set(key, (soft_expiry, content), timeout=STALE_TTL)
+    finally:
+        cache.delete(lock_key)
+    return content
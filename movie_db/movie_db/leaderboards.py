@@ -0,0 +1,119 @@
+"""
+Materialized "top rated" and "trending" leaderboards.
+
+Ranking on request would aggregate every review, so ``refresh()`` stores the
+first ``SIZE`` movies of a board as ``LeaderboardEntry`` rows numbered by
+rank. Page ``n`` of a board is then the rank range of that page: one lookup
+on the (board, rank) index, however deep the page.
+
+Top rated orders movies by a Bayesian average: their ratings plus
+``PRIOR_WEIGHT`` phantom ratings at the catalog-wide mean, so one 5-star
+review doesn't outrank hundreds of 4.8s. It reads the denormalized aggregates
+on Movie, not the reviews.
+
+Trending sums each movie's recent reviews weighted by 2 ** (-age / HALF_LIFE),
+from hourly counts over the last ``WINDOW``, where the weight has all but
+vanished anyway.
+
+Review writes schedule a refresh of both boards ``REFRESH_DELAY`` later,
+coalescing the writes in between into one job. Trending also decays without
+any writes, so ``manage.py refresh_leaderboards`` should run on a schedule
+as well.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from jobs.queue import enqueue
+
+from . import fragments
+from .models import LeaderboardEntry, Movie, Review
+
+SIZE = 1000
+PRIOR_WEIGHT = 10
+HALF_LIFE = timedelta(days=2)
+WINDOW = timedelta(days=14)
+REFRESH_DELAY = timedelta(minutes=1)
+REFRESH_SCHEDULED_KEY = "leaderboards:refresh-scheduled"
+
+BOARDS = [board for board, _ in LeaderboardEntry.BOARD_CHOICES]
+
+
+def top_rated() -> list[tuple[int, float]]:
+    totals = Movie.objects.aggregate(ratings=Sum("rating_sum"), reviews=Sum("review_count"))
+    if not totals["reviews"]:
+        return []
+    mean = totals["ratings"] / totals["reviews"]
+    score = ExpressionWrapper(
+        (F("rating_sum") + PRIOR_WEIGHT * mean) / (F("review_count") + PRIOR_WEIGHT), output_field=FloatField()
+    )
+    ranked = (
+        Movie.objects.filter(review_count__gt=0)
+        .annotate(score=score)
+        .order_by("-score", "id")
+        .values_list("id", "score")
+    )
+    return list(ranked[:SIZE])
+
+
+def trending(now=None) -> list[tuple[int, float]]:
+    now = now or timezone.now()
+    # the created_at index narrows this to the window; grouping by hour
+    # keeps the rows returned to movies x active hours
+    hourly = (
+        Review.objects.filter(created_at__gte=now - WINDOW)
+        .annotate(hour=TruncHour("created_at"))
+        .values("movie_id", "hour")
+        .annotate(reviews=Count("id"))
+        .order_by()
+    )
+    scores = {}
+    for row in hourly:
+        # weighted from the middle of the hour
+        age = now - row["hour"] - timedelta(minutes=30)
+        weight = 0.5 ** (max(age, timedelta()) / HALF_LIFE)
+        scores[row["movie_id"]] = scores.get(row["movie_id"], 0.0) + row["reviews"] * weight
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return ranked[:SIZE]
+
+
+RANKINGS = {
+    LeaderboardEntry.TOP_RATED: top_rated,
+    LeaderboardEntry.TRENDING: trending,
+}
+
+
+def refresh(board: str) -> int:
+    """Recompute ``board`` and replace its stored entries, returns how many."""
+    ranked = RANKINGS[board]()
+    now = timezone.now()
+    entries = [
+        LeaderboardEntry(board=board, rank=rank, movie_id=movie_id, score=score, computed_at=now)
+        for rank, (movie_id, score) in enumerate(ranked, start=1)
+    ]
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(board=board).delete()
+        LeaderboardEntry.objects.bulk_create(entries)
+        fragments.bump_on_commit(f"leaderboard:{board}")
+    return len(entries)
+
+
+def page(board: str, number: int, page_size: int):
+    """The movies on page ``number`` of ``board``, read by rank range."""
+    first = (number - 1) * page_size + 1
+    # one extra row tells whether there is a next page
+    return LeaderboardEntry.objects.filter(board=board, rank__gte=first, rank__lte=first + page_size)
+
+
+def schedule_refresh() -> None:
+    # writes before the job runs find it already scheduled; if the cache
+    # loses the key the worst case is a redundant refresh
+    def schedule():
+        if cache.add(REFRESH_SCHEDULED_KEY, True, timeout=REFRESH_DELAY.total_seconds()):
+            enqueue("movie_db.refresh_leaderboards", delay=REFRESH_DELAY)
+
+    transaction.on_commit(schedule)
@@ -0,0 +1,71 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Exists, OuterRef
+
+from movie_db import posters
+from movie_db.models import Movie, PosterRendition
+
+
+def _setup_worker():
+    django.setup()
+
+
+def _render(movie_id: int, poster_name: str):
+    # runs in a worker process: image work only, rows are written by the parent
+    try:
+        return movie_id, posters.render_poster(poster_name), None
+    except Exception as exc:
+        return movie_id, [], f"{type(exc).__name__}: {exc}"
+
+
+class Command(BaseCommand):
+    help = "Generate poster renditions for movies whose renditions are missing or stale."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes (default: CPU count).",
+        )
+        parser.add_argument("--force", action="store_true", help="Re-render every poster.")
+
+    def handle(self, *args, workers=None, force=False, **options):
+        movies = Movie.objects.exclude(poster="")
+        if not force:
+            current = PosterRendition.objects.filter(movie=OuterRef("pk"), source=OuterRef("poster"))
+            movies = movies.filter(~Exists(current))
+        pending = list(movies.values_list("id", "poster"))
+
+        if not pending:
+            self.stdout.write("All poster renditions are up to date.")
+            return
+
+        self.stdout.write(f"Rendering {len(pending)} poster(s) with {workers} worker(s)...")
+        # forked workers must not share the parent's database connection
+        connections.close_all()
+
+        started = time.perf_counter()
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+            futures = [pool.submit(_render, movie_id, poster) for movie_id, poster in pending]
+            for future in as_completed(futures):
+                movie_id, renditions, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"Movie #{movie_id}: {error}")
+                    continue
+                posters.store_renditions(movie_id, renditions)
+                done += 1
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rendered {done} poster(s) in {elapsed:.1f}s ({done / elapsed:.1f}/s), {failed} failed."
+            )
+        )
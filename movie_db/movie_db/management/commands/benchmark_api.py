@@ -0,0 +1,52 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from movie_db.models import Credit, Movie, Person
+
+
+class Command(BaseCommand):
+    help = "Compare response times of the JSON API against the equivalent HTML views."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint.")
+        parser.add_argument("--movie", type=int, help="Movie id for the detail/review endpoints (default: most reviewed).")
+
+    def handle(self, *args, requests=200, movie=None, **options):
+        movie = Movie.objects.get(id=movie) if movie else Movie.objects.order_by("-review_count").first()
+        if movie is None:
+            raise CommandError("The catalog is empty, nothing to benchmark.")
+        director = Person.objects.filter(credits__movie=movie, credits__role=Credit.DIRECTOR).first()
+        query = director.name if director else movie.title
+
+        pairs = [
+            ("movie list", reverse("home"), reverse("api:movie_list")),
+            ("movie detail", reverse("movie_info", args=[movie.id]), reverse("api:movie_detail", args=[movie.id])),
+            ("reviews", reverse("movie_reviews", args=[movie.id]), reverse("api:movie_reviews", args=[movie.id])),
+            ("search", f"{reverse('search')}?q={query}", f"{reverse('api:search')}?q={query}"),
+        ]
+
+        client = Client(HTTP_HOST="localhost")
+        self.stdout.write(f"{'endpoint':<14}{'kind':<6}{'p50 ms':>9}{'p95 ms':>9}{'KiB':>8}")
+        for label, html_url, api_url in pairs:
+            for kind, url in (("html", html_url), ("api", api_url)):
+                timings, size = self._measure(client, url, requests)
+                p50 = statistics.median(timings)
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                self.stdout.write(f"{label:<14}{kind:<6}{p50:>9.2f}{p95:>9.2f}{size / 1024:>8.1f}")
+
+    def _measure(self, client, url, requests):
+        client.get(url)  # warm up caches and connections
+        timings = []
+        size = 0
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}.")
+            size = len(response.content)
+        return timings, size
@@ -0,0 +1,93 @@
+import logging
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate credential stuffing: threads POSTing wrong passwords for random usernames from "
+        "random IPs to the login view at a fixed offered rate, with and without rate limiting, and "
+        "report the CPU the process spent. Runs on a throwaway test database and cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent attackers.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run.")
+        parser.add_argument("--attack-rate", type=float, default=50.0, help="Login attempts offered per second.")
+        parser.add_argument(
+            "--all-rate",
+            help="Override the login view's site-wide rate (its 'all' bucket), e.g. 1/s, to fit the cores available.",
+        )
+
+    def handle(self, *args, threads=8, duration=10.0, attack_rate=50.0, all_rate=None, **options):
+        ratelimits = {"login": {"all": all_rate}} if all_rate else {}
+        old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                cache = {
+                    "default": {
+                        "BACKEND": "config.cache.SQLiteCache",
+                        "LOCATION": Path(directory) / "cache.sqlite3",
+                    }
+                }
+                self.stdout.write(f"{'rate limiting':<15}{'req/s':>9}{'429s':>8}{'logins':>8}{'CPU cores':>11}")
+                for enabled in (False, True):
+                    with override_settings(
+                        CACHES=cache,
+                        RATELIMIT_ENABLED=enabled,
+                        RATELIMITS=ratelimits,
+                        INSTRUMENTATION={"SAMPLE_RATE": 0},
+                    ):
+                        statuses, elapsed, cpu = self._attack(threads, duration, attack_rate)
+                    self.stdout.write(
+                        f"{'on' if enabled else 'off':<15}{sum(statuses.values()) / elapsed:>9.0f}"
+                        f"{statuses[429]:>8}{statuses[200]:>8}{cpu / elapsed:>11.2f}"
+                    )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    def _attack(self, threads, duration, attack_rate):
+        url = reverse("login")
+        stop = threading.Event()
+        interval = threads / attack_rate
+
+        def attacker(seed):
+            rng = random.Random(seed)
+            client = Client(HTTP_HOST="localhost")
+            statuses = Counter()
+            next_at = time.perf_counter()
+            # paced, so the CPU reflects the server's work and not how fast
+            # the attackers spin; one that falls behind sends immediately
+            while not stop.wait(max(next_at - time.perf_counter(), 0)):
+                next_at += interval
+                response = client.post(
+                    url,
+                    {"username": f"victim{rng.randrange(10**6)}", "password": "hunter2"},
+                    REMOTE_ADDR=f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+                )
+                # 200: the form re-rendered with an error, after hashing
+                statuses[response.status_code] += 1
+            return statuses
+
+        # every 429 and slow request would be logged
+        logging.disable(logging.WARNING)
+        try:
+            started, cpu_started = time.perf_counter(), time.process_time()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                futures = [pool.submit(attacker, seed) for seed in range(threads)]
+                time.sleep(duration)
+                stop.set()
+                statuses = sum((future.result() for future in futures), Counter())
+            return statuses, time.perf_counter() - started, time.process_time() - cpu_started
+        finally:
+            logging.disable(logging.NOTSET)
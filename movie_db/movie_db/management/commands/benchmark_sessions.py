@@ -0,0 +1,119 @@
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from django.urls import reverse
+
+from movie_db.benchmarks.seed import USERNAME_PREFIX, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure signed-in request throughput with database sessions on a per-process locmem cache "
+        "(the previous setup) and with cached_db sessions on the shared SQLite cache, in a "
+        "throwaway test database. Requests come from a thread pool, one client per user."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50, help="Signed-in users, each with their own session.")
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per profile.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--save-every-request",
+            action="store_true",
+            help="Also write the session on every request (SESSION_SAVE_EVERY_REQUEST), as sliding expiry does.",
+        )
+        parser.add_argument("urls", nargs="*", help="URLs to request (default: the home page).")
+
+    def handle(self, *args, users=50, requests=2000, concurrency=8, save_every_request=False, urls=None, **options):
+        if users < concurrency:
+            raise CommandError("Use at least as many --users as --concurrency.")
+        with tempfile.TemporaryDirectory() as directory:
+            # a test database file rather than the in-memory one, whose shared
+            # cache locks whole tables and fails concurrent session writes
+            connections["default"].settings_dict["TEST"]["NAME"] = str(Path(directory) / "test.sqlite3")
+            old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+            try:
+                seed(200, users, users * 20)
+                urls = urls or [reverse("home")]
+                profiles = {
+                    "db + locmem": {
+                        "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+                        "CACHES": {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+                    },
+                    "cached_db + sqlite": {
+                        "SESSION_ENGINE": "django.contrib.sessions.backends.cached_db",
+                        "CACHES": {
+                            "default": {
+                                "BACKEND": "config.cache.SQLiteCache",
+                                "LOCATION": Path(directory) / "cache.sqlite3",
+                                "OPTIONS": {"MAX_ENTRIES": 50_000},
+                            }
+                        },
+                    },
+                }
+                self.stdout.write(
+                    f"{'profile':<20}{'url':<24}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'session queries':>17}"
+                )
+                for name, profile in profiles.items():
+                    with override_settings(**profile, SESSION_SAVE_EVERY_REQUEST=save_every_request):
+                        clients = self._sign_in(users)
+                        for url in urls:
+                            self._report(name, url, *self._run(clients, url, requests, concurrency))
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+    def _sign_in(self, users):
+        clients = []
+        for user in User.objects.filter(username__startswith=USERNAME_PREFIX).order_by("id")[:users]:
+            client = Client(HTTP_HOST="localhost")
+            client.force_login(user)
+            clients.append(client)
+        return clients
+
+    def _run(self, clients, url, requests, concurrency):
+        def request(client):
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}.")
+            return (time.perf_counter() - started) * 1000
+
+        # warm up, and count the session table queries of one steady-state request
+        for client in clients:
+            request(client)
+        # sessions are read from the replica on read-only requests
+        captures = [CaptureQueriesContext(connections[alias]) for alias in connections]
+        with ExitStack() as stack:
+            for capture in captures:
+                stack.enter_context(capture)
+            request(clients[0])
+        session_queries = sum(
+            "django_session" in query["sql"] for capture in captures for query in capture.captured_queries
+        )
+
+        def worker(index):
+            # each thread only uses its own share of the clients
+            own = clients[index::concurrency]
+            return [request(own[n % len(own)]) for n in range(requests // concurrency)]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            timings = sorted(timing for results in pool.map(worker, range(concurrency)) for timing in results)
+        elapsed = time.perf_counter() - started
+        return len(timings) / elapsed, timings, session_queries
+
+    def _report(self, name, url, throughput, timings, session_queries):
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{name:<20}{url[:23]:<24}{throughput:>9.0f}{statistics.median(timings):>9.2f}{p99:>9.2f}"
+            f"{session_queries:>17}"
+        )
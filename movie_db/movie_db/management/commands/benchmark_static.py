@@ -0,0 +1,82 @@
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.utils.functional import empty
+from django.views.static import serve
+
+from config import serving
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare django.views.static.serve, which served static and media files before, with "
+        "config.serving: requests per second and bytes sent for a stylesheet, a poster and their "
+        "revalidations, on files collected into a temporary STATIC_ROOT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per case.")
+        parser.add_argument("--poster-size", type=int, default=512 * 1024, help="Bytes in the poster file.")
+
+    def handle(self, *args, requests=2000, poster_size=512 * 1024, **options):
+        with tempfile.TemporaryDirectory() as static_root, tempfile.TemporaryDirectory() as media_root:
+            Path(media_root, "poster.jpg").write_bytes(os.urandom(poster_size))
+            with override_settings(STATIC_ROOT=static_root, MEDIA_ROOT=media_root, DEBUG=False):
+                call_command("collectstatic", interactive=False, verbosity=0)
+                # load the manifest just written
+                staticfiles_storage._wrapped = empty
+                serving._hashed_names.cache_clear()
+                try:
+                    self._compare(static_root, media_root, requests)
+                finally:
+                    staticfiles_storage._wrapped = empty
+                    serving._hashed_names.cache_clear()
+
+    def _compare(self, static_root, media_root, requests):
+        stylesheet = staticfiles_storage.stored_name("css/forms.css")
+        old_static = lambda request, path: serve(request, path, document_root=static_root)
+        old_media = lambda request, path: serve(request, path, document_root=media_root)
+        browser = {"HTTP_ACCEPT_ENCODING": "gzip, deflate, br"}
+        # (case, path, old view, new view, request headers, revalidate too)
+        cases = [
+            ("stylesheet", stylesheet, old_static, serving.serve_static, browser, True),
+            ("poster", "poster.jpg", old_media, serving.serve_media, {}, True),
+            ("poster, 64 KiB range", "poster.jpg", old_media, serving.serve_media, {"HTTP_RANGE": "bytes=0-65535"},
+             False),
+        ]
+        self.stdout.write(f"{'case':<26}{'handler':<10}{'status':>7}{'req/s':>9}{'bytes':>9}  cache-control")
+        for name, path, old, new, headers, revalidate in cases:
+            for handler, view in (("old", old), ("new", new)):
+                self._report(name, handler, path, view, headers, requests)
+                if not revalidate:
+                    continue
+                response = view(RequestFactory().get("/", **headers), path)
+                # and revalidating what that response sent
+                validators = {}
+                if "ETag" in response:
+                    validators["HTTP_IF_NONE_MATCH"] = response["ETag"]
+                if "Last-Modified" in response:
+                    validators["HTTP_IF_MODIFIED_SINCE"] = response["Last-Modified"]
+                response.close()
+                self._report(f"{name} revalidated", handler, path, view, {**browser, **validators}, requests)
+
+    def _report(self, name, handler, path, view, headers, requests):
+        factory = RequestFactory()
+        sent = 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = view(factory.get("/", **headers), path)
+            body = b"".join(response.streaming_content) if response.streaming else response.content
+            response.close()
+            sent = len(body)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{name:<26}{handler:<10}{response.status_code:>7}{requests / elapsed:>9.0f}{sent:>9}  "
+            f"{response.get('Cache-Control', '-')}"
+        )
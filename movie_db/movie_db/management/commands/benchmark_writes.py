@@ -0,0 +1,134 @@
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import Count, F, Sum
+
+from movie_db.models import Movie, Review
+
+# the stock backend with its defaults: rollback journal, deferred
+# transactions and a new connection per request
+BASELINE = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "CONN_MAX_AGE": 0,
+    "OPTIONS": {},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent review writes per second with the stock SQLite settings "
+        "and with the configured connection profile, on copies of the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent writers.")
+        parser.add_argument("--duration", type=float, default=5.0, help="Seconds per profile.")
+        parser.add_argument("--movies", type=int, default=50, help="Movies the writers spread their reviews over.")
+
+    def handle(self, *args, threads=8, duration=5.0, movies=50, **options):
+        default = connections.settings["default"]
+        if default["ENGINE"] not in ("config.sqlite", "django.db.backends.sqlite3"):
+            raise CommandError("This benchmark only applies to SQLite databases.")
+        profiles = {
+            "baseline": {**default, **BASELINE},
+            "configured": default,
+        }
+
+        self.stdout.write(f"{'profile':<12}{'writes/s':>10}{'locked':>8}{'p50 ms':>9}{'p95 ms':>9}")
+        with tempfile.TemporaryDirectory() as directory:
+            for name, profile in profiles.items():
+                alias = f"benchmark_{name}"
+                path = Path(directory) / f"{name}.sqlite3"
+                self._copy_database(default["NAME"], path, wal=name != "baseline")
+                connections.settings[alias] = {**profile, "NAME": str(path)}
+                try:
+                    movie_ids, user_ids = self._seed(alias, threads, movies)
+                    writes, locked, timings = self._run(alias, movie_ids, user_ids, duration)
+                finally:
+                    connections[alias].close()
+                    del connections.settings[alias]
+
+                p50 = statistics.median(timings) if timings else 0
+                p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else p50
+                self.stdout.write(f"{name:<12}{writes / duration:>10.0f}{locked:>8}{p50:>9.2f}{p95:>9.2f}")
+
+    def _copy_database(self, source, destination, wal):
+        # the backup API gives a consistent copy even while the source is in use
+        with sqlite3.connect(source) as original, sqlite3.connect(destination) as copy:
+            original.backup(copy)
+            copy.execute(f"PRAGMA journal_mode = {'WAL' if wal else 'DELETE'}")
+
+    def _seed(self, alias, threads, movies):
+        call_command("migrate", database=alias, verbosity=0)
+        movie_ids = list(Movie.objects.using(alias).order_by("id").values_list("id", flat=True)[:movies])
+        if not movie_ids:
+            raise CommandError("The catalog is empty, add some movies first.")
+
+        usernames = [f"benchmark-writer-{number}" for number in range(threads)]
+        User.objects.using(alias).bulk_create([User(username=name) for name in usernames], ignore_conflicts=True)
+        user_ids = list(User.objects.using(alias).filter(username__in=usernames).values_list("id", flat=True))
+        Review.objects.using(alias).bulk_create(
+            [Review(user_id=user_id, movie_id=movie_id, rating=3) for user_id in user_ids for movie_id in movie_ids],
+            ignore_conflicts=True,
+        )
+        # keep the aggregates consistent with the seeded reviews
+        totals = Review.objects.using(alias).filter(movie_id__in=movie_ids).values("movie_id").annotate(
+            count=Count("id"), total=Sum("rating")
+        )
+        for row in totals:
+            Movie.objects.using(alias).filter(pk=row["movie_id"]).update(review_count=row["count"], rating_sum=row["total"])
+        connections[alias].close()
+        return movie_ids, user_ids
+
+    def _run(self, alias, movie_ids, user_ids, duration):
+        results = []
+        deadline = time.monotonic() + duration
+
+        def writer(user_id):
+            writes = locked = 0
+            timings = []
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    self._edit_review(alias, user_id, random.choice(movie_ids))
+                    writes += 1
+                    timings.append((time.perf_counter() - started) * 1000)
+                except OperationalError as error:
+                    if "locked" not in str(error):
+                        raise
+                    locked += 1
+                finally:
+                    # end of the "request": closes the connection unless it's persistent
+                    connections[alias].close_if_unusable_or_obsolete()
+            connections[alias].close()
+            results.append((writes, locked, timings))
+
+        workers = [threading.Thread(target=writer, args=(user_id,)) for user_id in user_ids]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        return (
+            sum(writes for writes, _, _ in results),
+            sum(locked for _, locked, _ in results),
+            [timing for _, _, timings in results for timing in timings],
+        )
+
+    def _edit_review(self, alias, user_id, movie_id):
+        # what save_review does to an existing review: read its rating, then
+        # write it and the movie aggregates in one transaction
+        with transaction.atomic(using=alias):
+            review = Review.objects.using(alias).get(user_id=user_id, movie_id=movie_id)
+            rating = random.randint(1, 5)
+            Review.objects.using(alias).filter(pk=review.pk).update(rating=rating)
+            Movie.objects.using(alias).filter(pk=movie_id).update(rating_sum=F("rating_sum") + rating - review.rating)
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from movie_db import recommendations
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the precomputed similar movies shown on movie pages from all reviews. "
+        "With --incremental, only movies affected by reviews changed since the last build are recomputed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--incremental", action="store_true", help="Only movies affected by reviews changed since the last build.")
+        parser.add_argument("--movie", type=int, action="append", dest="movie_ids", help="Only this movie (repeatable).")
+        parser.add_argument("--top-k", type=int, default=recommendations.TOP_K, help="Neighbours kept per movie.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Movies written per transaction.")
+
+    def handle(self, *args, incremental=False, movie_ids=None, top_k=recommendations.TOP_K, batch_size=500, **options):
+        if incremental and movie_ids:
+            raise CommandError("Use either --incremental or --movie.")
+        # before reading anything, so reviews written during the build are
+        # picked up by the next incremental one
+        now = timezone.now()
+        if incremental:
+            since = recommendations.last_build()
+            if since is None:
+                raise CommandError("Nothing has been built yet, run a full build first.")
+            if not recommendations.changed_users(since).exists():
+                self.stdout.write("No reviews changed since the last build.")
+                return
+
+        # every similarity depends on all the ratings, so the whole matrix is
+        # loaded even when only a few movies are recomputed
+        started = time.monotonic()
+        matrix = recommendations.RatingMatrix.load()
+        if incremental:
+            movie_ids = recommendations.changed_movie_ids(matrix, since)
+        loaded = time.monotonic()
+        self.stdout.write(
+            f"Loaded {matrix.ratings} ratings by {matrix.users} users of {len(matrix.movie_ids)} movies "
+            f"in {loaded - started:.1f}s"
+        )
+
+        summary = recommendations.build(matrix, movie_ids, k=top_k, batch_size=batch_size, started=now)
+        finished = time.monotonic()
+        self.stdout.write(
+            f"Stored {summary.neighbours} neighbours for {summary.movies} movies in {finished - loaded:.1f}s"
+        )
+        if resource is not None:
+            # kilobytes on Linux
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            self.stdout.write(f"Peak memory: {peak:.0f} MiB")
+        self.stdout.write(self.style.SUCCESS(f"Done in {finished - started:.1f}s."))
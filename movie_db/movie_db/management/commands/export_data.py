@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movie_db import exports
+
+
+class Command(BaseCommand):
+    help = "Stream reviews or the movie catalog out as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=exports.DATASETS)
+        parser.add_argument("--format", choices=list(exports.FORMATS), default="csv")
+        parser.add_argument("--since", help="Only rows updated at or after this ISO 8601 date or datetime.")
+        parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip.")
+        parser.add_argument("--output", "-o", type=Path, help="File to write (default: standard output).")
+
+    def handle(self, *args, dataset, format="csv", since=None, gzip=False, output=None, **options):
+        try:
+            since = exports.parse_since(since) if since else None
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        chunks = exports.export(dataset, format, since, compress=gzip)
+        if output is None:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        with output.open("wb") as destination:
+            for chunk in chunks:
+                destination.write(chunk)
+        self.stderr.write(f"Wrote {dataset} export to {output}.")
@@ -0,0 +1,240 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+
+from jobs.queue import enqueue_many
+from movie_db import fragments
+from movie_db.models import Credit, Movie, MovieInfo, Person
+
+POSTER_DIR = Movie._meta.get_field("poster").upload_to
+# legacy CSV layout, one column per billed actor
+ACTOR_FIELDS = ["actor1", "actor2", "actor3", "actor4"]
+
+
+class RecordError(ValueError):
+    pass
+
+
+def read_records(path: Path, file_format: str):
+    """Stream records from a CSV or JSONL file, one dict at a time."""
+    with path.open(newline="", encoding="utf-8") as source:
+        if file_format == "csv":
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def normalize(record: dict) -> dict:
+    title = (record.get("title") or "").strip()
+    if not title:
+        raise RecordError("missing title")
+    try:
+        year = int(record.get("year"))
+    except (TypeError, ValueError):
+        raise RecordError(f"{title!r}: invalid year {record.get('year')!r}")
+
+    # people come as JSON lists, as "; "-separated cells (the export_data
+    # layout) or, for the cast, as actor1..actor4 columns
+    cast = record.get("cast")
+    if cast is None:
+        cast = [record.get(field) for field in ACTOR_FIELDS]
+
+    return {
+        "title": title,
+        "description": (record.get("description") or "").strip(),
+        "poster": (record.get("poster") or "").strip(),
+        "year": year,
+        Credit.DIRECTOR: _names(record.get("director")),
+        Credit.ACTOR: _names(cast),
+    }
+
+
+def _names(value) -> list[str]:
+    if isinstance(value, str):
+        value = value.split(";")
+    names = (str(name).strip() for name in value or [] if name)
+    # billing order is kept, repeats are dropped
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def ingest_poster(source: Path) -> str:
+    """
+    Validate a poster image and copy it into media storage.
+
+    Files are named after their content hash, so re-importing the same poster
+    (e.g. when resuming after a crash) reuses the stored copy.
+    """
+    data = source.read_bytes()
+    try:
+        # verify the bytes already in memory instead of reading the file twice
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+    except (UnidentifiedImageError, OSError):
+        raise RecordError(f"invalid poster {source}: not a readable image")
+
+    name = f"{POSTER_DIR}/{hashlib.sha256(data).hexdigest()[:20]}{source.suffix.lower()}"
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+class Command(BaseCommand):
+    help = "Bulk import (upsert) movies and their details from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path, help="CSV or JSONL file, one movie per row.")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from the file extension).")
+        parser.add_argument("--poster-dir", type=Path, help="Directory poster paths are relative to (default: the input file's).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows upserted per transaction.")
+        parser.add_argument("--workers", type=int, default=8, help="Threads reading and validating posters.")
+        parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and import from the first row.")
+
+    def handle(self, *args, path, format=None, poster_dir=None, batch_size=1000, workers=8, restart=False, **options):
+        if not path.is_file():
+            raise CommandError(f"{path} does not exist.")
+        file_format = format or ("jsonl" if path.suffix.lower() in (".jsonl", ".ndjson") else "csv")
+        self.poster_dir = poster_dir or path.parent
+        # poster path -> future, so a poster shared by many rows is ingested once
+        self.posters = {}
+
+        # the checkpoint records how many input rows are committed, so a
+        # crashed import resumes after the last committed batch
+        checkpoint = path.with_name(path.name + ".checkpoint")
+        skip = 0 if restart or not checkpoint.exists() else int(checkpoint.read_text())
+        if skip:
+            self.stdout.write(f"Resuming after row {skip} (use --restart to start over).")
+
+        records = islice(read_records(path, file_format), skip, None)
+        done = skip
+        imported = failed = 0
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="posters") as pool:
+            while batch := list(islice(records, batch_size)):
+                rows, errors = self._prepare(batch, pool)
+                for error in errors:
+                    self.stderr.write(f"Skipped: {error}")
+                if rows:
+                    self._upsert(rows)
+
+                done += len(batch)
+                imported += len(rows)
+                failed += len(errors)
+                self._write_checkpoint(checkpoint, done)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{done} rows read, {imported} imported, {failed} skipped "
+                    f"({(done - skip) / elapsed:.0f} rows/s)"
+                )
+
+        checkpoint.unlink(missing_ok=True)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} movie(s) in {elapsed:.1f}s, {failed} skipped."))
+
+    def _prepare(self, batch, pool):
+        rows, errors = [], []
+        for record in batch:
+            try:
+                rows.append(normalize(record))
+            except RecordError as error:
+                errors.append(str(error))
+
+        # posters are read and validated concurrently, it's mostly file I/O
+        futures = [self._ingest(pool, row["poster"]) if row["poster"] else None for row in rows]
+        ready = []
+        for row, future in zip(rows, futures):
+            if future is None:
+                errors.append(f"{row['title']!r}: missing poster")
+                continue
+            try:
+                row["poster"] = future.result()
+            except (RecordError, OSError) as error:
+                errors.append(f"{row['title']!r}: {error}")
+                continue
+            ready.append(row)
+
+        # the last occurrence of a title in a batch wins, as it would row by row
+        return list({row["title"]: row for row in ready}.values()), errors
+
+    def _ingest(self, pool, poster):
+        source = self.poster_dir / poster
+        if source not in self.posters:
+            self.posters[source] = pool.submit(ingest_poster, source)
+        return self.posters[source]
+
+    def _upsert(self, rows):
+        with transaction.atomic():
+            previous_posters = dict(
+                Movie.objects.filter(title__in=[row["title"] for row in rows]).values_list("title", "poster")
+            )
+            Movie.objects.bulk_create(
+                [Movie(title=row["title"], description=row["description"], poster=row["poster"]) for row in rows],
+                update_conflicts=True,
+                unique_fields=["title"],
+                update_fields=["description", "poster", "updated_at"],
+            )
+            ids = dict(Movie.objects.filter(title__in=[row["title"] for row in rows]).values_list("title", "id"))
+            MovieInfo.objects.bulk_create(
+                [MovieInfo(movie_id=ids[row["title"]], year=row["year"]) for row in rows],
+                update_conflicts=True,
+                unique_fields=["movie"],
+                update_fields=["year", "updated_at"],
+            )
+            self._replace_credits(rows, ids)
+
+            # bulk writes skip model signals: render new posters and
+            # invalidate cached fragments explicitly
+            enqueue_many(
+                "movie_db.render_poster_renditions",
+                [{"movie_id": ids[row["title"]]} for row in rows if previous_posters.get(row["title"]) != row["poster"]],
+            )
+            fragments.invalidate_movies(ids.values())
+            fragments.bump_on_commit("movies")
+
+    def _replace_credits(self, rows, ids):
+        names = {name for row in rows for role, _ in Credit.ROLE_CHOICES for name in row[role]}
+        Person.objects.bulk_create([Person(name=name) for name in names], ignore_conflicts=True)
+        people = dict(Person.objects.filter(name__in=names).values_list("name", "id"))
+
+        wanted = {
+            ids[row["title"]]: {
+                (role, people[name], order) for role, _ in Credit.ROLE_CHOICES for order, name in enumerate(row[role])
+            }
+            for row in rows
+        }
+        current = defaultdict(set)
+        for movie_id, role, person_id, order in Credit.objects.filter(movie_id__in=wanted).values_list(
+            "movie_id", "role", "person_id", "order"
+        ):
+            current[movie_id].add((role, person_id, order))
+
+        # only rewrite the credits that differ: every credit write also
+        # reindexes its movie for search
+        changed = [movie_id for movie_id, credits in wanted.items() if credits != current[movie_id]]
+        Credit.objects.filter(movie_id__in=changed).delete()
+        Credit.objects.bulk_create(
+            Credit(movie_id=movie_id, role=role, person_id=person_id, order=order)
+            for movie_id in changed
+            for role, person_id, order in wanted[movie_id]
+        )
+
+    def _write_checkpoint(self, checkpoint: Path, rows_done: int):
+        temporary = checkpoint.with_name(checkpoint.name + ".tmp")
+        temporary.write_text(str(rows_done))
+        os.replace(temporary, checkpoint)
@@ -0,0 +1,146 @@
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from movie_db.models import Movie
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the read views in-process, served through the ASGI handler from one event "
+        "loop (as uvicorn runs it) and through the WSGI handler from a thread pool (as a threaded "
+        "WSGI server does). No sockets are involved, so only the handlers and views are compared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests per URL and interface.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once.")
+        parser.add_argument("urls", nargs="*", help="URLs to load (default: home, the most reviewed movie, a search).")
+
+    def handle(self, *args, requests=500, concurrency=16, urls=None, **options):
+        urls = urls or self._default_urls()
+        asgi, wsgi = ASGIHandler(), WSGIHandler()
+
+        self.stdout.write(f"{'url':<32}{'interface':<11}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for url in urls:
+            path, query = urlsplit(url).path, urlsplit(url).query
+            for interface, run in (("asgi", self._run_asgi), ("wsgi", self._run_wsgi)):
+                run(asgi if interface == "asgi" else wsgi, path, query, concurrency, concurrency)  # warm up
+                started = time.perf_counter()
+                results = run(asgi if interface == "asgi" else wsgi, path, query, requests, concurrency)
+                elapsed = time.perf_counter() - started
+
+                timings = sorted(timing for _, timing in results)
+                errors = sum(1 for status, _ in results if status != 200)
+                p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+                self.stdout.write(
+                    f"{url[:31]:<32}{interface:<11}{len(results) / elapsed:>9.0f}"
+                    f"{statistics.median(timings):>9.2f}{p99:>9.2f}{errors:>8}"
+                )
+
+    def _default_urls(self):
+        movie = Movie.objects.order_by("-review_count").first()
+        if movie is None:
+            raise CommandError("The catalog is empty, nothing to load test.")
+        word = movie.title.split()[0]
+        return [reverse("home"), reverse("movie_info", args=[movie.id]), f"{reverse('search')}?q={word}"]
+
+    def _run_asgi(self, application, path, query, requests, concurrency):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"localhost")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("localhost", 80),
+        }
+
+        async def request():
+            body = [{"type": "http.request", "body": b"", "more_body": False}]
+            status = None
+
+            async def receive():
+                if body:
+                    return body.pop()
+                # the client never disconnects, Django cancels this wait
+                await asyncio.Event().wait()
+
+            async def send(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+
+            started = time.perf_counter()
+            await application(dict(scope), receive, send)
+            return status, (time.perf_counter() - started) * 1000
+
+        async def client(count, results):
+            for _ in range(count):
+                results.append(await request())
+
+        async def main():
+            results = []
+            await asyncio.gather(*(client(count, results) for count in _split(requests, concurrency)))
+            return results
+
+        return asyncio.run(main())
+
+    def _run_wsgi(self, application, path, query, requests, concurrency):
+        def request():
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "SCRIPT_NAME": "",
+                "PATH_INFO": path,
+                "QUERY_STRING": query,
+                "SERVER_NAME": "localhost",
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "HTTP_HOST": "localhost",
+                "REMOTE_ADDR": "127.0.0.1",
+                "wsgi.version": (1, 0),
+                "wsgi.url_scheme": "http",
+                "wsgi.input": BytesIO(),
+                "wsgi.errors": sys.stderr,
+                "wsgi.multithread": True,
+                "wsgi.multiprocess": False,
+                "wsgi.run_once": False,
+            }
+            statuses = []
+
+            def start_response(status, headers, exc_info=None):
+                statuses.append(int(status.split()[0]))
+
+            started = time.perf_counter()
+            response = application(environ, start_response)
+            try:
+                b"".join(response)
+            finally:
+                # fires request_finished, as a server would
+                response.close()
+            return statuses[0], (time.perf_counter() - started) * 1000
+
+        def client(count):
+            return [request() for _ in range(count)]
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return [result for results in pool.map(client, _split(requests, concurrency)) for result in results]
+
+
+def _split(total, parts):
+    # spread ``total`` requests over ``parts`` clients
+    return [total // parts + (1 if index < total % parts else 0) for index in range(parts)]
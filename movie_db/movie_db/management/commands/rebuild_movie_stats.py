@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from movie_db import fragments
+from movie_db.models import Movie
+from movie_db.stats import EMPTY_STATS, STAT_FIELDS, computed_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized review aggregates stored on Movie."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report movies whose stored aggregates drifted; exit non-zero if any did.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, check=False, batch_size=500, **options):
+        with transaction.atomic():
+            expected = computed_stats()
+            stale = []
+            for movie in Movie.objects.only("id", "title", *STAT_FIELDS).iterator(chunk_size=batch_size):
+                stats = expected.get(movie.id, EMPTY_STATS)
+                if any(getattr(movie, field) != stats[field] for field in STAT_FIELDS):
+                    for field in STAT_FIELDS:
+                        setattr(movie, field, stats[field])
+                    stale.append(movie)
+
+            for movie in stale:
+                self.stdout.write(f"{'Drifted' if check else 'Fixed'}: {movie.title} (id={movie.id})")
+
+            if check:
+                if stale:
+                    raise CommandError(f"{len(stale)} movie(s) have stale review aggregates.")
+                self.stdout.write(self.style.SUCCESS("All movie review aggregates are consistent."))
+                return
+
+            Movie.objects.bulk_update(stale, STAT_FIELDS, batch_size=batch_size)
+            fragments.invalidate_movies(movie.id for movie in stale)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt review aggregates for {len(stale)} movie(s)."))
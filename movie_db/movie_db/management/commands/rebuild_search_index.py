@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from movie_db import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over the movie catalog."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("Full-text search needs the SQLite FTS5 backend.")
+        indexed = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} movie(s)."))
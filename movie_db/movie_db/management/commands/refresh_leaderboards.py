@@ -0,0 +1,37 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from movie_db import leaderboards
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored top rated and trending leaderboards. Review writes schedule this "
+        "through the job queue, but trending scores decay over time, so also run it on a schedule."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--board", action="append", dest="boards", choices=leaderboards.BOARDS)
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=1,
+            help="Refresh each board this many times and report the median duration, to benchmark it.",
+        )
+
+    def handle(self, *args, boards=None, repeat=1, **options):
+        for board in boards or leaderboards.BOARDS:
+            durations = []
+            for _ in range(max(repeat, 1)):
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    entries = leaderboards.refresh(board)
+                durations.append(time.perf_counter() - started)
+            self.stdout.write(
+                f"{board}: {entries} entries in {statistics.median(durations) * 1000:.1f} ms "
+                f"({len(queries.captured_queries)} queries)"
+            )
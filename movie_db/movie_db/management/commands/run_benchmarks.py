@@ -0,0 +1,104 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from movie_db import leaderboards, recommendations
+from movie_db.benchmarks import runner, scenarios
+from movie_db.benchmarks.seed import seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with synthetic data, request every URL of the site through "
+        "the test client and report latency percentiles, queries per request and peak memory. "
+        "With --baseline, fail if anything regressed against a previous run's JSON results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movies", type=int, default=2000)
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--reviews", type=int, default=20000)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic data.")
+        parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of movie popularity and user activity.")
+        parser.add_argument("--requests", type=int, default=50, help="Timed requests per scenario.")
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="names",
+            help="Only run scenarios whose name contains this (repeatable).",
+        )
+        parser.add_argument("-o", "--output", help="Write the results to this JSON file.")
+        parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed growth of latency and memory over the baseline, as a fraction (default 0.25).",
+        )
+        parser.add_argument("--noise-ms", type=float, default=1.0, help="Latency slack on top of --tolerance.")
+
+    def handle(self, *args, **options):
+        selected = [
+            scenario
+            for scenario in scenarios.SCENARIOS
+            if not options["names"] or any(name in scenario.name for name in options["names"])
+        ]
+        if not selected:
+            raise CommandError("No scenario matches --scenario.")
+        baseline = json.loads(Path(options["baseline"]).read_text()) if options["baseline"] else None
+        dataset = {key: options[key] for key in ("movies", "users", "reviews", "seed", "skew")}
+
+        # the test runner's database setup: fresh, migrated and thrown away after
+        old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+        try:
+            started = time.monotonic()
+            seed(
+                dataset["movies"],
+                dataset["users"],
+                dataset["reviews"],
+                random_seed=dataset["seed"],
+                skew=dataset["skew"],
+            )
+            # so the movie pages show their similar movies
+            recommendations.build(recommendations.RatingMatrix.load())
+            for board in leaderboards.BOARDS:
+                leaderboards.refresh(board)
+            self.stdout.write(f"Seeded {dataset} in {time.monotonic() - started:.1f}s")
+            try:
+                # every scenario comes from one IP and repeats the same logins
+                with override_settings(RATELIMIT_ENABLED=False):
+                    results = runner.run(selected, scenarios.fixtures(), options["requests"], dataset)
+            except runner.ScenarioError as error:
+                raise CommandError(error)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        self._report(results)
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2) + "\n")
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline:
+            try:
+                regressions = runner.compare(results, baseline, options["tolerance"], options["noise_ms"])
+            except ValueError as error:
+                raise CommandError(error)
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(f"Regressed: {regression}")
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}."))
+
+    def _report(self, results):
+        self.stdout.write(
+            f"{'scenario':<28}{'method':<7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'peak KiB':>10}"
+        )
+        for name, result in results["scenarios"].items():
+            self.stdout.write(
+                f"{name:<28}{result['method']:<7}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                f"{result['p99_ms']:>9.2f}{result['queries']:>9}{result['peak_memory_kib']:>10.0f}"
+            )
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movie_db.benchmarks.seed import seed as seed_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Add synthetic movies, people, users and reviews with skewed popularity to the database. "
+        "run_benchmarks seeds its own throwaway database; this is for loading a real one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movies", type=int, default=2000)
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--reviews", type=int, default=20000)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same data.")
+        parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of movie popularity and user activity.")
+
+    def handle(self, *args, movies=2000, users=500, reviews=20000, seed=0, skew=1.1, **options):
+        started = time.monotonic()
+        summary = seed_database(movies, users, reviews, random_seed=seed, skew=skew)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Added {summary.movies} movies, {summary.users} users and {summary.reviews} reviews "
+                f"crediting {summary.people} people in {time.monotonic() - started:.1f}s."
+            )
+        )
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:02
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_review_aggregates(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Movie = apps.get_model('movie_db', 'Movie')
+    Review = apps.get_model('movie_db', 'Review')
+
+    histogram = {
+        f'rating_{rating}_count': Count('id', filter=Q(rating=rating))
+        for rating in range(1, 6)
+    }
+    rows = (
+        Review.objects.using(db).order_by()
+        .values('movie_id')
+        .annotate(review_count=Count('id'), rating_sum=Sum('rating'), **histogram)
+    )
+    for row in rows:
+        Movie.objects.using(db).filter(pk=row.pop('movie_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_db', '0006_alter_review_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_review_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Full-text search index over the movie catalog (SQLite FTS5 only).
+
+from django.db import migrations
+
+FTS_TABLE = 'movie_db_movie_fts'
+
+INDEX_MOVIES = f'''
+    INSERT INTO {FTS_TABLE}(rowid, title, description, director, actors)
+    SELECT m.id, m.title, m.description,
+        (SELECT group_concat(i.director, ' ') FROM movie_db_movieinfo i WHERE i.movie_id = m.id),
+        (SELECT group_concat(i.actor1 || ' ' || i.actor2 || ' ' || i.actor3 || ' ' || i.actor4, ' ')
+            FROM movie_db_movieinfo i WHERE i.movie_id = m.id)
+    FROM movie_db_movie m
+'''
+
+# (re)index a single movie, {movie_id} is NEW.id / OLD.movie_id / ... in triggers
+REFRESH_MOVIE = f'''
+    DELETE FROM {FTS_TABLE} WHERE rowid = {{movie_id}};
+    {INDEX_MOVIES} WHERE m.id = {{movie_id}};
+'''
+
+TRIGGERS = {
+    'movie_db_movie_fts_ai': ('AFTER INSERT ON movie_db_movie', REFRESH_MOVIE.format(movie_id='NEW.id')),
+    'movie_db_movie_fts_au': (
+        'AFTER UPDATE OF title, description ON movie_db_movie',
+        REFRESH_MOVIE.format(movie_id='NEW.id'),
+    ),
+    'movie_db_movie_fts_ad': ('AFTER DELETE ON movie_db_movie', f'DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;'),
+    'movie_db_movieinfo_fts_ai': ('AFTER INSERT ON movie_db_movieinfo', REFRESH_MOVIE.format(movie_id='NEW.movie_id')),
+    'movie_db_movieinfo_fts_au': (
+        'AFTER UPDATE ON movie_db_movieinfo',
+        REFRESH_MOVIE.format(movie_id='OLD.movie_id') + REFRESH_MOVIE.format(movie_id='NEW.movie_id'),
+    ),
+    'movie_db_movieinfo_fts_ad': ('AFTER DELETE ON movie_db_movieinfo', REFRESH_MOVIE.format(movie_id='OLD.movie_id')),
+}
+
+
+# SQLite drops a table's triggers (and chokes on triggers referring to it)
+# when Django remakes the table to alter it, so migrations altering
+# movie_db_movie or movie_db_movieinfo drop these first and recreate them after
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, (event, body) in TRIGGERS.items():
+        schema_editor.execute(f'CREATE TRIGGER {name} {event} BEGIN {body} END')
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def create_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+        f"title, description, director, actors, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    create_triggers(apps, schema_editor)
+
+    # index whatever is already in the catalog
+    schema_editor.execute(INDEX_MOVIES)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    drop_triggers(apps, schema_editor)
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_db', '0008_review_movie_recent_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
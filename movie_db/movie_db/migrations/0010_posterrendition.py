@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_db', '0009_movie_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PosterRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=4)),
+                ('image', models.ImageField(upload_to='posters/renditions')),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('size', models.PositiveIntegerField(help_text='File size in bytes')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='poster_renditions', to='movie_db.movie')),
+            ],
+            options={
+                'ordering': ['format', 'width'],
+                'constraints': [models.UniqueConstraint(fields=('movie', 'format', 'width'), name='one_rendition_per_size')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:12
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Max
+
+fts = import_module('movie_db.migrations.0009_movie_fts')
+
+
+def drop_duplicate_infos(apps, schema_editor):
+    db = schema_editor.connection.alias
+    # keep the most recent details of each movie
+    MovieInfo = apps.get_model('movie_db', 'MovieInfo')
+    latest = MovieInfo.objects.using(db).values('movie_id').annotate(latest=Max('id')).values('latest')
+    MovieInfo.objects.using(db).exclude(id__in=latest).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_db', '0010_posterrendition'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_infos, migrations.RunPython.noop),
+        # adding the constraint remakes the table on SQLite
+        migrations.RunPython(fts.drop_triggers, fts.create_triggers),
+        migrations.AddConstraint(
+            model_name='movieinfo',
+            constraint=models.UniqueConstraint(fields=('movie',), name='one_info_per_movie'),
+        ),
+        migrations.RunPython(fts.create_triggers, fts.drop_triggers),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:16
+
+from importlib import import_module
+
+from django.conf import settings
+from django.db import migrations, models
+
+fts = import_module('movie_db.migrations.0009_movie_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_db', '0011_movieinfo_one_per_movie'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # adding NOT NULL columns remakes both tables on SQLite
+        migrations.RunPython(fts.drop_triggers, fts.create_triggers),
+        migrations.AddField(
+            model_name='movie',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='movieinfo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(fts.create_triggers, fts.drop_triggers),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['updated_at'], name='review_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,204 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:18
+
+from collections import defaultdict
+from importlib import import_module
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+previous_fts = import_module('movie_db.migrations.0009_movie_fts')
+
+FTS_TABLE = 'movie_db_movie_fts'
+
+# people are indexed from credits now, the FTS table itself is unchanged
+INDEX_MOVIES = f'''
+    INSERT INTO {FTS_TABLE}(rowid, title, description, director, actors)
+    SELECT m.id, m.title, m.description,
+        (SELECT group_concat(p.name, ' ') FROM movie_db_credit c JOIN movie_db_person p ON p.id = c.person_id
+            WHERE c.movie_id = m.id AND c.role = 'director'),
+        (SELECT group_concat(p.name, ' ') FROM movie_db_credit c JOIN movie_db_person p ON p.id = c.person_id
+            WHERE c.movie_id = m.id AND c.role = 'actor')
+    FROM movie_db_movie m
+'''
+
+# (re)index the movies matching {movies}, a condition on m.id
+REFRESH_MOVIES = f'''
+    DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT m.id FROM movie_db_movie m WHERE {{movies}});
+    {INDEX_MOVIES} WHERE {{movies}};
+'''
+
+
+def _refresh(movie_id):
+    return REFRESH_MOVIES.format(movies=f'm.id = {movie_id}')
+
+
+TRIGGERS = {
+    'movie_db_movie_fts_ai': ('AFTER INSERT ON movie_db_movie', _refresh('NEW.id')),
+    'movie_db_movie_fts_au': ('AFTER UPDATE OF title, description ON movie_db_movie', _refresh('NEW.id')),
+    'movie_db_movie_fts_ad': ('AFTER DELETE ON movie_db_movie', f'DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;'),
+    'movie_db_credit_fts_ai': ('AFTER INSERT ON movie_db_credit', _refresh('NEW.movie_id')),
+    'movie_db_credit_fts_au': (
+        'AFTER UPDATE ON movie_db_credit',
+        _refresh('OLD.movie_id') + _refresh('NEW.movie_id'),
+    ),
+    'movie_db_credit_fts_ad': ('AFTER DELETE ON movie_db_credit', _refresh('OLD.movie_id')),
+    'movie_db_person_fts_au': (
+        'AFTER UPDATE OF name ON movie_db_person',
+        REFRESH_MOVIES.format(movies='m.id IN (SELECT movie_id FROM movie_db_credit WHERE person_id = NEW.id)'),
+    ),
+}
+
+
+# as in 0009: migrations remaking movie_db_movie, movie_db_credit or
+# movie_db_person on SQLite drop these first and recreate them after
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, (event, body) in TRIGGERS.items():
+        schema_editor.execute(f'CREATE TRIGGER {name} {event} BEGIN {body} END')
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def reindex_from_credits(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    create_triggers(apps, schema_editor)
+    schema_editor.execute(f'DELETE FROM {FTS_TABLE}')
+    schema_editor.execute(INDEX_MOVIES)
+
+
+def copy_credits(apps, schema_editor):
+    db = schema_editor.connection.alias
+    MovieInfo = apps.get_model('movie_db', 'MovieInfo')
+    Person = apps.get_model('movie_db', 'Person')
+    Credit = apps.get_model('movie_db', 'Credit')
+
+    rows = [
+        (movie_id, director.strip(), [actor.strip() for actor in actors])
+        for movie_id, director, *actors in MovieInfo.objects.using(db).values_list(
+            'movie_id', 'director', 'actor1', 'actor2', 'actor3', 'actor4'
+        )
+    ]
+    names = {name for _, director, actors in rows for name in [director, *actors] if name}
+    Person.objects.using(db).bulk_create([Person(name=name) for name in sorted(names)], batch_size=1000)
+    people = dict(Person.objects.using(db).values_list('name', 'id'))
+
+    credits = []
+    for movie_id, director, actors in rows:
+        if director:
+            credits.append(Credit(movie_id=movie_id, person_id=people[director], role='director', order=0))
+        # the same actor listed twice keeps their first billing
+        for order, name in enumerate(dict.fromkeys(actor for actor in actors if actor)):
+            credits.append(Credit(movie_id=movie_id, person_id=people[name], role='actor', order=order))
+    Credit.objects.using(db).bulk_create(credits, batch_size=1000)
+
+
+def restore_columns(apps, schema_editor):
+    db = schema_editor.connection.alias
+    MovieInfo = apps.get_model('movie_db', 'MovieInfo')
+    Credit = apps.get_model('movie_db', 'Credit')
+
+    names = defaultdict(lambda: defaultdict(list))
+    for movie_id, role, name in Credit.objects.using(db).order_by('order').values_list('movie_id', 'role', 'person__name'):
+        names[movie_id][role].append(name)
+
+    infos = list(MovieInfo.objects.using(db).all())
+    for info in infos:
+        credits = names[info.movie_id]
+        info.director = ', '.join(credits['director'])[:200]
+        actors = (credits['actor'] + [''] * 4)[:4]
+        info.actor1, info.actor2, info.actor3, info.actor4 = (actor[:50] for actor in actors)
+    MovieInfo.objects.using(db).bulk_update(infos, ['director', 'actor1', 'actor2', 'actor3', 'actor4'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_db', '0012_export_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Person',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Credit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('director', 'Director'), ('actor', 'Actor')], max_length=8)),
+                ('order', models.PositiveSmallIntegerField(default=0)),
+                ('movie', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='credits', to='movie_db.movie')),
+                ('person', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='credits', to='movie_db.person')),
+            ],
+            options={
+                'ordering': ['role', 'order'],
+                'indexes': [models.Index(fields=['person', 'role'], name='credit_person_role_idx')],
+                'constraints': [models.UniqueConstraint(fields=('movie', 'role', 'person'), name='one_credit_per_role')],
+            },
+        ),
+        migrations.RunPython(copy_credits, restore_columns),
+        # the old triggers read the columns removed below
+        migrations.RunPython(previous_fts.drop_triggers, previous_fts.create_triggers),
+        # defaults only so that reversing can add the columns back
+        migrations.AlterField(
+            model_name='movieinfo',
+            name='director',
+            field=models.CharField(default='', max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='movieinfo',
+            name='actor1',
+            field=models.CharField(default='', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='movieinfo',
+            name='actor2',
+            field=models.CharField(default='', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='movieinfo',
+            name='actor3',
+            field=models.CharField(default='', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='movieinfo',
+            name='actor4',
+            field=models.CharField(default='', max_length=50),
+        ),
+        migrations.RemoveField(
+            model_name='movieinfo',
+            name='actor1',
+        ),
+        migrations.RemoveField(
+            model_name='movieinfo',
+            name='actor2',
+        ),
+        migrations.RemoveField(
+            model_name='movieinfo',
+            name='actor3',
+        ),
+        migrations.RemoveField(
+            model_name='movieinfo',
+            name='actor4',
+        ),
+        migrations.RemoveField(
+            model_name='movieinfo',
+            name='director',
+        ),
+        migrations.RunPython(reindex_from_credits, drop_triggers),
+    ]
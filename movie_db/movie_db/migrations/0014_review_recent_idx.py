@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_db', '0013_people_and_credits'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['-created_at', '-id'], name='review_recent_idx'),
+        ),
+    ]
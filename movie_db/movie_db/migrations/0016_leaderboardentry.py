@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_db', '0015_similarmovie'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('top-rated', 'Top rated'), ('trending', 'Trending')], max_length=20)),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movie_db.movie')),
+            ],
+            options={
+                'ordering': ['board', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('board', 'rank'), name='one_movie_per_rank')],
+            },
+        ),
+    ]
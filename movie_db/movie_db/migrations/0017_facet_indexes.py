@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie_db', '0016_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='credit',
+            index=models.Index(fields=['role', 'person', 'movie'], name='credit_role_person_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movieinfo',
+            index=models.Index(fields=['year', 'movie'], name='movieinfo_year_idx'),
+        ),
+    ]
@@ -6,29 +6,184 @@ class Movie(models.Model):
     title = models.CharField(max_length=200, unique=True)
     description = models.TextField()
     poster = models.ImageField(upload_to="posters")
+    # catalog edits only, review aggregates don't touch it; drives
+    # incremental exports
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # denormalized review aggregates, maintained by the review views through
+    # movie_db.stats and rebuilt with `manage.py rebuild_movie_stats`
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.title
 
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return None
+        return round(self.rating_sum / self.review_count, 1)
+
+    @property
+    def rating_histogram(self):
+        return [
+            (stars, getattr(self, f"rating_{stars}_count"))
+            for stars in range(5, 0, -1)
+        ]
+
+
+class PosterRendition(models.Model):
+    FORMAT_CHOICES = [
+        ("webp", "WebP"),
+        ("jpeg", "JPEG"),
+    ]
 
-class MovieInfo(models.Model):
     movie = models.ForeignKey(
-        Movie, on_delete=models.CASCADE, related_name="movie_info"
+        Movie, on_delete=models.CASCADE, related_name="poster_renditions"
     )
+    # name of the original poster this was rendered from, so a replaced
+    # poster is detected and its renditions regenerated
+    source = models.CharField(max_length=255)
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES)
+    image = models.ImageField(upload_to="posters/renditions")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveIntegerField(help_text="File size in bytes")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["movie", "format", "width"], name="one_rendition_per_size")
+        ]
+        ordering = ["format", "width"]
+
+    def __str__(self):
+        return f"{self.format} {self.width}w rendition of movie #{self.movie_id}"
 
-    director = models.CharField(max_length=200)
 
-    actor1 = models.CharField(max_length=50)
-    actor2 = models.CharField(max_length=50)
-    actor3 = models.CharField(max_length=50)
-    actor4 = models.CharField(max_length=50)
+class MovieInfo(models.Model):
+    movie = models.ForeignKey(
+        Movie, on_delete=models.CASCADE, related_name="movie_info"
+    )
 
     year = models.IntegerField(null=False, blank=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["movie"], name="one_info_per_movie")
+        ]
+        indexes = [
+            # the year facet on the home feed (and the admin's year filter),
+            # covering both filtering by year and counting movies per year
+            models.Index(fields=["year", "movie"], name="movieinfo_year_idx"),
+        ]
 
     def __str__(self):
         return f"info about {self.movie.title}"
 
 
+class Person(models.Model):
+    name = models.CharField(max_length=200, unique=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+
+class Credit(models.Model):
+    DIRECTOR = "director"
+    ACTOR = "actor"
+    ROLE_CHOICES = [
+        (DIRECTOR, "Director"),
+        (ACTOR, "Actor"),
+    ]
+
+    movie = models.ForeignKey(
+        Movie, on_delete=models.CASCADE, related_name="credits", db_index=False
+    )
+    person = models.ForeignKey(
+        Person, on_delete=models.CASCADE, related_name="credits", db_index=False
+    )
+    role = models.CharField(max_length=8, choices=ROLE_CHOICES)
+    # billing order within the role
+    order = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # also the index behind a movie's cast list
+            models.UniqueConstraint(fields=["movie", "role", "person"], name="one_credit_per_role")
+        ]
+        indexes = [
+            # serves person pages: a person's movies by role
+            models.Index(fields=["person", "role"], name="credit_person_role_idx"),
+            # the director facet: a director's movies, and movies per director
+            models.Index(fields=["role", "person", "movie"], name="credit_role_person_idx"),
+        ]
+        ordering = ["role", "order"]
+
+    def __str__(self):
+        return f"{self.person.name} ({self.get_role_display()}) in {self.movie.title}"
+
+
+class SimilarMovie(models.Model):
+    # precomputed "liked this, also liked" neighbours, written by
+    # movie_db.recommendations (`manage.py build_recommendations`)
+    movie = models.ForeignKey(
+        Movie, on_delete=models.CASCADE, related_name="similar_movies", db_index=False
+    )
+    similar = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="+")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    # when the build that wrote this row started; incremental builds pick up
+    # reviews changed after it
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # also the index behind the detail page's "similar movies"
+            models.UniqueConstraint(fields=["movie", "rank"], name="one_similar_per_rank")
+        ]
+        ordering = ["rank"]
+
+    def __str__(self):
+        return f"#{self.rank} similar to movie #{self.movie_id}: movie #{self.similar_id}"
+
+
+class LeaderboardEntry(models.Model):
+    # materialized by movie_db.leaderboards
+    TOP_RATED = "top-rated"
+    TRENDING = "trending"
+    BOARD_CHOICES = [
+        (TOP_RATED, "Top rated"),
+        (TRENDING, "Trending"),
+    ]
+
+    board = models.CharField(max_length=20, choices=BOARD_CHOICES)
+    # 1-based and gapless when written; a deleted movie leaves a hole until
+    # the next refresh
+    rank = models.PositiveIntegerField()
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # also the index pages are read by
+            models.UniqueConstraint(fields=["board", "rank"], name="one_movie_per_rank")
+        ]
+        ordering = ["board", "rank"]
+
+    def __str__(self):
+        return f"{self.get_board_display()} #{self.rank}: movie #{self.movie_id}"
+
+
 class Review(models.Model):
     RATING_CHOICES = [
         (1, "1 Star"),
@@ -51,7 +206,15 @@ class Review(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["user", "movie"], name="one_per_user_per_movie")
         ]
-        ordering = ["-created_at"]
+        indexes = [
+            # serves the per-movie review list and its keyset pagination
+            models.Index(fields=["movie", "-created_at", "-id"], name="review_movie_recent_idx"),
+            # incremental exports
+            models.Index(fields=["updated_at"], name="review_updated_idx"),
+            # the admin changelist: its default ordering and date hierarchy
+            models.Index(fields=["-created_at", "-id"], name="review_recent_idx"),
+        ]
+        ordering = ["-created_at", "-id"]
 
     def __str__(self):
         return f"{self.user.username}'s review of {self.movie.title} - {self.rating}/5"
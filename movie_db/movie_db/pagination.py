@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from django.db.models import Q, QuerySet
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _key(item, name: str):
+    # pages hold model instances, or dicts when paginating a .values() queryset
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: Any = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def parse_id_cursor(value: str | None) -> int | None:
+    # a malformed or missing cursor simply means "start from the top"
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor > 0 else None
+
+
+def _by_id(queryset: QuerySet, after: int | None, page_size: int) -> QuerySet:
+    queryset = queryset.order_by("-id")
+    if after is not None:
+        queryset = queryset.filter(id__lt=after)
+    return queryset[: page_size + 1]
+
+
+def _id_page(items: list, page_size: int) -> KeysetPage:
+    if len(items) > page_size:
+        items = items[:page_size]
+        return KeysetPage(items, next_cursor=_key(items[-1], "id"))
+    return KeysetPage(items)
+
+
+def paginate_by_id(queryset: QuerySet, after: int | None, page_size: int) -> KeysetPage:
+    """
+    Keyset pagination over a queryset ordered by ``-id``.
+
+    Only ``page_size + 1`` rows are fetched: the extra row tells us whether
+    there is a next page without running a separate COUNT query, and the
+    ``id < after`` predicate uses the primary key index however deep we go.
+    """
+    return _id_page(list(_by_id(queryset, after, page_size)), page_size)
+
+
+async def apaginate_by_id(queryset: QuerySet, after: int | None, page_size: int) -> KeysetPage:
+    return _id_page([item async for item in _by_id(queryset, after, page_size)], page_size)
+
+
+def encode_created_cursor(obj) -> str:
+    # "<created_at as epoch microseconds>.<id>", exact and URL-safe
+    created_at = _key(obj, "created_at").astimezone(timezone.utc)
+    micros = (created_at - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}.{_key(obj, 'id')}"
+
+
+def parse_created_cursor(value: str | None) -> tuple[datetime, int] | None:
+    try:
+        micros, pk = (int(part) for part in value.split("."))
+        return EPOCH + timedelta(microseconds=micros), pk
+    except (AttributeError, OverflowError, TypeError, ValueError):
+        return None
+
+
+def _by_created(queryset: QuerySet, after: tuple[datetime, int] | None, page_size: int) -> QuerySet:
+    queryset = queryset.order_by("-created_at", "-id")
+    if after is not None:
+        created_at, pk = after
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    return queryset[: page_size + 1]
+
+
+def _created_page(items: list, page_size: int) -> KeysetPage:
+    if len(items) > page_size:
+        items = items[:page_size]
+        return KeysetPage(items, next_cursor=encode_created_cursor(items[-1]))
+    return KeysetPage(items)
+
+
+def paginate_by_created(
+    queryset: QuerySet, after: tuple[datetime, int] | None, page_size: int
+) -> KeysetPage:
+    """
+    Keyset pagination over a queryset ordered by ``(-created_at, -id)``.
+
+    The id breaks ties between rows created in the same microsecond, so the
+    cursor is always unambiguous.
+    """
+    return _created_page(list(_by_created(queryset, after, page_size)), page_size)
+
+
+async def apaginate_by_created(
+    queryset: QuerySet, after: tuple[datetime, int] | None, page_size: int
+) -> KeysetPage:
+    return _created_page([item async for item in _by_created(queryset, after, page_size)], page_size)
@@ -0,0 +1,106 @@
+"""
+Poster renditions: fixed-width WebP and JPEG copies of each uploaded poster,
+so pages can serve an appropriately sized image through ``srcset`` instead of
+the full-resolution original.
+"""
+import io
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from . import fragments
+from .models import Movie, PosterRendition
+
+RENDITION_WIDTHS = [200, 400, 800]
+
+# Pillow format name and save options per rendition format
+RENDITION_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+RENDITION_DIR = PosterRendition._meta.get_field("image").upload_to
+
+
+def target_widths(original_width: int) -> list[int]:
+    # never upscale: widths above the original collapse into the original width
+    widths = sorted({min(width, original_width) for width in RENDITION_WIDTHS})
+    return widths
+
+
+def render_poster(poster_name: str) -> list[dict]:
+    """
+    Render every rendition of one poster and write the files to storage.
+
+    Pure image and file work with no database access, so it can run in a
+    worker process. Returns the metadata to store as PosterRendition rows.
+    """
+    with default_storage.open(poster_name, "rb") as poster_file:
+        original = Image.open(poster_file)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    # flatten transparency onto white, JPEG has no alpha channel
+    if original.mode not in ("RGB", "L"):
+        background = Image.new("RGB", original.size, "white")
+        background.paste(original, mask=original.convert("RGBA").getchannel("A"))
+        original = background
+    elif original.mode == "L":
+        original = original.convert("RGB")
+
+    stem = PurePosixPath(poster_name).stem
+    renditions = []
+    for width in target_widths(original.width):
+        height = round(original.height * width / original.width)
+        resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+
+        for rendition_format, (pillow_format, options) in RENDITION_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pillow_format, **options)
+            name = default_storage.save(
+                f"{RENDITION_DIR}/{stem}-{width}w.{rendition_format}",
+                ContentFile(buffer.getvalue()),
+            )
+            renditions.append(
+                {
+                    "source": poster_name,
+                    "format": rendition_format,
+                    "image": name,
+                    "width": width,
+                    "height": height,
+                    "size": buffer.tell(),
+                }
+            )
+    return renditions
+
+
+def store_renditions(movie_id: int, renditions: list[dict]) -> None:
+    """Replace a movie's rendition rows, then remove the superseded files."""
+    stale = PosterRendition.objects.filter(movie_id=movie_id)
+    stale_files = list(stale.values_list("image", flat=True))
+
+    # write-only transaction: no read lock is held when SQLite has to upgrade
+    # to a write lock, so concurrent workers queue on the busy timeout
+    # instead of failing with "database is locked"
+    with transaction.atomic():
+        stale.delete()
+        PosterRendition.objects.bulk_create(
+            PosterRendition(movie_id=movie_id, **rendition) for rendition in renditions
+        )
+        # bulk_create sends no post_save, and a first render deletes nothing
+        fragments.invalidate_movies([movie_id])
+
+    for name in stale_files:
+        default_storage.delete(name)
+
+
+def renditions_are_current(movie: Movie) -> bool:
+    return PosterRendition.objects.filter(movie=movie, source=movie.poster.name).exists()
+
+
+def generate_renditions(movie: Movie) -> None:
+    renditions = render_poster(movie.poster.name) if movie.poster else []
+    store_renditions(movie.id, renditions)
@@ -0,0 +1,161 @@
+"""
+Rate limits for the POSTs that are expensive or worth abusing.
+
+::
+
+    @ratelimit("login", ip="10/m", username="5/m", all="30/s")
+    def login_view(request): ...
+
+Each keyword is a bucket: requests are counted per client IP, per submitted
+username, per signed-in user or across all clients (``KEY_FUNCTIONS``), and
+a request over any bucket's rate is answered 429 with ``Retry-After`` before
+the view runs, so before any password hashing. ``settings.RATELIMITS`` can
+override the rates per scope, e.g. ``{"login": {"all": "1/s"}}``. Per-IP and per-username
+buckets stop a single client or a single account being hammered; only the
+``all`` bucket bounds the total, and so the CPU spent hashing, when an
+attack is spread over many IPs and usernames.
+
+Buckets are sliding window counters: the count of the current fixed window
+plus the previous window's count weighted by how much of it still overlaps
+the sliding one. A request is counted in every bucket's current window,
+reading the previous windows at the same time, and then checked against the
+requests counted before it. With ``config.cache.SQLiteCache`` that is one
+transaction (``incr_many``); other backends take a ``get_many`` and an
+``incr`` per bucket. A rejected request is uncounted again, which costs it a
+second round-trip, so only requests that pass every bucket fill the ``all``
+one and a single client flooding its own IP or username buckets doesn't
+spend the site-wide budget.
+
+The ``all`` rates are set far above what one client's IP bucket lets
+through: they take an attack from many IPs to reach, and while it lasts
+they turn away everyone, legitimate users included, to keep the CPU for
+the rest of the site.
+"""
+import hashlib
+import math
+import re
+import time
+from functools import cache as memoize, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+RATE_RE = re.compile(r"^(\d+)/(\d*)([smhd])$")
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# what each bucket counts requests by; None skips the bucket
+KEY_FUNCTIONS = {
+    # behind a reverse proxy, have it set REMOTE_ADDR to the client's address
+    "ip": lambda request: request.META.get("REMOTE_ADDR", ""),
+    "username": lambda request: request.POST.get("username", "").strip().lower() or None,
+    "user": lambda request: str(request.user.pk) if request.user.is_authenticated else None,
+    "all": lambda request: "",
+}
+
+
+@memoize
+def parse_rate(rate: str) -> tuple[int, int]:
+    """``"5/m"`` or ``"100/15m"`` as (requests, period in seconds)."""
+    match = RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate {rate!r}, expected e.g. '5/m' or '100/15m'.")
+    limit, multiplier, unit = match.groups()
+    return int(limit), int(multiplier or 1) * UNITS[unit]
+
+
+def retry_after(limit: int, period: int, previous: int, current: int, elapsed: float) -> float:
+    """Seconds until a window at (previous, current) counts, ``elapsed`` into
+    the current window, would allow another request."""
+    if current >= limit:
+        # the current window's count has to age out of the next window first
+        return period - elapsed + (1 - limit / current) * period
+    # the previous window's weight has to shrink below what's left
+    return max((1 - (limit - current) / previous) * period - elapsed, 0)
+
+
+def _limits(scope: str, rates: dict) -> dict[str, tuple[int, int]]:
+    rates = {**rates, **getattr(settings, "RATELIMITS", {}).get(scope, {})}
+    for bucket in rates:
+        if bucket not in KEY_FUNCTIONS:
+            raise ValueError(f"Unknown rate limit bucket {bucket!r}.")
+    return {bucket: parse_rate(rate) for bucket, rate in rates.items()}
+
+
+def ratelimit(scope: str, methods=("POST",), **rates):
+    _limits(scope, rates)  # fail at import on a bad rate
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods or not getattr(settings, "RATELIMIT_ENABLED", True):
+                return view(request, *args, **kwargs)
+            now = time.time()
+            windows = []
+            for bucket, (limit, period) in _limits(scope, rates).items():
+                identity = KEY_FUNCTIONS[bucket](request)
+                if identity is None:
+                    continue
+                # hashed: usernames are user input, and keys have to be safe
+                digest = hashlib.blake2b(identity.encode(), digest_size=12).hexdigest()
+                index, elapsed = divmod(now, period)
+                prefix = f"ratelimit:{scope}:{bucket}:{digest}:"
+                windows.append((limit, period, elapsed, f"{prefix}{int(index) - 1}", f"{prefix}{int(index)}"))
+
+            if not windows:
+                return view(request, *args, **kwargs)
+
+            # counted in every current window, then checked against the
+            # requests counted before this one
+            counters = {current_key: 2 * period for _, period, _, _, current_key in windows}
+            counts = _incr_many(counters, read=[previous_key for *_, previous_key, _ in windows])
+            for current_key in counters:
+                counts[current_key] -= 1
+            if waits := _over_limit(windows, counts):
+                _incr_many(counters, delta=-1)
+                return too_many_requests(max(waits))
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _over_limit(windows, counts) -> list[float]:
+    """How long to wait for each bucket that ``counts`` puts at its limit."""
+    waits = []
+    for limit, period, elapsed, previous_key, current_key in windows:
+        previous, current = counts.get(previous_key, 0), counts.get(current_key, 0)
+        if previous * (1 - elapsed / period) + current >= limit:
+            waits.append(retry_after(limit, period, previous, current, elapsed))
+    return waits
+
+
+def _incr_many(keys: dict[str, int], delta: int = 1, read=()) -> dict[str, int]:
+    """Add ``delta`` to the ``{key: timeout}`` counters and return their new
+    values, with the values of the ``read`` keys. A negative ``delta`` skips
+    the counters that are gone rather than creating them below zero."""
+    if hasattr(cache, "incr_many"):
+        return cache.incr_many(keys, delta=delta, read=read)
+    counts = cache.get_many(read) if read else {}
+    for key, timeout in keys.items():
+        try:
+            counts[key] = cache.incr(key, delta)
+        except ValueError:
+            if delta < 0:
+                # uncounting a request whose window has expired since
+                continue
+            # the window's first request, or a concurrent one created it first
+            counts[key] = delta if cache.add(key, delta, timeout=timeout) else cache.incr(key, delta)
+    return counts
+
+
+def too_many_requests(wait: float) -> HttpResponse:
+    seconds = max(math.ceil(wait), 1)
+    response = HttpResponse(
+        f"Too many requests, please try again in {seconds} second{'s' if seconds != 1 else ''}.",
+        status=429,
+        content_type="text/plain; charset=utf-8",
+    )
+    response["Retry-After"] = str(seconds)
+    return response
@@ -0,0 +1,204 @@
+"""
+"Users who liked this also liked": item-item collaborative filtering.
+
+``RatingMatrix`` loads every review in chunks into a sparse user x movie
+matrix, held as compact arrays in both row (per user) and column (per movie)
+order. Ratings are centred on each user's mean, which makes the cosine
+below the adjusted cosine: a movie a generous rater gave 4 counts as less
+of an endorsement than one a harsh rater gave 4.
+
+A movie's neighbours are found by walking from its raters to everything
+else they rated, so only movies actually co-rated with it are ever scored.
+The top ``TOP_K`` per movie are stored as ``SimilarMovie`` rows, which the
+detail page reads with one indexed query.
+"""
+import heapq
+import math
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import batched
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import fragments
+from .models import Review, SimilarMovie
+
+CHUNK_SIZE = 5000
+TOP_K = 10
+# neighbours need this many raters in common to be trusted at all
+MIN_SUPPORT = 3
+# shrinks scores resting on few common raters towards 0: n / (n + SHRINKAGE)
+SHRINKAGE = 10
+# prolific raters' reviews cost quadratic time while each says little about
+# any one pair of movies; past this many they're left out
+MAX_USER_RATINGS = 1000
+
+
+class RatingMatrix:
+    def __init__(self):
+        self.movie_ids = []
+        self._movie_index = {}
+        # CSR by user: ratings of user u are at [user_start[u], user_start[u + 1])
+        self.user_start = array("l", [0])
+        self.user_movies = array("l")
+        self.user_values = array("f")
+        # CSC by movie, the same values grouped per movie
+        self.movie_start = array("l")
+        self.movie_users = array("l")
+        self.movie_values = array("f")
+        self.norms = array("d")
+
+    @classmethod
+    def load(cls, reviews=None):
+        matrix = cls()
+        reviews = Review.objects.all() if reviews is None else reviews
+        # grouped by user, the order of the (user, movie) unique index
+        rows = reviews.order_by("user_id", "movie_id").values_list("user_id", "movie_id", "rating")
+        current, ratings = None, []
+        for user_id, movie_id, rating in rows.iterator(chunk_size=CHUNK_SIZE):
+            if user_id != current:
+                matrix._add_user(ratings)
+                current, ratings = user_id, []
+            ratings.append((movie_id, rating))
+        matrix._add_user(ratings)
+        matrix._build_columns()
+        return matrix
+
+    @property
+    def users(self):
+        return len(self.user_start) - 1
+
+    @property
+    def ratings(self):
+        return len(self.user_values)
+
+    def _add_user(self, ratings):
+        # a single rating centres to 0 and can't relate two movies
+        if len(ratings) < 2 or len(ratings) > MAX_USER_RATINGS:
+            return
+        mean = sum(rating for _, rating in ratings) / len(ratings)
+        for movie_id, rating in ratings:
+            index = self._movie_index.get(movie_id)
+            if index is None:
+                index = self._movie_index[movie_id] = len(self.movie_ids)
+                self.movie_ids.append(movie_id)
+            self.user_movies.append(index)
+            self.user_values.append(rating - mean)
+        self.user_start.append(len(self.user_movies))
+
+    def _build_columns(self):
+        counts = array("l", [0]) * (len(self.movie_ids) + 1)
+        for movie in self.user_movies:
+            counts[movie + 1] += 1
+        for movie in range(len(self.movie_ids)):
+            counts[movie + 1] += counts[movie]
+        self.movie_start = array("l", counts)
+
+        self.movie_users = array("l", [0]) * self.ratings
+        self.movie_values = array("f", [0.0]) * self.ratings
+        self.norms = array("d", [0.0]) * len(self.movie_ids)
+        position = array("l", counts[:-1])
+        for user in range(self.users):
+            for offset in range(self.user_start[user], self.user_start[user + 1]):
+                movie, value = self.user_movies[offset], self.user_values[offset]
+                self.movie_users[position[movie]] = user
+                self.movie_values[position[movie]] = value
+                position[movie] += 1
+                self.norms[movie] += value * value
+        self.norms = array("d", map(math.sqrt, self.norms))
+
+    def neighbours(self, movie_id: int, k: int = TOP_K) -> list[tuple[int, float]]:
+        """The ``k`` most similar movies to ``movie_id`` as (movie id, score)."""
+        movie = self._movie_index.get(movie_id)
+        if movie is None or not self.norms[movie]:
+            return []
+
+        dots = defaultdict(float)
+        support = defaultdict(int)
+        start, end = self.movie_start[movie], self.movie_start[movie + 1]
+        for user, value in zip(self.movie_users[start:end], self.movie_values[start:end]):
+            row_start, row_end = self.user_start[user], self.user_start[user + 1]
+            for other, other_value in zip(self.user_movies[row_start:row_end], self.user_values[row_start:row_end]):
+                dots[other] += value * other_value
+                support[other] += 1
+        dots.pop(movie, None)
+
+        scores = []
+        for other, dot in dots.items():
+            common = support[other]
+            if common < MIN_SUPPORT or dot <= 0:
+                continue
+            cosine = dot / (self.norms[movie] * self.norms[other])
+            scores.append((cosine * common / (common + SHRINKAGE), self.movie_ids[other]))
+        return [(other_id, score) for score, other_id in heapq.nlargest(k, scores)]
+
+
+@dataclass
+class BuildSummary:
+    movies: int = 0
+    neighbours: int = 0
+
+
+def changed_users(since):
+    # deletions leave no trace here; a full build picks them up
+    return Review.objects.filter(updated_at__gte=since).values("user_id")
+
+
+def changed_movie_ids(matrix: RatingMatrix, since) -> set[int]:
+    """
+    The movies whose neighbours changed with the reviews written since
+    ``since``. A rating moves its user's mean, so every movie that user rated
+    changes values and norm, and with the norm the score of every movie
+    co-rated with it.
+    """
+    rated = set(Review.objects.filter(user_id__in=changed_users(since)).values_list("movie_id", flat=True).distinct())
+    movie_ids, seen = set(rated), set()
+    for movie_id in rated:
+        movie = matrix._movie_index.get(movie_id)
+        if movie is None:
+            continue
+        start, end = matrix.movie_start[movie], matrix.movie_start[movie + 1]
+        for user in set(matrix.movie_users[start:end]) - seen:
+            seen.add(user)
+            row_start, row_end = matrix.user_start[user], matrix.user_start[user + 1]
+            movie_ids.update(matrix.movie_ids[other] for other in matrix.user_movies[row_start:row_end])
+    return movie_ids
+
+
+def last_build():
+    return SimilarMovie.objects.aggregate(last=Max("computed_at"))["last"]
+
+
+def build(matrix: RatingMatrix, movie_ids=None, k: int = TOP_K, batch_size: int = 500, started=None) -> BuildSummary:
+    """
+    Recompute and store the neighbours of ``movie_ids`` (every rated movie
+    by default), replacing each batch of movies' rows in one transaction.
+    ``started`` is when the ratings were read, by default now.
+    """
+    started = started or timezone.now()
+    full = movie_ids is None
+    movie_ids = matrix.movie_ids if full else movie_ids
+    summary = BuildSummary()
+    for batch in batched(sorted(movie_ids), batch_size):
+        rows = [
+            SimilarMovie(movie_id=movie_id, similar_id=other_id, rank=rank, score=score, computed_at=started)
+            for movie_id in batch
+            for rank, (other_id, score) in enumerate(matrix.neighbours(movie_id, k))
+        ]
+        with transaction.atomic():
+            SimilarMovie.objects.filter(movie_id__in=batch).delete()
+            SimilarMovie.objects.bulk_create(rows)
+            # only the detail pages show neighbours
+            fragments.bump_on_commit(*(f"movie:{movie_id}" for movie_id in batch))
+        summary.movies += len(batch)
+        summary.neighbours += len(rows)
+
+    if full:
+        # movies that lost all their raters since the last build
+        stale = set(SimilarMovie.objects.filter(computed_at__lt=started).values_list("movie_id", flat=True))
+        SimilarMovie.objects.filter(movie_id__in=stale).delete()
+        fragments.bump_on_commit(*(f"movie:{movie_id}" for movie_id in stale))
+    return summary
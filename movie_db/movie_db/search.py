@@ -0,0 +1,142 @@
+"""
+Full-text search over the movie catalog.
+
+On SQLite the catalog is mirrored into an FTS5 virtual table (created and kept
+in sync by triggers, see migrations 0009 and 0013) whose rowid is the movie
+id. Results are ranked with bm25, weighting title matches above people and
+description matches. Other database backends fall back to ``icontains``
+lookups.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
+
+from .models import Credit, Movie
+
+FTS_TABLE = "movie_db_movie_fts"
+
+# bm25 column weights, in FTS column order: title, description, director, actors
+BM25_WEIGHTS = (10.0, 1.0, 4.0, 3.0)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def is_available() -> bool:
+    return connection.vendor == "sqlite"
+
+
+def match_expression(query: str, prefix_last: bool = True, column: str | None = None) -> str:
+    """
+    Turn free user input into a safe FTS5 MATCH expression.
+
+    Every word is quoted (so FTS operators and punctuation in user input are
+    inert) and the words are AND'ed together. The last word is a prefix match
+    so results show up while the user is still typing.
+    """
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return ""
+    terms = [f'"{token}"' for token in tokens]
+    if prefix_last:
+        terms[-1] += "*"
+    expression = " ".join(terms)
+    return f"{{{column}}} : ({expression})" if column else expression
+
+
+def matching_ids(query: str) -> RawSQL:
+    """A subquery of matching movie ids, usable as ``filter(id__in=...)``."""
+    return RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+        [match_expression(query)],
+    )
+
+
+def search_ids(query: str, limit: int, offset: int = 0) -> list[int]:
+    expression = match_expression(query)
+    if not expression:
+        return []
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s",
+            [expression, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_movie_ids(query: str, limit: int, offset: int = 0) -> list[int]:
+    """Ids of the movies matching ``query``, best match first."""
+    if is_available():
+        return search_ids(query, limit, offset)
+
+    words = TOKEN_RE.findall(query)
+    if not words:
+        return []
+    condition = Q()
+    for word in words:
+        condition &= (
+            Q(title__icontains=word)
+            | Q(description__icontains=word)
+            # a subquery per word, different words may match different people
+            | Q(id__in=Credit.objects.filter(person__name__icontains=word).values("movie_id"))
+        )
+    matches = Movie.objects.filter(condition).order_by("title")
+    return list(matches.values_list("id", flat=True)[offset : offset + limit])
+
+
+def search_movies(query: str, limit: int, offset: int = 0, queryset: QuerySet | None = None) -> list[Movie]:
+    """Movies matching ``query``, best match first."""
+    if queryset is None:
+        queryset = Movie.objects.all()
+    ids = search_movie_ids(query, limit, offset)
+    movies = queryset.in_bulk(ids)
+    return [movies[movie_id] for movie_id in ids if movie_id in movies]
+
+
+async def asearch_movies(query: str, limit: int, offset: int = 0, queryset: QuerySet | None = None) -> list[Movie]:
+    if queryset is None:
+        queryset = Movie.objects.all()
+    # the FTS query goes through a raw cursor, which has no async API
+    ids = await sync_to_async(search_movie_ids)(query, limit, offset)
+    movies = await queryset.ain_bulk(ids)
+    return [movies[movie_id] for movie_id in ids if movie_id in movies]
+
+
+def autocomplete(query: str, limit: int = 8) -> list[dict]:
+    """Title suggestions for a (partial) query, as ``{"id", "title"}`` dicts."""
+    if not is_available():
+        rows = Movie.objects.filter(title__istartswith=query.strip()).order_by("title")
+        return list(rows.values("id", "title")[:limit])
+
+    expression = match_expression(query, column="title")
+    if not expression:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, title FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY rank LIMIT %s",
+            [expression, limit],
+        )
+        return [{"id": movie_id, "title": title} for movie_id, title in cursor.fetchall()]
+
+
+def rebuild_index() -> int:
+    """Repopulate the FTS table from scratch, returns the number of indexed movies."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, description, director, actors) "
+            f"SELECT m.id, m.title, m.description, "
+            f"(SELECT group_concat(p.name, ' ') FROM movie_db_credit c JOIN movie_db_person p ON p.id = c.person_id "
+            f"WHERE c.movie_id = m.id AND c.role = 'director'), "
+            f"(SELECT group_concat(p.name, ' ') FROM movie_db_credit c JOIN movie_db_person p ON p.id = c.person_id "
+            f"WHERE c.movie_id = m.id AND c.role = 'actor') "
+            f"FROM movie_db_movie m"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
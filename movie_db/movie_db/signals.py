@@ -0,0 +1,55 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+
+from . import fragments, leaderboards, posters
+from .models import Credit, Movie, MovieInfo, Person, PosterRendition, Review
+
+
+@receiver(post_save, sender=Movie)
+def render_poster_renditions(sender, instance: Movie, raw=False, **kwargs):
+    if raw or not instance.poster or posters.renditions_are_current(instance):
+        return
+    # enqueued in the same transaction as the save, so the job only becomes
+    # visible to workers once the new poster is committed
+    enqueue("movie_db.render_poster_renditions", movie_id=instance.id)
+
+
+# fragment cache invalidation, see movie_db.fragments
+
+@receiver([post_save, post_delete], sender=Movie)
+def invalidate_movie_fragments(sender, instance: Movie, **kwargs):
+    fragments.bump_on_commit("movies", "catalog", f"movie:{instance.pk}")
+
+
+@receiver([post_save, post_delete], sender=MovieInfo)
+@receiver([post_save, post_delete], sender=Credit)
+@receiver([post_save, post_delete], sender=Review)
+# renditions are only created by posters.store_renditions, with bulk_create,
+# which invalidates itself; deletes also come from the admin and cascades
+@receiver(post_delete, sender=PosterRendition)
+def invalidate_related_movie_fragments(sender, instance, **kwargs):
+    fragments.invalidate_movies([instance.movie_id])
+
+
+@receiver([post_save, post_delete], sender=Review)
+def schedule_leaderboard_refresh(sender, instance: Review, raw=False, **kwargs):
+    if not raw:
+        leaderboards.schedule_refresh()
+
+
+@receiver(post_save, sender=Person)
+def invalidate_person_fragments(sender, instance: Person, created=False, **kwargs):
+    # a renamed person shows up on every movie they're credited on; deletes
+    # cascade to credits, which are handled above
+    if not created:
+        fragments.invalidate_movies(instance.credits.values_list("movie_id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_fragments(sender, instance: User, created=False, **kwargs):
+    # only the user count is cached, so profile edits and logins don't matter
+    if created or kwargs["signal"] is post_delete:
+        fragments.bump_on_commit("users")
@@ -0,0 +1,73 @@
+from django.db.models import Count, F, Q, Sum
+
+from . import fragments
+from .models import Movie, Review
+
+RATINGS = [value for value, _ in Review.RATING_CHOICES]
+
+
+def histogram_field(rating: int) -> str:
+    return f"rating_{rating}_count"
+
+
+STAT_FIELDS = ["review_count", "rating_sum", *(histogram_field(r) for r in RATINGS)]
+EMPTY_STATS = dict.fromkeys(STAT_FIELDS, 0)
+
+
+def _apply(movie_id: int, count_delta: int, updates: dict) -> None:
+    # a single UPDATE with F-expressions: the increments happen inside the
+    # database, so concurrent review writes can't lose each other's changes
+    changes = {field: F(field) + delta for field, delta in updates.items() if delta}
+    if count_delta:
+        changes["review_count"] = F("review_count") + count_delta
+    if changes:
+        Movie.objects.filter(pk=movie_id).update(**changes)
+
+
+def review_added(movie_id: int, rating: int) -> None:
+    _apply(movie_id, 1, {"rating_sum": rating, histogram_field(rating): 1})
+
+
+def review_removed(movie_id: int, rating: int) -> None:
+    _apply(movie_id, -1, {"rating_sum": -rating, histogram_field(rating): -1})
+
+
+def review_changed(movie_id: int, old_rating: int, new_rating: int) -> None:
+    if old_rating == new_rating:
+        return
+    _apply(
+        movie_id,
+        0,
+        {
+            "rating_sum": new_rating - old_rating,
+            histogram_field(old_rating): -1,
+            histogram_field(new_rating): 1,
+        },
+    )
+
+
+def computed_stats(movie_ids=None) -> dict[int, dict[str, int]]:
+    """
+    Aggregate review stats for every reviewed movie (or just ``movie_ids``)
+    from the Review table, in one grouped query.
+    """
+    histogram = {
+        histogram_field(rating): Count("id", filter=Q(rating=rating))
+        for rating in RATINGS
+    }
+    reviews = Review.objects.order_by()
+    if movie_ids is not None:
+        reviews = reviews.filter(movie_id__in=movie_ids)
+    rows = (
+        reviews.values("movie_id")
+        .annotate(review_count=Count("id"), rating_sum=Sum("rating"), **histogram)
+    )
+    return {row.pop("movie_id"): row for row in rows}
+
+
+def refresh(movie_ids) -> None:
+    """Recompute the stored aggregates of the given movies from their reviews."""
+    expected = computed_stats(movie_ids)
+    for movie_id in movie_ids:
+        Movie.objects.filter(pk=movie_id).update(**expected.get(movie_id, EMPTY_STATS))
+    fragments.invalidate_movies(movie_ids)
@@ -0,0 +1,23 @@
+from jobs.queue import task
+
+from . import leaderboards, posters, stats
+from .models import Movie
+
+
+@task("movie_db.render_poster_renditions")
+def render_poster_renditions(movie_id: int):
+    movie = Movie.objects.filter(id=movie_id).only("id", "poster").first()
+    if movie is None or (movie.poster and posters.renditions_are_current(movie)):
+        return
+    posters.generate_renditions(movie)
+
+
+@task("movie_db.refresh_movie_stats")
+def refresh_movie_stats(movie_ids: list[int]):
+    stats.refresh(movie_ids)
+
+
+@task("movie_db.refresh_leaderboards")
+def refresh_leaderboards():
+    for board in leaderboards.BOARDS:
+        leaderboards.refresh(board)
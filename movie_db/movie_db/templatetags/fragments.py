@@ -0,0 +1,39 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from movie_db import fragments
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name, args):
+        self.nodelist = nodelist
+        self.name = name
+        self.args = args
+
+    def render(self, context):
+        args = tuple(arg.resolve(context) for arg in self.args)
+        return mark_safe(fragments.get_or_render(self.name, args, lambda: self.nodelist.render(context)))
+
+
+@register.tag
+def cachedfragment(parser, token):
+    """
+    Cache the enclosed template fragment until one of its generations changes::
+
+        {% cachedfragment "movie_card" movie.id %} ... {% endcachedfragment %}
+
+    The fragment name must be declared in movie_db.fragments.FRAGMENT_GENERATIONS,
+    which maps it (and its arguments) to the generation counters it depends on.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name.")
+    name = bits[1].strip("\"'")
+    if name not in fragments.FRAGMENT_GENERATIONS:
+        raise template.TemplateSyntaxError(f"Unknown cached fragment {name!r}.")
+
+    nodelist = parser.parse(("endcachedfragment",))
+    parser.delete_first_token()
+    return CachedFragmentNode(nodelist, name, [parser.compile_filter(bit) for bit in bits[2:]])
@@ -0,0 +1,29 @@
+from django import template
+
+register = template.Library()
+
+
+@register.inclusion_tag("partials/poster_picture.html")
+def poster_picture(movie, sizes, css_class="", style="", lazy=True):
+    """
+    Responsive ``<picture>`` for a movie poster: a WebP srcset with a JPEG
+    srcset fallback, falling back to the original upload when the poster has
+    no renditions yet. Expects ``poster_renditions`` to be prefetched.
+    """
+    srcsets = {"webp": [], "jpeg": []}
+    width = height = None
+    for rendition in movie.poster_renditions.all():
+        srcsets[rendition.format].append(f"{rendition.image.url} {rendition.width}w")
+        width, height = rendition.width, rendition.height
+
+    return {
+        "movie": movie,
+        "webp_srcset": ", ".join(srcsets["webp"]),
+        "jpeg_srcset": ", ".join(srcsets["jpeg"]),
+        "width": width,
+        "height": height,
+        "sizes": sizes,
+        "css_class": css_class,
+        "style": style,
+        "lazy": lazy,
+    }
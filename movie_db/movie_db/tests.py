@@ -1,3 +1,805 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, router
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from config.cache import SQLiteCache
+from config.replica import PIN_COOKIE, PIN_SECONDS, PRIMARY, REPLICA, ReplicaMiddleware
+from jobs import queue
+from jobs.models import Job
+
+from . import facets, fragments, leaderboards, posters, ratelimit, recommendations
+from .benchmarks.seed import seed
+from .management.commands.import_catalog import Command as ImportCatalog
+from .models import Credit, LeaderboardEntry, Movie, MovieInfo, Person, Review, SimilarMovie
+from .pagination import paginate_by_created, parse_created_cursor
+
+
+class ReviewStatsTests(TestCase):
+    def test_aggregates_follow_add_edit_and_delete(self):
+        movie = Movie.objects.create(title='Rated')
+        for username, rating in [('first', 4), ('second', 2)]:
+            self.client.force_login(User.objects.create(username=username))
+            self.client.post(reverse('save_review', args=[movie.id]), {'rating': rating})
+        # the second reviewer changes their mind, the first deletes theirs
+        self.client.post(reverse('save_review', args=[movie.id]), {'rating': 5})
+        self.client.force_login(User.objects.get(username='first'))
+        self.client.post(reverse('delete_review', args=[movie.id]))
+
+        movie.refresh_from_db()
+        self.assertEqual((movie.review_count, movie.rating_sum), (1, 5))
+        self.assertEqual([getattr(movie, f'rating_{stars}_count') for stars in range(1, 6)], [0, 0, 0, 0, 1])
+        call_command('rebuild_movie_stats', check=True, stdout=StringIO())
+
+        # a write that bypasses the stats is reported as drift
+        Review.objects.filter(movie=movie).update(rating=3)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_movie_stats', check=True, stdout=StringIO())
+
+    def test_concurrent_deletes_count_once(self):
+        movie = Movie.objects.create(title='Deleted twice')
+        self.client.force_login(User.objects.create(username='reviewer'))
+        self.client.post(reverse('save_review', args=[movie.id]), {'rating': 4})
+        delete = Review.delete
+
+        def raced(review, *args, **kwargs):
+            # another request deletes the review between the lookup and the delete
+            Review.objects.filter(pk=review.pk).delete()
+            return delete(review, *args, **kwargs)
+
+        with mock.patch.object(Review, 'delete', raced):
+            self.client.post(reverse('delete_review', args=[movie.id]))
+        movie.refresh_from_db()
+        # only the request that deleted the row takes it off the stats
+        self.assertEqual((movie.review_count, movie.rating_sum), (1, 4))
+
+
+class ReviewPaginationTests(TestCase):
+    def test_cursors_neither_skip_nor_repeat_tied_reviews(self):
+        movie = Movie.objects.create(title='Tied')
+        users = User.objects.bulk_create(User(username=f'user{i}') for i in range(7))
+        reviews = Review.objects.bulk_create(Review(movie=movie, user=user, rating=3) for user in users)
+        # three reviews share one timestamp, two another
+        moments = [datetime(2024, 1, 2, tzinfo=timezone.utc)] * 3 + [datetime(2024, 1, 1, tzinfo=timezone.utc)] * 2
+        for review, moment in zip(reviews, moments):
+            Review.objects.filter(pk=review.pk).update(created_at=moment)
+
+        seen, cursor = [], None
+        while True:
+            page = paginate_by_created(movie.reviews.all(), parse_created_cursor(cursor), 2)
+            seen += [review.id for review in page.items]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        expected = movie.reviews.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+        self.assertEqual(len(seen), 7)
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class ConditionalGetTests(TestCase):
+    def test_anonymous_revalidation_and_logged_in_pages(self):
+        movie = Movie.objects.create(title='Cached', poster='posters/cached.jpg')
+        url = reverse('movie_info', args=[movie.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # a change to the movie changes the validator
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.filter(pk=movie.pk).update(title='Renamed')
+            fragments.invalidate_movies([movie.id])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed')
+
+        self.client.force_login(User.objects.create(username='member'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertIn('private', response['Cache-Control'])
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class ApiTests(TestCase):
+    def test_cursor_pages_only_read_the_requested_fields(self):
+        ids = sorted((Movie.objects.create(title=f'Movie {i}', description='Long').id for i in range(5)), reverse=True)
+        url, seen = reverse('api:movie_list') + '?fields=title&limit=2', []
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(len(context.captured_queries), 1)
+            select = context.captured_queries[0]['sql'].split(' FROM ')[0]
+            self.assertIn('"title"', select)
+            self.assertNotIn('"description"', select)
+            self.assertNotIn('"rating_sum"', select)
+            body = response.json()
+            self.assertTrue(all(list(result) == ['title'] for result in body['results']))
+            seen += [result['title'] for result in body['results']]
+            url = body['next']
+        self.assertEqual(seen, [Movie.objects.get(id=movie_id).title for movie_id in ids])
+
+        response = self.client.get(reverse('api:movie_list') + '?fields=title,budget')
+        self.assertEqual(response.status_code, 400)
+
+
+class CreditsMigrationTests(TransactionTestCase):
+    before = [('movie_db', '0012_export_timestamps')]
+    after = [('movie_db', '0013_people_and_credits')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_copies_people_into_credits_and_back(self):
+        apps = self.migrate(self.before)
+        movie = apps.get_model('movie_db', 'Movie').objects.create(title='Migrated')
+        apps.get_model('movie_db', 'MovieInfo').objects.create(
+            movie=movie, year=2001, director=' Director ', actor1='Lead', actor2='Second', actor3='Lead', actor4=''
+        )
+
+        apps = self.migrate(self.after)
+        credits = apps.get_model('movie_db', 'Credit').objects.filter(movie_id=movie.id)
+        self.assertEqual(
+            list(credits.order_by('role', 'order').values_list('role', 'person__name', 'order')),
+            [('actor', 'Lead', 0), ('actor', 'Second', 1), ('director', 'Director', 0)],
+        )
+
+        apps = self.migrate(self.before)
+        info = apps.get_model('movie_db', 'MovieInfo').objects.get(movie_id=movie.id)
+        self.assertEqual(
+            (info.director, info.actor1, info.actor2, info.actor3, info.actor4), ('Director', 'Lead', 'Second', '', '')
+        )
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class PersonDetailTests(TestCase):
+    def test_pages_each_role_on_its_own(self):
+        person = Person.objects.create(name='Prolific')
+        movies = Movie.objects.bulk_create(Movie(title=f'Movie {i}', poster=f'posters/{i}.jpg') for i in range(30))
+        Credit.objects.bulk_create(Credit(movie=movie, person=person, role=Credit.ACTOR) for movie in movies)
+        Credit.objects.create(movie=movies[0], person=person, role=Credit.DIRECTOR)
+        url = reverse('person_detail', args=[person.id])
+
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['acted']), 24)
+        self.assertEqual(list(response.context['directed']), [movies[0]])
+        self.assertIsNone(response.context['directed_next'])
+
+        # the next page of one role keeps the other's
+        response = self.client.get(f"{url}?{response.context['acted_next']}")
+        self.assertEqual(list(response.context['acted']), movies[5::-1])
+        self.assertEqual(list(response.context['directed']), [movies[0]])
+        self.assertIsNone(response.context['acted_next'])
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def route(self, request):
+        # the alias reads would use while the request is served
+        seen = {}
+
+        def view(request):
+            seen['read'] = router.db_for_read(Movie)
+            seen['write'] = router.db_for_write(Movie)
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return seen, response
+
+    def test_reads_use_the_replica_until_a_write_pins_the_client(self):
+        factory = RequestFactory()
+        seen, response = self.route(factory.get('/'))
+        self.assertEqual(seen, {'read': REPLICA, 'write': PRIMARY})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        seen, response = self.route(factory.post('/'))
+        self.assertEqual(seen, {'read': PRIMARY, 'write': PRIMARY})
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], PIN_SECONDS)
+
+        # the redirect after the write reads its own changes
+        request = factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.route(request)[0]['read'], PRIMARY)
+
+        # outside requests, e.g. in commands and the worker
+        self.assertEqual(router.db_for_read(Movie), PRIMARY)
+
+
+class PosterRenditionTests(TestCase):
+    def test_first_renditions_invalidate_the_movie_fragments(self):
+        movie = Movie.objects.create(title='Poster', poster='posters/poster.jpg')
+        before = fragments.generations(['catalog', f'movie:{movie.id}'])
+        rendition = {'source': 'posters/poster.jpg', 'format': 'webp', 'image': 'posters/renditions/p.webp',
+                     'width': 200, 'height': 300, 'size': 1000}
+        with self.captureOnCommitCallbacks(execute=True):
+            posters.store_renditions(movie.id, [rendition])
+        after = fragments.generations(['catalog', f'movie:{movie.id}'])
+        self.assertTrue(all(new > old for old, new in zip(before, after)))
+
+
+# reads routed to the replica wouldn't see the test's uncommitted rows
+@override_settings(DATABASE_ROUTERS=[])
+class AdminChangelistQueriesTests(TestCase):
+    changelists = ['movie', 'movieinfo', 'person', 'review']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, model_name, query=''):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(f'admin:movie_db_{model_name}_changelist') + query)
+        self.assertEqual(response.status_code, 200)
+        return context.captured_queries
+
+    def query_counts(self):
+        movie = Movie.objects.order_by('id').first()
+        counts = {name: len(self.changelist_queries(name)) for name in self.changelists}
+        counts['review by movie'] = len(self.changelist_queries('review', f'?movie__id__exact={movie.id}'))
+        counts['review by year'] = len(self.changelist_queries('review', f'?created_at__year={movie.reviews.first().created_at.year}'))
+        return counts
+
+    def test_query_count_is_constant_per_page(self):
+        seed(5, 5, 10)
+        small = self.query_counts()
+        # more rows than fit on a page, so the large lists are paginated
+        seed(150, 30, 600, random_seed=1)
+        self.assertEqual(self.query_counts(), small)
+
+    def test_large_unfiltered_changelist_estimates_its_count(self):
+        seed(5, 5, 10)
+        with mock.patch('movie_db.admin.ESTIMATE_THRESHOLD', 1):
+            queries = self.changelist_queries('review')
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+
+        # filtered lists are counted exactly
+        queries = self.changelist_queries('review', '?rating__exact=5')
+        self.assertTrue(any('COUNT(' in query['sql'] for query in queries))
+
+    def test_search_without_words_matches_nothing(self):
+        seed(5, 5, 10)
+        for model_name in ('movie', 'movieinfo'):
+            response = self.client.get(reverse(f'admin:movie_db_{model_name}_changelist') + '?q=!!!')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['cl'].result_count, 0)
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': '-', 'app_label': 'movie_db', 'model_name': 'review', 'field_name': 'movie',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class InstrumentationTests(TestCase):
+    @override_settings(INSTRUMENTATION={'SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 60_000})
+    def test_server_timing_only_for_staff(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('login')))
+
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        timing = dict(
+            metric.split(';dur=')[:2] for metric in self.client.get(reverse('home'))['Server-Timing'].split(', ')
+        )
+        self.assertGreater(float(timing['tpl']), 0)
+        # rendering is timed, and the test runner still sees the templates
+        self.assertTemplateUsed(self.client.get(reverse('home')), 'home.html')
+
+
+class LeaderboardTests(TestCase):
+    def test_ranks_by_bayesian_average_and_decayed_recency(self):
+        one_review = Movie.objects.create(title='One five', review_count=1, rating_sum=5)
+        many_reviews = Movie.objects.create(title='Many', review_count=50, rating_sum=230)
+        middling = Movie.objects.create(title='Middling', review_count=20, rating_sum=60)
+        Movie.objects.create(title='Unreviewed')
+
+        leaderboards.refresh(LeaderboardEntry.TOP_RATED)
+        # a single 5-star review doesn't outrank fifty that average 4.6
+        ranked = LeaderboardEntry.objects.filter(board=LeaderboardEntry.TOP_RATED).values_list('rank', 'movie_id')
+        self.assertEqual(list(ranked), [(1, many_reviews.id), (2, one_review.id), (3, middling.id)])
+        page = leaderboards.page(LeaderboardEntry.TOP_RATED, 2, 2)
+        self.assertEqual([entry.movie_id for entry in page], [middling.id])
+
+        now = datetime.now(timezone.utc)
+        users = User.objects.bulk_create(User(username=f'user{i}') for i in range(3))
+        reviews = Review.objects.bulk_create([
+            Review(movie=middling, user=users[0], rating=3),
+            Review(movie=middling, user=users[1], rating=3),
+            Review(movie=one_review, user=users[2], rating=5),
+        ])
+        # two reviews ten days ago weigh less than one this hour
+        for review, age in zip(reviews, [timedelta(days=10), timedelta(days=10), timedelta(0)]):
+            Review.objects.filter(pk=review.pk).update(created_at=now - age)
+        self.assertEqual([movie_id for movie_id, _ in leaderboards.trending(now)], [one_review.id, middling.id])
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = self.open_cache(Path(directory.name) / 'cache.sqlite3')
+
+    def open_cache(self, path, **options):
+        return SQLiteCache(path, {'OPTIONS': {'MAX_ENTRIES': 10, **options}})
+
+    def test_values_round_trip(self):
+        values = {'int': 7, 'bool': True, 'none': None, 'dict': {'a': [1, 2]}, 'big': 2**70}
+        self.cache.set_many(values)
+        self.assertEqual(self.cache.get_many(values), values)
+        self.assertIs(self.cache.get('bool'), True)
+
+    def test_incr_is_shared_between_instances(self):
+        other = self.open_cache(self.cache._path)
+        self.cache.set('counter', 1)
+        self.assertEqual(other.incr('counter', 5), 6)
+        self.assertEqual(self.cache.get('counter'), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_evicts_least_recently_used_past_the_caps(self):
+        with mock.patch('config.cache.TOUCH_INTERVAL', 0):
+            for i in range(10):
+                self.cache.set(f'key{i}', i)
+            self.cache.get('key0')
+            self.cache.set('key10', 10)
+        self.assertTrue(self.cache.has_key('key0'))
+        self.assertFalse(self.cache.has_key('key1'))
+        self.assertLessEqual(len(self.cache.get_many(f'key{i}' for i in range(11))), 10)
+
+        small = self.open_cache(self.cache._path, MAX_SIZE=1000)
+        small.set('large', 'x' * 600)
+        small.set('larger', 'x' * 700)
+        self.assertFalse(small.has_key('large'))
+        self.assertTrue(small.has_key('larger'))
+
+    def test_incr_many_creates_counts_and_reads(self):
+        self.cache.set('expired', 5, timeout=-1)
+        self.cache.set('previous', 3)
+        counts = self.cache.incr_many({'missing': 60, 'expired': 60}, read=['previous', 'absent'])
+        self.assertEqual(counts, {'missing': 1, 'expired': 1, 'previous': 3})
+        self.assertEqual(self.cache.incr_many({'missing': 60}, delta=-1), {'missing': 0})
+        # undoing a count never brings back an expired counter
+        self.cache.set('expired', 5, timeout=-1)
+        self.assertEqual(self.cache.incr_many({'expired': 60, 'absent': 60}, delta=-1), {})
+        self.assertFalse(self.cache.has_key('absent'))
+
+
+class RateLimitTests(TestCase):
+    # halfway through a second and a minute: requests straddling a window
+    # boundary would see the previous window down-weighted
+    NOW = 60 * 28_333_334 + 30.5
+
+    def setUp(self):
+        cache.clear()
+        # only the limiter's clock, caches and sessions keep the real one
+        clock = mock.patch('movie_db.ratelimit.time', **{'time.return_value': self.NOW})
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def login(self, username='someone'):
+        return self.client.post(reverse('login'), {'username': username, 'password': 'wrong'})
+
+    # only the per-username bucket, however fast the hasher runs here
+    @override_settings(RATELIMITS={'login': {'all': '1000/s'}})
+    def test_rejects_before_hashing_once_over_the_limit(self):
+        for _ in range(5):
+            self.assertEqual(self.login().status_code, 200)
+        with mock.patch('django.contrib.auth.hashers.PBKDF2PasswordHasher.encode') as encode:
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        encode.assert_not_called()
+
+        # the username bucket is full, this client's IP isn't yet
+        self.assertEqual(self.login('someone-else').status_code, 200)
+
+    @override_settings(RATELIMITS={'login': {'all': '2/m'}})
+    def test_site_wide_bucket(self):
+        self.assertEqual(self.client.post(reverse('login'), {'username': 'a'}, REMOTE_ADDR='10.0.0.1').status_code, 200)
+        self.assertEqual(self.client.post(reverse('login'), {'username': 'b'}, REMOTE_ADDR='10.0.0.2').status_code, 200)
+        self.assertEqual(self.client.post(reverse('login'), {'username': 'c'}, REMOTE_ADDR='10.0.0.3').status_code, 429)
+
+    @override_settings(RATELIMITS={'login': {'ip': '2/m', 'all': '3/m'}})
+    def test_rejected_requests_do_not_fill_the_site_wide_bucket(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = {'BACKEND': 'config.cache.SQLiteCache', 'LOCATION': Path(directory.name) / 'cache.sqlite3'}
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        # incr_many on the shared cache, get_many and incr on the others
+        for backend in (shared, local):
+            with self.subTest(backend=backend['BACKEND']), override_settings(CACHES={'default': backend}):
+                cache.clear()
+                statuses = [self.client.post(reverse('login'), {'username': 'a'}).status_code for _ in range(5)]
+                self.assertEqual(statuses, [200, 200, 429, 429, 429])
+                response = self.client.post(reverse('login'), {'username': 'b'}, REMOTE_ADDR='10.0.0.2')
+                self.assertEqual(response.status_code, 200)
+
+                # a window that expired before the rejection is undone stays gone
+                self.assertEqual(ratelimit._incr_many({'expired': 60}, delta=-1), {})
+                self.assertIsNone(cache.get('expired'))
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        Path(directory.name, 'poster.jpg').write_bytes(bytes(range(256)) * 4)
+        settings = override_settings(MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_conditional_and_range_requests(self):
+        response = self.client.get('/media/poster.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(len(b''.join(response.streaming_content)), 1024)
+
+        response = self.client.get('/media/poster.jpg', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get('/media/poster.jpg', HTTP_RANGE='bytes=1020-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 1020-1023/1024')
+        self.assertEqual(b''.join(response.streaming_content), bytes([252, 253, 254, 255]))
+
+        response = self.client.get('/media/poster.jpg', HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_offload_and_traversal(self):
+        with override_settings(MEDIA_OFFLOAD={'HEADER': 'X-Accel-Redirect', 'PREFIX': '/internal-media/'}):
+            response = self.client.get('/media/poster.jpg')
+        self.assertEqual(response['X-Accel-Redirect'], '/internal-media/poster.jpg')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+
+
+class SaveReviewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='reviewer')
+        self.movie = Movie.objects.create(title='Upserted')
+        self.client.force_login(self.user)
+        self.url = reverse('save_review', args=[self.movie.id])
+
+    def test_adds_then_replaces_the_review(self):
+        headers = {'X-Requested-With': 'XMLHttpRequest', 'Accept': 'application/json'}
+        response = self.client.post(self.url, {'rating': 4}, headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['movie'], {
+            'id': self.movie.id, 'review_count': 1, 'average_rating': 4.0,
+            'rating_histogram': {'1': 0, '2': 0, '3': 0, '4': 1, '5': 0},
+        })
+
+        response = self.client.post(self.url, {'rating': 2, 'review_text': 'Worse the second time'}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['review']['review_text'], 'Worse the second time')
+
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.review_count, self.movie.rating_sum), (1, 2))
+        self.assertEqual((self.movie.rating_4_count, self.movie.rating_2_count), (0, 1))
+        self.assertEqual(Review.objects.get(user=self.user, movie=self.movie).rating, 2)
+
+    def test_form_posts_redirect_and_fetch_gets_the_fragment(self):
+        response = self.client.post(self.url, {'rating': 5})
+        self.assertRedirects(response, reverse('movie_info', args=[self.movie.id]), fetch_redirect_response=False)
+
+        response = self.client.post(self.url, {'rating': 6}, headers={'X-Requested-With': 'XMLHttpRequest'})
+        self.assertEqual(response.status_code, 400)
+        self.assertTemplateUsed(response, 'partials/user_review.html')
+        self.assertContains(response, 'data-review-form', status_code=400)
+        self.assertNotContains(response, 'data-review-summary', status_code=400)
+
+        # a saved review comes with the movie's updated aggregates
+        response = self.client.post(self.url, {'rating': 3}, headers={'X-Requested-With': 'XMLHttpRequest'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'partials/review_summary.html')
+        self.assertContains(response, '<template data-review-summary>')
+        self.assertContains(response, '<span class="badge bg-primary">1</span>')
+        self.assertContains(response, '(3.0/5)')
+
+    def test_invalid_review_of_a_missing_movie_is_not_found(self):
+        url = reverse('save_review', args=[self.movie.id + 1])
+        response = self.client.post(url, {'rating': 6}, headers={'X-Requested-With': 'XMLHttpRequest'})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        director = Person.objects.create(name='Director')
+        for index, (year, rating) in enumerate([(1994, 5), (1999, 3), (2004, 4)]):
+            movie = Movie.objects.create(
+                title=f'Movie {index}', poster=f'posters/{index}.jpg', review_count=1, rating_sum=rating
+            )
+            MovieInfo.objects.create(movie=movie, year=year)
+            if year < 2000:
+                Credit.objects.create(movie=movie, person=director, role=Credit.DIRECTOR)
+        self.director = director
+
+    def test_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            result = facets.counts(facets.Filters.from_query({'decade': '1990'}))
+
+        self.assertEqual(result['total'][0][2], 2)
+        # the decade facet ignores the selected decade, the others apply it
+        self.assertEqual(sorted((value, count) for value, _, count in result['decade']), [(1990, 2), (2000, 1)])
+        self.assertEqual(sorted((value, count) for value, _, count in result['year']), [(1994, 1), (1999, 1)])
+        self.assertEqual(result['director'], [(self.director.id, 'Director', 2)])
+        self.assertEqual(sorted((value, count) for value, _, count in result['rating']), [(3, 1), (4, 1)])
+
+    def test_lists_the_top_directors_and_the_selected_one(self):
+        other = Person.objects.create(name='Other')
+        Credit.objects.create(movie=Movie.objects.get(title='Movie 2'), person=other, role=Credit.DIRECTOR)
+        with mock.patch('movie_db.facets.DIRECTOR_LIMIT', 1):
+            self.assertEqual(facets.counts(facets.Filters())['director'], [(self.director.id, 'Director', 2)])
+            with self.assertNumQueries(1):
+                result = facets.counts(facets.Filters(director=other.id))
+        self.assertEqual(result['director'], [(self.director.id, 'Director', 2), (other.id, 'Other', 1)])
+
+    def test_filters_compose_with_pagination(self):
+        response = self.client.get(reverse('home'), {'director': self.director.id, 'rating': 4})
+        self.assertEqual([movie.title for movie in response.context['movies']], ['Movie 0'])
+        # the facets fragment is cached per filter combination
+        with self.assertNumQueries(2):
+            self.client.get(reverse('home'), {'director': self.director.id, 'rating': 4})
+
+        with mock.patch('movie_db.views.HOME_PAGE_SIZE', 1):
+            response = self.client.get(reverse('home'), {'decade': '1990'})
+            cursor = response.context['page'].next_cursor
+            self.assertContains(response, f'?decade=1990&amp;after={cursor}')
+            response = self.client.get(reverse('home_more'), {'decade': '1990', 'after': cursor})
+        self.assertEqual([movie.title for movie in response.context['movies']], ['Movie 0'])
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        registry = mock.patch.dict(queue._registry, {'succeeds': self.succeed_job, 'fails': self.fail_job})
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    def succeed_job(self, value=None):
+        self.calls.append(value)
+
+    def fail_job(self, **payload):
+        raise RuntimeError('boom')
+
+    def test_claims_runnable_jobs_once(self):
+        first = queue.enqueue('succeeds', value=1)
+        later = queue.enqueue('succeeds', delay=timedelta(hours=1))
+        second = queue.enqueue('succeeds', value=2)
+
+        self.assertEqual(queue.claim('worker', 5), [first.id, second.id])
+        self.assertEqual(queue.claim('other', 5), [])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.locked_by), (Job.RUNNING, 'worker'))
+
+        self.assertTrue(queue.execute(first.id))
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.locked_at), (Job.DONE, 1, None))
+        self.assertEqual(self.calls, [1])
+        later.refresh_from_db()
+        self.assertEqual(later.status, Job.QUEUED)
+
+    def test_retries_with_backoff_until_out_of_attempts(self):
+        job = queue.enqueue('fails', max_attempts=2)
+        queue.claim('worker', 1)
+        before = datetime.now(timezone.utc)
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(queue.execute(job.id))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.QUEUED, 1, ''))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        # the first retry waits the base delay, give or take the jitter
+        self.assertGreaterEqual(job.run_after, before + queue.RETRY_BASE_DELAY * 0.8)
+        self.assertLessEqual(job.run_after, datetime.now(timezone.utc) + queue.RETRY_BASE_DELAY * 1.2)
+        self.assertEqual(queue.claim('worker', 1), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=datetime.now(timezone.utc))
+        queue.claim('worker', 1)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertFalse(queue.execute(job.id))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_releases_only_jobs_without_a_heartbeat(self):
+        dead, alive = queue.enqueue('succeeds'), queue.enqueue('succeeds')
+        queue.claim('dead', 1)
+        queue.claim('alive', 1)
+        expired = datetime.now(timezone.utc) - queue.STALE_LOCK_TIMEOUT - timedelta(seconds=1)
+        Job.objects.update(locked_at=expired)
+
+        self.assertEqual(queue.heartbeat('alive'), 1)
+        self.assertEqual(queue.release_stale(), 1)
+        dead.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((dead.status, dead.locked_by, dead.locked_at), (Job.QUEUED, '', None))
+        self.assertEqual((alive.status, alive.locked_by), (Job.RUNNING, 'alive'))
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings = override_settings(MEDIA_ROOT=self.directory / 'media')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        Image.new('RGB', (2, 3), 'red').save(self.directory / 'poster.png')
+        (self.directory / 'broken.png').write_bytes(b'not an image')
+
+    def write(self, rows):
+        path = self.directory / 'catalog.jsonl'
+        path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+        return path
+
+    def run_import(self, path, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_catalog', path, batch_size=1, workers=1, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def row(self, title, **fields):
+        return {'title': title, 'year': 2001, 'poster': 'poster.png', 'director': 'Director', 'cast': ['Lead'], **fields}
+
+    def test_reimport_updates_instead_of_duplicating(self):
+        self.run_import(self.write([self.row('First'), self.row('Second')]))
+        self.run_import(self.write([self.row('First', description='Revised', year=2002, cast=['Lead', 'Second lead'])]))
+
+        self.assertEqual(Movie.objects.count(), 2)
+        movie = Movie.objects.get(title='First')
+        self.assertEqual((movie.description, movie.movie_info.get().year), ('Revised', 2002))
+        self.assertEqual(
+            list(movie.credits.order_by('role', 'order').values_list('role', 'person__name')),
+            [('actor', 'Lead'), ('actor', 'Second lead'), ('director', 'Director')],
+        )
+        self.assertEqual(Person.objects.count(), 3)
+        # both movies share the one stored copy of the poster
+        self.assertEqual(len(set(Movie.objects.values_list('poster', flat=True))), 1)
+
+    def test_resumes_after_the_last_committed_batch(self):
+        path = self.write([self.row('First'), self.row('Second'), self.row('Third')])
+        upsert = ImportCatalog._upsert
+        batches = []
+
+        def interrupted(command, rows):
+            if batches:
+                raise KeyboardInterrupt
+            batches.append(rows)
+            upsert(command, rows)
+
+        with mock.patch.object(ImportCatalog, '_upsert', interrupted), self.assertRaises(KeyboardInterrupt):
+            self.run_import(path)
+        self.assertEqual(list(Movie.objects.values_list('title', flat=True)), ['First'])
+
+        with mock.patch.object(ImportCatalog, '_upsert', autospec=True, side_effect=upsert) as resumed:
+            stdout, _ = self.run_import(path)
+        self.assertIn('Resuming after row 1', stdout)
+        self.assertEqual([call.args[1][0]['title'] for call in resumed.call_args_list], ['Second', 'Third'])
+        self.assertEqual(Movie.objects.count(), 3)
+        self.assertFalse(path.with_name(path.name + '.checkpoint').exists())
+
+    def test_skips_rows_with_an_invalid_poster(self):
+        _, stderr = self.run_import(self.write([self.row('Broken', poster='broken.png'), self.row('Fine')]))
+        self.assertIn("'Broken': invalid poster", stderr)
+        self.assertEqual(list(Movie.objects.values_list('title', flat=True)), ['Fine'])
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class ExportDataTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+        self.movie = Movie.objects.create(title='Exported', description='Säga', poster='posters/exported.jpg')
+        MovieInfo.objects.create(movie=self.movie, year=1999)
+        director, lead, second = Person.objects.bulk_create(Person(name=name) for name in ['Director', 'Lead', 'Second'])
+        Credit.objects.bulk_create([
+            Credit(movie=self.movie, person=director, role=Credit.DIRECTOR),
+            Credit(movie=self.movie, person=second, role=Credit.ACTOR, order=1),
+            Credit(movie=self.movie, person=lead, role=Credit.ACTOR, order=0),
+        ])
+        users = User.objects.bulk_create(User(username=name) for name in ['old', 'new'])
+        self.old, self.new = Review.objects.bulk_create(
+            Review(movie=self.movie, user=user, rating=rating, review_text=f'By {user.username}')
+            for user, rating in zip(users, [2, 5])
+        )
+        Review.objects.filter(pk=self.old.pk).update(updated_at=datetime(2020, 1, 1, tzinfo=timezone.utc))
+
+    def export(self, *args, **options):
+        path = self.directory / 'export'
+        call_command('export_data', *args, output=path, stderr=StringIO(), **options)
+        return path.read_bytes()
+
+    def test_catalog_csv(self):
+        rows = list(csv.DictReader(self.export('catalog').decode().splitlines()))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(
+            {key: rows[0][key] for key in ['id', 'title', 'description', 'poster', 'year', 'director', 'cast']},
+            {'id': str(self.movie.id), 'title': 'Exported', 'description': 'Säga', 'poster': 'posters/exported.jpg',
+             'year': '1999', 'director': 'Director', 'cast': 'Lead; Second'},
+        )
+
+    def test_reviews_jsonl_since_and_gzip(self):
+        lines = self.export('reviews', format='jsonl').decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['id'] for row in rows], [self.old.id, self.new.id])
+        self.assertEqual(
+            {key: rows[1][key] for key in ['movie_id', 'movie_title', 'user', 'rating', 'review_text']},
+            {'movie_id': self.movie.id, 'movie_title': 'Exported', 'user': 'new', 'rating': 5, 'review_text': 'By new'},
+        )
+        self.assertEqual(rows[0]['updated_at'], '2020-01-01T00:00:00+00:00')
+
+        # only rows updated at or after the date, the newer review here
+        recent = self.export('reviews', format='jsonl', since='2021-01-01')
+        self.assertEqual([json.loads(line)['id'] for line in recent.decode().splitlines()], [self.new.id])
+        self.assertEqual(gzip.decompress(self.export('reviews', format='jsonl', since='2021-01-01', gzip=True)), recent)
+
+
+@override_settings(DATABASE_ROUTERS=[])
+class RecommendationTests(TestCase):
+    # one row per user, ratings of movies A to E
+    RATINGS = [
+        [5, 5, 4, 1, 3],
+        [1, 1, 2, 5, 2],
+        [5, 4, 5, 1, 4],
+        [2, 1, 1, 4, 5],
+        [4, 5, 3, 2, 1],
+    ]
+
+    def setUp(self):
+        self.movies = Movie.objects.bulk_create(Movie(title=title) for title in 'ABCDE')
+        self.users = User.objects.bulk_create(User(username=f'user{i}') for i in range(len(self.RATINGS)))
+        Review.objects.bulk_create(
+            Review(user=user, movie=movie, rating=rating)
+            for user, row in zip(self.users, self.RATINGS)
+            for movie, rating in zip(self.movies, row)
+        )
+
+    def build(self, *args):
+        call_command('build_recommendations', *args, stdout=StringIO())
+        rows = SimilarMovie.objects.order_by('movie_id', 'rank').values_list('movie_id', 'similar_id', 'rank', 'score')
+        return [(*row[:3], round(row[3], 6)) for row in rows]
+
+    def test_neighbours_rank_co_rated_movies_by_adjusted_cosine(self):
+        a, b, c, d, e = (movie.id for movie in self.movies)
+        neighbours = recommendations.RatingMatrix.load().neighbours(a)
+        # D is rated against A by everyone, so it's no neighbour at all
+        self.assertEqual([movie_id for movie_id, _ in neighbours], [b, c])
+        self.assertGreater(neighbours[0][1], neighbours[1][1])
+        self.assertEqual(recommendations.RatingMatrix.load().neighbours(a, k=1), neighbours[:1])
+
+    def test_incremental_build_matches_a_full_one(self):
+        self.build()
+        # one rating changes its user's mean, and with it every movie they rated
+        review = Review.objects.get(user=self.users[0], movie=self.movies[0])
+        review.rating = 1
+        review.save()
+
+        incremental = self.build('--incremental')
+        self.assertEqual(incremental, self.build())
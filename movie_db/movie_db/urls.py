@@ -1,5 +1,6 @@
-from django.urls import path
+from django.urls import include, path
 from . import views
+from .models import LeaderboardEntry
 
 urlpatterns = [
     # Authentication URLs
@@ -8,9 +9,21 @@ urlpatterns = [
     path("logout/", views.logout_view, name="logout"),
     # Movie URLs
     path("", views.home, name="home"),
+    path("movies/more/", views.home_more, name="home_more"),
     path("movie/<int:movie_id>/", views.movie_info, name="movie_info"),
+    path("movie/<int:movie_id>/reviews/", views.movie_reviews, name="movie_reviews"),
+    path("person/<int:person_id>/", views.person_detail, name="person_detail"),
+    # Leaderboards
+    path("top-rated/", views.leaderboard, {"board": LeaderboardEntry.TOP_RATED}, name="top_rated"),
+    path("trending/", views.leaderboard, {"board": LeaderboardEntry.TRENDING}, name="trending"),
+    # Search URLs
+    path("search/", views.search, name="search"),
+    path("search/autocomplete/", views.search_autocomplete, name="search_autocomplete"),
     # Review URLs
-    path("movie/<int:movie_id>/review/add/", views.add_review, name="add_review"),
-    path("movie/<int:movie_id>/review/edit/", views.edit_review, name="edit_review"),
+    path("movie/<int:movie_id>/review/", views.save_review, name="save_review"),
     path("movie/<int:movie_id>/review/delete/", views.delete_review, name="delete_review"),
+    # Staff exports
+    path("export/<str:dataset>/", views.export_data, name="export_data"),
+    # JSON API
+    path("api/v1/", include("movie_db.api.urls")),
 ]
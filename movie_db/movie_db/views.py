@@ -1,18 +1,39 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login as _login, logout as _logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import HttpRequest, HttpResponse
-from django.shortcuts import render, redirect, get_object_or_404
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
 from django.views.decorators.cache import never_cache
 from django.views.decorators.http import require_http_methods
 
+from . import exports, facets, fragments, leaderboards, search as movie_search, stats
+from .api.serializers import HISTOGRAM_COLUMNS, serialize_movies, serialize_reviews
+from .conditional import conditional_page
 from .forms import CustomLoginForm, CustomSignupForm, ReviewForm
-from .models import Movie, MovieInfo, Review
+from .models import Credit, LeaderboardEntry, Movie, MovieInfo, Person, Review, SimilarMovie
+from .pagination import apaginate_by_created, apaginate_by_id, paginate_by_created, paginate_by_id, parse_created_cursor, parse_id_cursor
+from .ratelimit import ratelimit
+
+HOME_PAGE_SIZE = 24
+REVIEWS_PAGE_SIZE = 10
+SEARCH_PAGE_SIZE = 24
+SEARCH_MAX_PAGES = 20
+LEADERBOARD_PAGE_SIZE = 24
+PERSON_PAGE_SIZE = 24
+REVIEW_JSON_FIELDS = ["id", "rating", "review_text", "created_at", "updated_at"]
 
 
 @never_cache
 @require_http_methods(["GET", "POST"])
+# every attempt runs the password hasher, even for unknown usernames
+@ratelimit("login", ip="10/m", username="5/m", all="30/s")
 def login_view(request: HttpRequest) -> HttpResponse:
     if request.user.is_authenticated:
         return redirect("home")
@@ -40,6 +61,7 @@ def login_view(request: HttpRequest) -> HttpResponse:
 
 @never_cache
 @require_http_methods(["GET", "POST"])
+@ratelimit("signup", ip="5/h", all="10/s")
 def signup_view(request: HttpRequest) -> HttpResponse:
     if request.user.is_authenticated:
         return redirect("home")
@@ -81,100 +103,310 @@ def logout_view(request: HttpRequest) -> HttpResponse:
     return redirect("home")
 
 
-@require_http_methods(["GET"])
-def home(request: HttpRequest) -> HttpResponse:
-    movies = Movie.objects.select_related().order_by("-id")
+def _fragment_response(request: HttpRequest, template_name: str, context: dict, page) -> HttpResponse:
+    response = render(request, template_name, context)
+    if page.has_next:
+        response["X-Next-Cursor"] = str(page.next_cursor)
+    return response
+
+
+def _movie_cards():
+    # only what partials/movie_cards.html renders
+    return Movie.objects.only("id", "title", "poster", "review_count", "rating_sum").prefetch_related(
+        "poster_renditions"
+    )
+
+
+def _home_page(request: HttpRequest):
+    after = parse_id_cursor(request.GET.get("after"))
+    movies = facets.apply(_movie_cards(), facets.Filters.from_query(request.GET))
+    return paginate_by_id(movies, after, HOME_PAGE_SIZE)
+
+
+# templates can still query the database (lazy context values, cached
+# fragments being re-rendered), so async views render on the sync thread
+_arender = sync_to_async(render)
 
-    # statistics for sidebar
-    total_movies = Movie.objects.count()
-    total_users = User.objects.count()
+
+@require_http_methods(["GET"])
+@conditional_page(lambda request: ["catalog", "users"])
+async def home(request: HttpRequest) -> HttpResponse:
+    filters = facets.Filters.from_query(request.GET)
+    movies = facets.apply(_movie_cards(), filters)
+    page = await apaginate_by_id(movies, parse_id_cursor(request.GET.get("after")), HOME_PAGE_SIZE)
 
     context = {
-        "movies": movies,
-        "total_movies": total_movies,
-        "total_users": total_users,
+        "movies": page.items,
+        "page": page,
+        "filter_query": filters.querystring(),
+        # the facet counts, one grouped query, only run when the cached
+        # facets fragment for these filters has to be re-rendered
+        "facets": SimpleLazyObject(lambda: facets.sidebar(filters)),
+        # statistics for sidebar, passed uncalled: the template only runs the
+        # COUNT queries when the cached sidebar fragment has to be re-rendered
+        "total_movies": Movie.objects.count,
+        "total_users": User.objects.count,
         "title": "Movie Database",
     }
-    return render(request, "home.html", context)
+    return await _arender(request, "home.html", context)
 
 
 @require_http_methods(["GET"])
-def movie_info(request: HttpRequest, movie_id: int) -> HttpResponse:
-    movie = get_object_or_404(Movie, id=movie_id)
+def home_more(request: HttpRequest) -> HttpResponse:
+    # "load more" fragment: only the next batch of cards, no sidebar
+    page = _home_page(request)
+    context = {"movies": page.items, "page": page}
+    return _fragment_response(request, "partials/movie_cards.html", context, page)
 
-    # Get movie info if it exists
-    try:
-        movie_details = movie.movie_info.get()
-    except MovieInfo.DoesNotExist:
-        movie_details = None
-
-    # Get all reviews for this movie
-    reviews = movie.reviews.select_related('user').all()
-    
-    # Get user's existing review if logged in
-    user_review = None
-    if request.user.is_authenticated:
-        try:
-            user_review = movie.reviews.get(user=request.user)
-        except Review.DoesNotExist:
-            pass
-    
-    # Calculate average rating
-    total_reviews = reviews.count()
-    average_rating = None
-    if total_reviews > 0:
-        total_rating = sum(review.rating for review in reviews)
-        average_rating = round(total_rating / total_reviews, 1)
+
+@require_http_methods(["GET"])
+@conditional_page(lambda request, movie_id: [f"movie:{movie_id}"])
+async def movie_info(request: HttpRequest, movie_id: int) -> HttpResponse:
+    user = await request.auser()
+
+    async def get_user_review():
+        if not user.is_authenticated:
+            return None
+        return await Review.objects.filter(movie_id=movie_id, user=user).afirst()
+
+    async def get_similar_movies():
+        # precomputed by build_recommendations, one indexed query
+        neighbours = SimilarMovie.objects.filter(movie_id=movie_id).select_related("similar").only(
+            "movie_id", "rank", *(f"similar__{field}" for field in ("title", "review_count", "rating_sum"))
+        )
+        return [neighbour.similar async for neighbour in neighbours]
+
+    # the queries every render needs don't depend on each other
+    movie, reviews, user_review, similar_movies = await asyncio.gather(
+        aget_object_or_404(Movie, id=movie_id),
+        apaginate_by_created(_movie_reviews(movie_id), parse_created_cursor(request.GET.get("after")), REVIEWS_PAGE_SIZE),
+        get_user_review(),
+        get_similar_movies(),
+    )
+
+    # Movie info and credits stay lazy: they're only needed when the cached
+    # header fragment has to be re-rendered
+    def get_movie_details():
+        return MovieInfo.objects.filter(movie=movie).first()
+
+    # cast and crew in a single query, also only run for a re-render
+    def get_people():
+        people = {Credit.DIRECTOR: [], Credit.ACTOR: []}
+        for credit in movie.credits.select_related("person"):
+            people[credit.role].append(credit.person)
+        return people
 
     context = {
         "movie": movie,
-        "movie_details": movie_details,
-        "reviews": reviews,
+        "movie_details": SimpleLazyObject(get_movie_details),
+        "people": SimpleLazyObject(get_people),
+        "reviews": reviews.items,
+        "reviews_page": reviews,
         "user_review": user_review,
-        "total_reviews": total_reviews,
-        "average_rating": average_rating,
+        "rating_choices": Review.RATING_CHOICES,
+        "similar_movies": similar_movies,
         "title": f"{movie.title} - Movie Database",
     }
-    return render(request, "movie_detail.html", context)
+    return await _arender(request, "movie_detail.html", context)
 
 
-@login_required
-@require_http_methods(["POST"])
-def add_review(request: HttpRequest, movie_id: int) -> HttpResponse:
-    movie = get_object_or_404(Movie, id=movie_id)
-    
-    # Check if user already has a review for this movie
-    if Review.objects.filter(user=request.user, movie=movie).exists():
-        messages.error(request, "You have already reviewed this movie. You can edit your existing review.")
-        return redirect("movie_info", movie_id=movie_id)
-    
-    form = ReviewForm(request.POST)
-    if form.is_valid():
-        review = form.save(commit=False)
-        review.user = request.user
-        review.movie = movie
-        review.save()
-        
-        messages.success(request, f"Your review for '{movie.title}' has been added successfully!")
+def _movie_reviews(movie_id: int):
+    return Review.objects.filter(movie_id=movie_id).select_related("user")
+
+
+def _reviews_page(request: HttpRequest, movie: Movie):
+    after = parse_created_cursor(request.GET.get("after"))
+    return paginate_by_created(_movie_reviews(movie.id), after, REVIEWS_PAGE_SIZE)
+
+
+@require_http_methods(["GET"])
+def movie_reviews(request: HttpRequest, movie_id: int) -> HttpResponse:
+    # "load more" fragment: the next page of reviews for a movie
+    movie = get_object_or_404(Movie.objects.only("id"), id=movie_id)
+    page = _reviews_page(request, movie)
+    return _fragment_response(request, "partials/review_list.html", {"reviews": page.items}, page)
+
+
+@require_http_methods(["GET"])
+@conditional_page(lambda request, person_id: ["catalog"])
+def person_detail(request: HttpRequest, person_id: int) -> HttpResponse:
+    person = get_object_or_404(Person, id=person_id)
+
+    # each role is a keyset page of its own, with its cursor in the query
+    # string under the role's name, so long filmographies render a page at a time
+    pages, next_queries = {}, {}
+    for role in (Credit.DIRECTOR, Credit.ACTOR):
+        movies = _movie_cards().filter(credits__person=person, credits__role=role)
+        pages[role] = paginate_by_id(movies, parse_id_cursor(request.GET.get(role)), PERSON_PAGE_SIZE)
+        if pages[role].has_next:
+            query = request.GET.copy()
+            query[role] = pages[role].next_cursor
+            next_queries[role] = query.urlencode()
+
+    context = {
+        "person": person,
+        "directed": pages[Credit.DIRECTOR].items,
+        "acted": pages[Credit.ACTOR].items,
+        "directed_next": next_queries.get(Credit.DIRECTOR),
+        "acted_next": next_queries.get(Credit.ACTOR),
+        "title": f"{person.name} - Movie Database",
+    }
+    return render(request, "person_detail.html", context)
+
+
+@require_http_methods(["GET"])
+async def search(request: HttpRequest) -> HttpResponse:
+    query = request.GET.get("q", "").strip()
+    try:
+        page_number = min(max(int(request.GET.get("page", 1)), 1), SEARCH_MAX_PAGES)
+    except ValueError:
+        page_number = 1
+
+    movies = []
+    if query:
+        # relevance order doesn't allow keyset paging, but results past a
+        # few hundred matches aren't useful so the offset stays bounded
+        offset = (page_number - 1) * SEARCH_PAGE_SIZE
+        movies = await movie_search.asearch_movies(
+            query,
+            limit=SEARCH_PAGE_SIZE + 1,
+            offset=offset,
+            queryset=_movie_cards(),
+        )
+
+    has_next = len(movies) > SEARCH_PAGE_SIZE and page_number < SEARCH_MAX_PAGES
+    context = {
+        "query": query,
+        "movies": movies[:SEARCH_PAGE_SIZE],
+        "page_number": page_number,
+        "previous_page": page_number - 1 if page_number > 1 else None,
+        "next_page": page_number + 1 if has_next else None,
+        "title": f"Search: {query} - Movie Database" if query else "Search - Movie Database",
+    }
+    return await _arender(request, "search.html", context)
+
+
+@require_http_methods(["GET"])
+@conditional_page(lambda request, board: ["catalog", f"leaderboard:{board}"])
+async def leaderboard(request: HttpRequest, board: str) -> HttpResponse:
+    max_pages = -(-leaderboards.SIZE // LEADERBOARD_PAGE_SIZE)
+    try:
+        page_number = min(max(int(request.GET.get("page", 1)), 1), max_pages)
+    except ValueError:
+        page_number = 1
+
+    # stored by rank, so any page is one range read on the (board, rank) index
+    entries = (
+        leaderboards.page(board, page_number, LEADERBOARD_PAGE_SIZE)
+        .select_related("movie")
+        .only("rank", "movie_id", *(f"movie__{field}" for field in ("title", "poster", "review_count", "rating_sum")))
+        .prefetch_related("movie__poster_renditions")
+    )
+    movies = [entry.movie async for entry in entries]
+
+    has_next = len(movies) > LEADERBOARD_PAGE_SIZE
+    label = dict(LeaderboardEntry.BOARD_CHOICES)[board]
+    context = {
+        "board": board,
+        "label": label,
+        "movies": movies[:LEADERBOARD_PAGE_SIZE],
+        "previous_page": page_number - 1 if page_number > 1 else None,
+        "next_page": page_number + 1 if has_next else None,
+        "title": f"{label} - Movie Database",
+    }
+    return await _arender(request, "leaderboard.html", context)
+
+
+@require_http_methods(["GET"])
+def search_autocomplete(request: HttpRequest) -> JsonResponse:
+    query = request.GET.get("q", "").strip()
+    suggestions = movie_search.autocomplete(query) if query else []
+    return JsonResponse({"results": suggestions})
+
+
+def _upsert_review(user: User, movie_id: int, rating: int, review_text: str) -> tuple[Review, int | None]:
+    """
+    Add the user's review of the movie or replace it, and keep the movie's
+    aggregates in step. Returns the review and the rating it replaced, None
+    for a new review. Call inside a transaction.
+    """
+    # only read for the aggregates: the transaction holds SQLite's write lock
+    # from BEGIN IMMEDIATE, so no other writer gets between this and the upsert
+    previous = Review.objects.filter(user=user, movie_id=movie_id).values_list("rating", "created_at").first()
+    review = Review(user=user, movie_id=movie_id, rating=rating, review_text=review_text)
+    # INSERT ... ON CONFLICT (user_id, movie_id) DO UPDATE: the unique
+    # constraint decides between adding and replacing, not a check beforehand
+    Review.objects.bulk_create(
+        [review],
+        update_conflicts=True,
+        unique_fields=["user", "movie"],
+        update_fields=["rating", "review_text", "updated_at"],
+    )
+    if previous is None:
+        stats.review_added(movie_id, rating)
+        old_rating = None
     else:
-        messages.error(request, "Please correct the errors in your review.")
-    
-    return redirect("movie_info", movie_id=movie_id)
+        old_rating, review.created_at = previous
+        stats.review_changed(movie_id, old_rating, rating)
+
+    # bulk writes skip model signals, see movie_db.signals
+    fragments.invalidate_movies([movie_id])
+    leaderboards.schedule_refresh()
+    return review, old_rating
+
+
+def _is_fetch(request: HttpRequest) -> bool:
+    # static/js/review_form.js, as opposed to a plain form POST
+    return request.headers.get("X-Requested-With") == "XMLHttpRequest"
+
+
+def _review_fragment(request: HttpRequest, movie: dict, review: Review | None, errors=None, status=200) -> HttpResponse:
+    if "application/json" in request.headers.get("Accept", ""):
+        if errors:
+            return JsonResponse({"errors": errors.get_json_data()}, status=status)
+        return JsonResponse(
+            {
+                "review": serialize_reviews([{field: getattr(review, field) for field in REVIEW_JSON_FIELDS}], REVIEW_JSON_FIELDS)[0],
+                "movie": serialize_movies([movie], ["id", "review_count", "average_rating", "rating_histogram"])[0],
+            },
+            status=status,
+        )
+    # an unsaved instance, for the aggregates' properties
+    context = {"movie": Movie(**movie), "user_review": review, "rating_choices": Review.RATING_CHOICES, "errors": errors}
+    return render(request, "partials/review_saved.html", context, status=status)
 
 
 @login_required
 @require_http_methods(["POST"])
-def edit_review(request: HttpRequest, movie_id: int) -> HttpResponse:
-    movie = get_object_or_404(Movie, id=movie_id)
-    review = get_object_or_404(Review, user=request.user, movie=movie)
-    
-    form = ReviewForm(request.POST, instance=review)
-    if form.is_valid():
-        form.save()
-        messages.success(request, f"Your review for '{movie.title}' has been updated successfully!")
-    else:
+@ratelimit("review", user="30/m")
+def save_review(request: HttpRequest, movie_id: int) -> HttpResponse:
+    # adds or updates the user's review; fetch() callers get the "your
+    # review" fragment (or JSON) back, form posts a redirect to the movie
+    form = ReviewForm(request.POST)
+    if not form.is_valid():
+        # the valid path finds out at commit, here nothing is written
+        if not Movie.objects.filter(id=movie_id).exists():
+            raise Http404("No Movie matches the given query.")
+        if _is_fetch(request):
+            review = Review.objects.filter(user=request.user, movie_id=movie_id).first()
+            return _review_fragment(request, {"id": movie_id}, review, errors=form.errors, status=400)
         messages.error(request, "Please correct the errors in your review.")
-    
+        return redirect("movie_info", movie_id=movie_id)
+
+    try:
+        with transaction.atomic():
+            review, old_rating = _upsert_review(request.user, movie_id, **form.cleaned_data)
+    except IntegrityError:
+        # the movie foreign key, checked when the transaction commits
+        raise Http404("No Movie matches the given query.")
+    movie = Movie.objects.filter(id=movie_id).values("id", "title", "review_count", "rating_sum", *HISTOGRAM_COLUMNS).first()
+    if movie is None:
+        raise Http404("No Movie matches the given query.")
+
+    if _is_fetch(request):
+        return _review_fragment(request, movie, review, status=201 if old_rating is None else 200)
+    action = "added" if old_rating is None else "updated"
+    messages.success(request, f"Your review for '{movie['title']}' has been {action} successfully!")
     return redirect("movie_info", movie_id=movie_id)
 
 
@@ -182,9 +414,32 @@ def edit_review(request: HttpRequest, movie_id: int) -> HttpResponse:
 @require_http_methods(["POST"])
 def delete_review(request: HttpRequest, movie_id: int) -> HttpResponse:
     movie = get_object_or_404(Movie, id=movie_id)
-    review = get_object_or_404(Review, user=request.user, movie=movie)
-    
-    review.delete()
+
+    with transaction.atomic():
+        review = get_object_or_404(Review.objects.select_for_update(), user=request.user, movie=movie)
+        # a concurrent delete of the same review already took it off the stats
+        if review.delete()[0]:
+            stats.review_removed(movie.id, review.rating)
     messages.success(request, f"Your review for '{movie.title}' has been deleted.")
-    
+
     return redirect("movie_info", movie_id=movie_id)
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def export_data(request: HttpRequest, dataset: str) -> HttpResponse:
+    file_format = request.GET.get("format", "csv")
+    if dataset not in exports.DATASETS or file_format not in exports.FORMATS:
+        raise Http404("Unknown export.")
+    try:
+        since = exports.parse_since(request.GET["since"]) if request.GET.get("since") else None
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    compress = request.GET.get("gzip") == "1"
+
+    response = StreamingHttpResponse(
+        exports.export(dataset, file_format, since, compress),
+        content_type="application/gzip" if compress else exports.FORMATS[file_format],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{exports.filename(dataset, file_format, compress)}"'
+    return response
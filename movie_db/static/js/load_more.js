@@ -0,0 +1,26 @@
+// Progressive enhancement for keyset-paginated lists: a "load more" link
+// with data-fragment-url / data-next-cursor / data-target appends the next
+// fragment in place. The plain ?after= href keeps working without JavaScript.
+// Other parameters of either URL (e.g. home feed filters) are kept.
+document.querySelectorAll('[data-load-more]').forEach((link) => {
+  link.addEventListener('click', async (event) => {
+    event.preventDefault()
+    const url = new URL(link.dataset.fragmentUrl, window.location.href)
+    url.searchParams.set('after', link.dataset.nextCursor)
+    const response = await fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+    if (!response.ok) {
+      window.location = link.href
+      return
+    }
+    document.querySelector(link.dataset.target).insertAdjacentHTML('beforeend', await response.text())
+    const nextCursor = response.headers.get('X-Next-Cursor')
+    if (nextCursor) {
+      link.dataset.nextCursor = nextCursor
+      const next = new URL(link.href)
+      next.searchParams.set('after', nextCursor)
+      link.href = next
+    } else {
+      link.remove()
+    }
+  })
+})
@@ -0,0 +1,51 @@
+// Progressive enhancement for the review forms: submitting one with
+// data-review-form POSTs it with fetch() and swaps in the re-rendered
+// #user-review fragment, and the movie's updated #review-summary sent along
+// with it, instead of following the redirect and reloading the whole page.
+// Without JavaScript the form posts and redirects as usual.
+const showError = (form, message) => {
+  let alert = form.parentElement.querySelector('[data-review-error]')
+  if (!alert) {
+    alert = document.createElement('div')
+    alert.className = 'alert alert-danger'
+    alert.dataset.reviewError = ''
+    form.before(alert)
+  }
+  alert.textContent = message
+}
+
+document.addEventListener('submit', async (event) => {
+  const form = event.target
+  if (!form.matches('[data-review-form]')) {
+    return
+  }
+  event.preventDefault()
+  let response
+  try {
+    response = await fetch(form.action, {
+      method: 'POST',
+      body: new FormData(form),
+      headers: { 'X-Requested-With': 'XMLHttpRequest' },
+    })
+  } catch {
+    showError(form, 'Your review could not be sent, please check your connection and try again.')
+    return
+  }
+  // 400: the fragment with the form's errors; 429 says when to try again
+  if (response.status === 429) {
+    showError(form, await response.text())
+    return
+  }
+  if (!response.ok && response.status !== 400) {
+    showError(form, 'Your review could not be saved, please try again.')
+    return
+  }
+  const fragment = document.createElement('template')
+  fragment.innerHTML = await response.text()
+  const summary = fragment.content.querySelector('template[data-review-summary]')
+  if (summary) {
+    summary.remove()
+    document.querySelector('#review-summary').replaceChildren(summary.content)
+  }
+  document.querySelector('#user-review').replaceChildren(fragment.content)
+})